@@ -1,12 +1,23 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, session
-import threading
+from flask import Flask, Response, render_template, request, jsonify, redirect, url_for, session, send_file, stream_with_context
 import os
 from dotenv import load_dotenv
+import json
+import re
 import sys
-import os
+import time
+from pathlib import Path
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 from multi_agent_research_system_mars.crew import MultiAgentResearchSystemMarsCrew
 from multi_agent_research_system_mars.tools.gmail_tool import gmail_tool
+from multi_agent_research_system_mars.jobs import JobManager, JobQueueFull, event_stream
+from multi_agent_research_system_mars.job_store import SQLiteJobStore
+from multi_agent_research_system_mars.batch import topic_slug
+from multi_agent_research_system_mars.bundle import stream_zip
+from multi_agent_research_system_mars.cache import make_key
+from multi_agent_research_system_mars.eta import EtaEstimator
+from multi_agent_research_system_mars.scheduler import TaskGraph
+from multi_agent_research_system_mars.pdf_cache import PDFCache
+from multi_agent_research_system_mars.reports import REPORT_TYPES, render_pdf, render_reports, result_markdown
 
 # Load environment variables
 load_dotenv('config.env')
@@ -14,26 +25,23 @@ load_dotenv('config.env')
 app = Flask(__name__)
 app.secret_key = 'mars-multi-agent-research-system-secret-key-2024'
 
-# Global variables to track running status and store research data
-is_running = False
-current_status = "Ready"
-research_data = {
-    'topic': '',
-    'recipient_email': '',
-    'results': {},
-    'timestamp': ''
-}
-
 def check_auth():
     """Check if user is authenticated"""
     return 'user' in session or request.headers.get('Authorization')
 
+def current_user_id():
+    """Owner id for jobs: the session user's uid, else the Authorization header"""
+    if 'user' in session:
+        return session['user']['uid']
+    return request.headers.get('Authorization')
+
 @app.route('/')
 def index():
     # Check authentication
     if not check_auth():
         return redirect(url_for('auth'))
-    return render_template('index.html')
+    # The demo app has no bundle route, so only this app shows the ZIP download
+    return render_template('index.html', bundle_download=True)
 
 @app.route('/auth')
 def auth():
@@ -185,162 +193,48 @@ def generate_comprehensive_documentation(topic):
         ]
     }
 
-def generate_comprehensive_pdf_content(data):
-    content = [
-        "## EXECUTIVE SUMMARY",
-        "",
-        data['results'].get('documentation', {}).get('executive_summary', 'Comprehensive analysis completed.'),
-        "",
-        "## TECHNOLOGY ANALYSIS",
-        "",
-        data['results'].get('technology', {}).get('summary', 'Technology analysis completed.'),
-        "",
-        "### Key Findings:",
-    ]
-    tech_findings = data['results'].get('technology', {}).get('key_findings', [])
-    for finding in tech_findings:
-        content.append(f"• {finding}")
-    content.extend([
-        "",
-        "## MARKET ANALYSIS",
-        "",
-        data['results'].get('market', {}).get('summary', 'Market analysis completed.'),
-        "",
-        f"Market Size: {data['results'].get('market', {}).get('market_size', 'Data not available')}",
-        "",
-        "## FINANCIAL PROJECTIONS",
-        "",
-        data['results'].get('financial', {}).get('summary', 'Financial analysis completed.'),
-    ])
-    return content
-
-def generate_executive_pdf_content(data):
-    return [
-        "## EXECUTIVE SUMMARY",
-        "",
-        data['results'].get('documentation', {}).get('executive_summary', 'Executive summary not available.'),
-        "",
-        "## KEY INSIGHTS",
-        "",
-        "• Technology feasibility: Strong",
-        "• Market opportunity: High growth potential",
-        "• Financial projections: Positive ROI expected",
-        "• Implementation timeline: 6-12 months",
-        "",
-        "## RECOMMENDATIONS",
-        "",
-        "• Proceed with development",
-        "• Secure initial funding",
-        "• Form strategic partnerships",
-        "",
-        "## NEXT STEPS",
-        "",
-        "• Detailed implementation planning",
-        "• Prototype development",
-        "• Market validation testing"
-    ]
-
-def generate_market_pdf_content(data):
-    market_data = data['results'].get('market', {})
-    content = [
-        "## MARKET ANALYSIS REPORT",
-        "",
-        market_data.get('summary', 'Market analysis not available.'),
-        "",
-        f"## MARKET SIZE: {market_data.get('market_size', 'Data not available')}",
-        "",
-        "## KEY PLAYERS",
-        ""
-    ]
-    players = market_data.get('key_players', [])
-    for player in players:
-        content.append(f"• {player}")
-    content.extend([
-        "",
-        "## OPPORTUNITIES",
-        ""
-    ])
-    opportunities = market_data.get('opportunities', [])
-    for opp in opportunities:
-        content.append(f"• {opp}")
-    return content
-
-def generate_technical_pdf_content(data):
-    tech_data = data['results'].get('technical', {})
-    content = [
-        "## TECHNICAL FEASIBILITY REPORT",
-        "",
-        tech_data.get('summary', 'Technical analysis not available.'),
-        "",
-        "## TECHNICAL REQUIREMENTS",
-        ""
-    ]
-    requirements = tech_data.get('technical_requirements', [])
-    for req in requirements:
-        content.append(f"• {req}")
-    content.extend([
-        "",
-        f"## IMPLEMENTATION TIMELINE: {tech_data.get('implementation_timeline', 'Not specified')}",
-        "",
-        f"## RISK ASSESSMENT: {tech_data.get('risk_assessment', 'Not specified')}",
-        "",
-        "## TECHNOLOGY STACK",
-        "",
-        "• Modern cloud infrastructure",
-        "• Scalable microservices architecture",
-        "• AI/ML integration capabilities",
-        "• Real-time data processing"
-    ])
-    return content
-
-def generate_pdf_to_file(pdf_type, data):
-    from reportlab.pdfgen import canvas
-    from reportlab.lib.pagesizes import letter
-    from io import BytesIO
-    import tempfile
-
-    buffer = BytesIO()
-    p = canvas.Canvas(buffer, pagesize=letter)
-    p.setFont("Helvetica-Bold", 20)
-    topic = data['topic']
-    p.drawString(100, 750, f"{pdf_type.upper()} REPORT: {topic}")
-    p.setFont("Helvetica", 10)
-    p.drawString(100, 730, f"Generated: {data.get('timestamp', 'N/A')}")
-    p.drawString(100, 715, f"Research Topic: {topic}")
-    p.setFont("Helvetica", 12)
-    y = 680
-    if pdf_type == 'comprehensive':
-        content_lines = generate_comprehensive_pdf_content(data)
-    elif pdf_type == 'executive':
-        content_lines = generate_executive_pdf_content(data)
-    elif pdf_type == 'market':
-        content_lines = generate_market_pdf_content(data)
-    elif pdf_type == 'technical':
-        content_lines = generate_technical_pdf_content(data)
-    else:
-        content_lines = generate_comprehensive_pdf_content(data)
-    for line in content_lines:
-        if y < 50:
-            p.showPage()
-            y = 750
-            p.setFont("Helvetica", 12)
-        if line.startswith('###'):
-            p.setFont("Helvetica-Bold", 14)
-            line = line[3:].strip()
-        elif line.startswith('##'):
-            p.setFont("Helvetica-Bold", 12)
-            line = line[2:].strip()
-        else:
-            p.setFont("Helvetica", 12)
-        p.drawString(100, y, line[:80])
-        y -= 20
-    p.save()
-    buffer.seek(0)
-    # Write to temp file and return path
-    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=f"_{pdf_type}.pdf")
-    with open(tmp.name, 'wb') as f:
-        f.write(buffer.getvalue())
-    return tmp.name
+# Rendered PDFs, keyed on (job, pdf type, research data) so each is rendered once
+pdf_cache = PDFCache()
+
+def pdf_cache_key(job_id, pdf_type, data):
+    return pdf_cache.key(job_id, pdf_type, data)
+
+def generate_pdf_to_file(pdf_type, data, job_id=None):
+    """Path of the rendered PDF in the PDF cache, rendering it on a miss"""
+    key = pdf_cache_key(job_id, pdf_type, data)
+    return pdf_cache.get_or_render(key, lambda: render_pdf(pdf_type, data))
+
+def generate_report_set(job, pdf_types=REPORT_TYPES):
+    """
+    Render a job's report PDFs concurrently and return the paths of those
+    that rendered; a failed document is reported and left out.
+    """
+    data = job.data
+    keys = {t: pdf_cache_key(job.id, t, data) for t in pdf_types}
+    cached = {t: pdf_cache.get(keys[t]) for t in pdf_types}
+    started = time.perf_counter()
+    results = render_reports(data, [t for t in pdf_types if cached[t] is None])
+    wall_time = time.perf_counter() - started
+    paths = []
+    for t in pdf_types:
+        if cached[t] is not None:
+            paths.append(cached[t])
+            job.add_artifact(t, cached[t])
+            job.emit('tool_call', tool='PDF Document Generator', document=t, cached=True)
+            continue
+        result = results[t]
+        job.emit('tool_call', tool='PDF Document Generator', document=t,
+                 seconds=round(result.seconds, 3), error=result.error)
+        if result.error:
+            print(f"❌ {t} PDF failed after {result.seconds:.2f}s: {result.error}")
+            continue
+        print(f"📄 {t} PDF rendered in {result.seconds:.2f}s ({len(result.pdf) // 1024} KB)")
+        paths.append(pdf_cache.put(keys[t], result.pdf))
+        job.add_artifact(t, paths[-1])
+    if results:
+        print(f"📄 Rendered {len(results)} PDFs in {wall_time:.2f}s "
+              f"(sum of render times {sum(r.seconds for r in results.values()):.2f}s)")
+    return paths
 
 def send_research_email(topic, recipient_email, attachments_paths):
     subject = f"MARS Research Results: {topic}"
@@ -351,17 +245,114 @@ def send_research_email(topic, recipient_email, attachments_paths):
     result = gmail_tool.run(to_email=recipient_email, subject=subject, body=body, attachments=attachments_paths)
     return result
 
+def deliver_to_subscribers(job, recipients):
+    """Email a completed job's reports to the recipients of requests attached to it"""
+    pdf_paths = generate_report_set(job)
+    for recipient_email in recipients:
+        print(send_research_email(job.data['topic'], recipient_email, pdf_paths))
+
+def research_key(topic):
+    """Requests with the same normalized topic share one research job"""
+    return make_key('research', re.sub(r'\s+', ' ', topic).strip().lower())
+
+# Simulated agent steps: (results key, status message, content generator)
+RESEARCH_STEPS = [
+    ('technology', "🔬 Technology research agent analyzing trends...", generate_technology_research),
+    ('market', "📊 Market analysis agent researching competition...", generate_market_analysis),
+    ('financial', "💰 Financial analysis agent validating business model...", generate_financial_analysis),
+    ('ux', "👥 UX research agent studying user experience...", generate_ux_research),
+    ('patent', "⚖️ Patent agent analyzing IP landscape...", generate_patent_analysis),
+    ('regulatory', "📋 Regulatory agent checking compliance...", generate_regulatory_analysis),
+    ('technical', "🔧 Technical feasibility agent assessing viability...", generate_technical_feasibility),
+    ('documentation', "📝 Documentation specialist creating reports...", generate_comprehensive_documentation),
+]
+
+# ETA of a research job from the durations of its steps in earlier jobs
+research_eta = EtaEstimator(TaskGraph.chain([key for key, _, _ in RESEARCH_STEPS] + ['pdf', 'email']),
+                            default_seconds=2.0)
+
+def run_step(job, name):
+    """Start a timed job step; its duration feeds the ETA history once it completes"""
+    job.start_task(name)
+    job.emit('eta', **job_manager.eta(job))
+
+def finish_step(job, name, **fields):
+    research_eta.record(name, job.finish_task(name, **fields))
+
+def run_research(job):
+    """
+    Run one research job (simulated multi-agent work, then PDFs and email).
+    Steps whose results a cancelled or failed run already produced are kept.
+    """
+    from time import strftime
+    research_data = job.data
+    topic = research_data['topic']
+    recipient_email = research_data['recipient_email']
+    research_data['timestamp'] = strftime('%Y-%m-%d %H:%M:%S')
+
+    completed = [key for key, _, _ in RESEARCH_STEPS if key in research_data['results']]
+    if completed:
+        job.set_status(f"♻️ Resuming research: {len(completed)} completed steps kept")
+    else:
+        job.set_status("Initializing 13 AI research agents...")
+    # job.sleep() stands in for agent work and returns early if the job is cancelled
+    job.sleep(2)
+
+    for key, status, generate in RESEARCH_STEPS:
+        if key in completed:
+            job.emit('task_completed', task=key, resumed=True)
+            continue
+        job.set_status(status)
+        run_step(job, key)
+        job.sleep(2)
+        research_data['results'][key] = generate(topic)
+        output = result_markdown(research_data['results'][key])
+        job.save_output(key, output)
+        finish_step(job, key, output_chars=len(output))
+
+    job.set_status("📄 PDF generation agent creating documents...")
+    run_step(job, 'pdf')
+    job.sleep(2)
+    # Generate PDFs to files for emailing
+    pdf_paths = generate_report_set(job)
+    finish_step(job, 'pdf')
+
+    job.set_status("📧 Preparing email delivery...")
+    run_step(job, 'email')
+    job.sleep(1)
+    # Send via Gmail tool
+    send_result = send_research_email(topic, recipient_email, pdf_paths)
+    job.emit('tool_call', tool='Gmail Sender', recipient=recipient_email)
+    print(send_result)
+    finish_step(job, 'email')
+    job.set_status(f"✅ Research completed! Comprehensive report sent to {recipient_email}")
+
+# Research jobs run on a bounded worker pool (MARS_WEB_MAX_JOBS) behind a FIFO queue.
+# Jobs, their task outputs and report paths are persisted in SQLite (MARS_JOB_DB),
+# so past research survives restarts and can be searched. In production mode
+# (run_web.py --production) jobs run in the separate worker process (worker.py),
+# so web workers only serve requests.
+job_store = SQLiteJobStore()
+if os.getenv('MARS_PRODUCTION', 'false').lower() == 'true':
+    job_manager = JobManager(run_research, store=job_store, execute=False,
+                             deliver=deliver_to_subscribers, estimator=research_eta)
+else:
+    interrupted = job_store.fail_interrupted('Server restarted while the job was running')
+    if interrupted:
+        print(f"⚠️ Marked {interrupted} interrupted jobs as failed")
+    job_manager = JobManager(run_research, store=job_store, deliver=deliver_to_subscribers,
+                             estimator=research_eta)
+
+def get_user_job(job_id):
+    """The current user's job with `job_id`, or None"""
+    return job_manager.get(job_id, owner=current_user_id())
+
 @app.route('/start-research', methods=['POST'])
 def start_research():
-    global is_running, current_status, research_data
-    
     # Check authentication
     if not check_auth():
         return jsonify({'error': 'Authentication required'}), 401
     
-    if is_running:
-        return jsonify({'error': 'Research is already running'}), 400
-    
     data = request.get_json()
     topic = data.get('topic')
     recipient_email = data.get('recipient_email')
@@ -369,134 +360,282 @@ def start_research():
     if not topic or not recipient_email:
         return jsonify({'error': 'Topic and recipient email are required'}), 400
     
-    # Start research in background thread (simulate multi-agent work and generate PDFs)
-    def run_research():
-        import time
-        from time import strftime
-        global is_running, current_status, research_data
-        try:
-            is_running = True
-            research_data['topic'] = topic
-            research_data['recipient_email'] = recipient_email
-            research_data['timestamp'] = strftime('%Y-%m-%d %H:%M:%S')
-            
-            current_status = "Initializing 13 AI research agents..."
-            time.sleep(2)
-            
-            current_status = "🔬 Technology research agent analyzing trends..."
-            time.sleep(2)
-            research_data['results']['technology'] = generate_technology_research(topic)
-            
-            current_status = "📊 Market analysis agent researching competition..."
-            time.sleep(2)
-            research_data['results']['market'] = generate_market_analysis(topic)
-            
-            current_status = "💰 Financial analysis agent validating business model..."
-            time.sleep(2)
-            research_data['results']['financial'] = generate_financial_analysis(topic)
-            
-            current_status = "👥 UX research agent studying user experience..."
-            time.sleep(2)
-            research_data['results']['ux'] = generate_ux_research(topic)
-            
-            current_status = "⚖️ Patent agent analyzing IP landscape..."
-            time.sleep(2)
-            research_data['results']['patent'] = generate_patent_analysis(topic)
-            
-            current_status = "📋 Regulatory agent checking compliance..."
-            time.sleep(2)
-            research_data['results']['regulatory'] = generate_regulatory_analysis(topic)
-            
-            current_status = "🔧 Technical feasibility agent assessing viability..."
-            time.sleep(2)
-            research_data['results']['technical'] = generate_technical_feasibility(topic)
-            
-            current_status = "📝 Documentation specialist creating reports..."
-            time.sleep(2)
-            research_data['results']['documentation'] = generate_comprehensive_documentation(topic)
-            
-            current_status = "📄 PDF generation agent creating documents..."
-            time.sleep(2)
-            # Generate PDFs to files for emailing
-            pdf_paths = []
-            for t in ['comprehensive', 'executive', 'market', 'technical']:
-                pdf_paths.append(generate_pdf_to_file(t, research_data))
-            
-            current_status = "📧 Preparing email delivery..."
-            time.sleep(1)
-            # Send via Gmail tool
-            send_result = send_research_email(topic, recipient_email, pdf_paths)
-            print(send_result)
-            current_status = f"✅ Research completed! Comprehensive report sent to {recipient_email}"
-        except Exception as e:
-            print(f"Research error: {e}")
-            current_status = f"❌ Error: {str(e)}"
-        finally:
-            is_running = False
+    try:
+        # Identical research requested within MARS_JOB_REUSE_WINDOW joins the existing job
+        job, attached = job_manager.submit_or_attach(current_user_id(), {
+            'topic': topic,
+            'recipient_email': recipient_email,
+            'results': {},
+            'timestamp': ''
+        }, dedupe_key=research_key(topic), recipient_email=recipient_email)
+    except JobQueueFull as e:
+        return jsonify({'error': str(e)}), 503
+    
+    return jsonify({
+        'message': 'Joined identical research already running' if attached else 'Research started successfully',
+        'job_id': job.id,
+        'attached': attached,
+        'position': job_manager.position(job)
+    })
+
+@app.route('/status/<job_id>')
+def get_status(job_id):
+    # Check authentication
+    if not check_auth():
+        return jsonify({'error': 'Authentication required'}), 401
+    
+    job = get_user_job(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    return jsonify(job.to_dict(position=job_manager.position(job), eta=job_manager.eta(job)))
+
+@app.route('/events/<job_id>')
+def job_events(job_id):
+    """Server-sent progress events of a job; reconnects replay from Last-Event-ID"""
+    # Check authentication
+    if not check_auth():
+        return jsonify({'error': 'Authentication required'}), 401
+    
+    job = get_user_job(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    try:
+        last_id = int(request.headers.get('Last-Event-ID') or request.args.get('last_event_id') or 0)
+    except ValueError:
+        last_id = 0
+    if not job.is_active and last_id >= job.last_event_id:
+        # 204 tells EventSource to stop reconnecting
+        return '', 204
+    
+    return Response(
+        stream_with_context(event_stream(job, last_id)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/cancel/<job_id>', methods=['POST'])
+def cancel_research(job_id):
+    """Cancel a queued job, or stop a running one at its next step and free its worker"""
+    # Check authentication
+    if not check_auth():
+        return jsonify({'error': 'Authentication required'}), 401
+    
+    job = get_user_job(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    if job.owner != current_user_id():
+        return jsonify({'error': 'Only the user who started the research can cancel it'}), 403
     
-    research_thread = threading.Thread(target=run_research)
-    research_thread.daemon = True
-    research_thread.start()
+    outcome = job_manager.cancel(job)
+    if outcome is None:
+        return jsonify({'error': f'Job already {job.state}'}), 409
     
-    return jsonify({'message': 'Research started successfully'})
+    return jsonify({
+        'message': 'Research cancelled' if outcome == 'cancelled' else 'Cancellation requested',
+        'job_id': job.id,
+        'cancel': outcome
+    })
 
-@app.route('/status')
-def get_status():
+@app.route('/resume/<job_id>', methods=['POST'])
+def resume_research(job_id):
+    """Queue a cancelled or failed job again, keeping the steps it completed"""
     # Check authentication
     if not check_auth():
         return jsonify({'error': 'Authentication required'}), 401
-        
+    
+    job = get_user_job(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    if job.owner != current_user_id():
+        return jsonify({'error': 'Only the user who started the research can resume it'}), 403
+    
+    try:
+        if not job_manager.resume(job):
+            return jsonify({'error': f'Only cancelled or failed jobs can be resumed (job is {job.state})'}), 409
+    except JobQueueFull as e:
+        return jsonify({'error': str(e)}), 503
+    
+    return jsonify({
+        'message': 'Research resumed',
+        'job_id': job.id,
+        'position': job_manager.position(job)
+    })
+
+@app.route('/api/metrics')
+def api_metrics():
+    """Cancellation latency and PDF cache metrics"""
+    # Check authentication
+    if not check_auth():
+        return jsonify({'error': 'Authentication required'}), 401
+    
     return jsonify({
-        'is_running': is_running,
-        'status': current_status
+        'cancellation': job_manager.cancel_metrics(),
+        'pdf_cache': pdf_cache.stats()
     })
 
-@app.route('/download-pdf/<pdf_type>')
-def download_pdf(pdf_type):
+@app.route('/jobs')
+def list_jobs():
     # Check authentication
     if not check_auth():
         return jsonify({'error': 'Authentication required'}), 401
     
-    global research_data
-    if not research_data.get('topic') or not research_data.get('results'):
+    return jsonify({'jobs': [job.to_dict(position=job_manager.position(job), eta=job_manager.eta(job))
+                             for job in job_manager.jobs_for(current_user_id())]})
+
+def page_args(default_per_page=20, max_per_page=100):
+    """(page, per_page) from the query string, clamped to sane values"""
+    try:
+        page = max(1, int(request.args.get('page', 1)))
+        per_page = min(max_per_page, max(1, int(request.args.get('per_page', default_per_page))))
+    except ValueError:
+        page, per_page = 1, default_per_page
+    return page, per_page
+
+def page_meta(page, per_page, total):
+    return {'page': page, 'per_page': per_page, 'total': total, 'pages': (total + per_page - 1) // per_page}
+
+@app.route('/api/jobs')
+def api_jobs():
+    """Paginated history of the current user's research jobs, newest first"""
+    # Check authentication
+    if not check_auth():
+        return jsonify({'error': 'Authentication required'}), 401
+    
+    page, per_page = page_args()
+    jobs, total = job_manager.jobs_page(current_user_id(), per_page, (page - 1) * per_page)
+    items = []
+    for job in jobs:
+        item = job.to_dict(position=job_manager.position(job), eta=job_manager.eta(job))
+        item['tasks'] = list(job_store.outputs(job.id))
+        if job.state == 'completed':
+            item['reports'] = {t: url_for('download_pdf', job_id=job.id, pdf_type=t) for t in REPORT_TYPES}
+            item['bundle'] = url_for('download_bundle', job_id=job.id)
+        items.append(item)
+    return jsonify({'jobs': items, **page_meta(page, per_page, total)})
+
+@app.route('/api/search')
+def api_search():
+    """Full-text search over the task outputs of the current user's past research"""
+    # Check authentication
+    if not check_auth():
+        return jsonify({'error': 'Authentication required'}), 401
+    
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'Query parameter q is required'}), 400
+    
+    page, per_page = page_args()
+    hits, total = job_store.search(current_user_id(), query, per_page, (page - 1) * per_page)
+    for hit in hits:
+        if hit['state'] == 'completed':
+            hit['reports'] = {t: url_for('download_pdf', job_id=hit['job_id'], pdf_type=t) for t in REPORT_TYPES}
+    return jsonify({'query': query, 'results': hits, **page_meta(page, per_page, total)})
+
+def send_cached_pdf(job, pdf_type, as_attachment, download_name):
+    """
+    Serve a job's PDF from the PDF cache. The cache key is a strong ETag, so
+    If-None-Match gets a 304 and Range requests get partial content.
+    """
+    path = generate_pdf_to_file(pdf_type, job.data, job.id)
+    response = send_file(path, mimetype='application/pdf', as_attachment=as_attachment,
+                         download_name=download_name, etag=pdf_cache_key(job.id, pdf_type, job.data),
+                         conditional=True, max_age=0)
+    # Private: PDFs belong to the job's owner
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+@app.route('/download-pdf/<job_id>/<pdf_type>')
+def download_pdf(job_id, pdf_type):
+    # Check authentication
+    if not check_auth():
+        return jsonify({'error': 'Authentication required'}), 401
+    
+    if pdf_type not in REPORT_TYPES:
+        return jsonify({'error': f'Unknown report type: {pdf_type}'}), 404
+    
+    job = get_user_job(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    research_data = job.data
+    if job.state != 'completed' or not research_data.get('results'):
         return jsonify({'error': 'No research data available. Please run a research first.'}), 404
     
     try:
-        pdf_path = generate_pdf_to_file(pdf_type, research_data)
-        with open(pdf_path, 'rb') as f:
-            data = f.read()
-        topic = research_data['topic']
-        response = app.response_class(
-            data,
-            mimetype='application/pdf',
-            headers={'Content-Disposition': f'attachment; filename={topic}_{pdf_type}_report.pdf'}
-        )
-        return response
+        return send_cached_pdf(job, pdf_type, as_attachment=True,
+                               download_name=f"{research_data['topic']}_{pdf_type}_report.pdf")
     except Exception as e:
         return jsonify({'error': f'PDF generation failed: {str(e)}'}), 500
 
-@app.route('/view-pdf/<pdf_type>')
-def view_pdf(pdf_type):
+@app.route('/view-pdf/<job_id>/<pdf_type>')
+def view_pdf(job_id, pdf_type):
     # Check authentication
     if not check_auth():
         return jsonify({'error': 'Authentication required'}), 401
     
-    global research_data
-    if not research_data.get('topic') or not research_data.get('results'):
+    if pdf_type not in REPORT_TYPES:
+        return jsonify({'error': f'Unknown report type: {pdf_type}'}), 404
+    
+    job = get_user_job(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    research_data = job.data
+    if job.state != 'completed' or not research_data.get('results'):
         return jsonify({'error': 'No research data available. Please run a research first.'}), 404
     
     try:
-        pdf_path = generate_pdf_to_file(pdf_type, research_data)
-        with open(pdf_path, 'rb') as f:
-            data = f.read()
-        response = app.response_class(
-            data,
-            mimetype='application/pdf',
-            headers={'Content-Disposition': 'inline; filename=MARS_report.pdf'}
-        )
-        return response
+        return send_cached_pdf(job, pdf_type, as_attachment=False, download_name='MARS_report.pdf')
     except Exception as e:
         return jsonify({'error': f'PDF generation failed: {str(e)}'}), 500
 
+def bundle_entries(job):
+    """
+    Files of a job's ZIP bundle: the report PDFs (from the PDF cache), every
+    task output as markdown and the job's metrics. Produced one at a time, so
+    a PDF missing from the cache is only rendered when the stream reaches it.
+    """
+    for pdf_type in REPORT_TYPES:
+        try:
+            path = generate_pdf_to_file(pdf_type, job.data, job.id)
+        except Exception as e:
+            print(f"❌ {pdf_type} PDF left out of bundle {job.id}: {e}")
+            continue
+        yield f"reports/{pdf_type}_report.pdf", Path(path)
+    # Jobs that ran before task outputs were stored only have their results
+    outputs = job_store.outputs(job.id) or {
+        key: result_markdown(result) for key, result in job.data['results'].items()
+    }
+    for task, output in outputs.items():
+        yield f"tasks/{task}.md", output
+    yield 'metrics/job.json', json.dumps(job.to_dict(), indent=2, default=str, ensure_ascii=False)
+    yield 'metrics/events.jsonl', ''.join(
+        json.dumps(record, default=str, ensure_ascii=False) + '\n' for record in job_store.events_after(job.id, 0)
+    )
+
+@app.route('/download-bundle/<job_id>')
+def download_bundle(job_id):
+    """Stream a ZIP of every artifact of a completed job, written chunk by chunk"""
+    # Check authentication
+    if not check_auth():
+        return jsonify({'error': 'Authentication required'}), 401
+    
+    job = get_user_job(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    if job.state != 'completed' or not job.data.get('results'):
+        return jsonify({'error': 'No research data available. Please run a research first.'}), 404
+    
+    filename = f"MARS_{topic_slug(job.data['topic'])}_{job.id}.zip"
+    return Response(
+        stream_with_context(stream_zip(bundle_entries(job))),
+        mimetype='application/zip',
+        headers={
+            'Content-Disposition': f'attachment; filename="{filename}"',
+            'Cache-Control': 'private, no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
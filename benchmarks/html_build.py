@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+MARS Report HTML Benchmark
+Times the HTML build of one report (markdown conversion plus template render)
+for 5, 50 and 500 page documents, per-call template and Markdown setup versus
+the compiled template and reused converter of the PDF Generator tool.
+Run from the repository root: python benchmarks/html_build.py [repeats]
+"""
+
+import os
+import statistics
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from multi_agent_research_system_mars.report_html import (  # noqa: E402
+    MARKDOWN_EXTENSIONS,
+    TEMPLATE_DIR,
+    build_report_html,
+)
+
+PAGE_COUNTS = (5, 50, 500)
+
+
+def sample_markdown(pages: int) -> str:
+    """Markdown filling about `pages` A4 pages: a heading, a table and prose per page."""
+    paragraph = ("Market adoption keeps growing as **enterprise buyers** move pilots into production, "
+                 "while `open models` narrow the cost gap and regulators publish clearer guidance. ") * 3
+    parts = []
+    for page in range(1, pages + 1):
+        parts.append(f"## Section {page}\n")
+        parts.append("| Metric | Value | Change |\n|---|---|---|\n| Revenue | $1.2B | +12% |\n| Users | 4.5M | +8% |\n")
+        parts.extend(f"{paragraph}\n" for _ in range(4))
+        parts.append("- First finding\n- Second finding\n- Third finding\n")
+    return "\n".join(parts)
+
+
+def legacy_html(content: str, title: str, document_type: str) -> str:
+    """The former per-document build: a fresh converter with its extensions and a new template."""
+    import markdown
+    from jinja2 import Template
+
+    with open(os.path.join(TEMPLATE_DIR, 'report.html'), encoding='utf-8') as f:
+        source = f.read()
+    with open(os.path.join(TEMPLATE_DIR, 'report.css'), encoding='utf-8') as f:
+        source = source.replace('{% include "report.css" %}', f.read())
+    md_content = markdown.markdown(content, extensions=MARKDOWN_EXTENSIONS)
+    return Template(source).render(title=title, content=md_content, document_type=document_type,
+                                   date=datetime.now().strftime("%B %d, %Y"))
+
+
+def time_build(build, content: str, repeats: int) -> float:
+    """Median seconds of `repeats` builds, after one warm-up build."""
+    build(content, "Benchmark Report", "report")
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        build(content, "Benchmark Report", "report")
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    print(f"{'pages':>6} {'markdown KB':>12} {'per-call ms':>12} {'compiled ms':>12} {'speedup':>8}")
+    for pages in PAGE_COUNTS:
+        content = sample_markdown(pages)
+        legacy = time_build(legacy_html, content, repeats)
+        compiled = time_build(build_report_html, content, repeats)
+        print(f"{pages:>6} {len(content) / 1024:>12.0f} {legacy * 1000:>12.1f} {compiled * 1000:>12.1f} "
+              f"{legacy / compiled:>7.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
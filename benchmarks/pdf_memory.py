@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+MARS Fallback PDF Memory Benchmark
+Records the peak RSS of the reportlab fallback renderer for 50 and 500 page
+inputs, building the whole story up front versus streaming it in.
+Each measurement runs in a fresh process so peaks do not carry over.
+Run from the repository root: python benchmarks/pdf_memory.py
+"""
+
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from html_build import sample_markdown  # noqa: E402
+from multi_agent_research_system_mars.streaming_pdf import (  # noqa: E402
+    build_streaming_pdf,
+    iter_lines,
+    markdown_flowables,
+)
+
+PAGE_COUNTS = (50, 500)
+MODES = ('eager', 'streaming')
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in KB on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def eager_pdf(output_path: str, title: str, content: str) -> int:
+    """The former fallback: every flowable in one list, then a single build."""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import PageBreak, Paragraph, SimpleDocTemplate
+
+    doc = SimpleDocTemplate(output_path, pagesize=A4,
+                            rightMargin=72, leftMargin=72,
+                            topMargin=72, bottomMargin=18)
+    styles = getSampleStyleSheet()
+    story = [Paragraph(title, styles['Heading1']), PageBreak()]
+    story.extend(markdown_flowables(content.split('\n'), styles))
+    doc.build(story)
+    return doc.page
+
+
+def run_one(mode: str, pages: int) -> None:
+    """Child process: render one document and print `pages seconds before_mb peak_mb`."""
+    # Import reportlab and lay out a short document first so neither counts as build growth
+    with tempfile.TemporaryDirectory() as tmp:
+        build_streaming_pdf(os.path.join(tmp, 'warmup.pdf'), "Warm-up", iter_lines(sample_markdown(1)))
+    content = sample_markdown(pages)
+    before = peak_rss_mb()
+    with tempfile.TemporaryDirectory() as tmp:
+        output_path = os.path.join(tmp, 'benchmark.pdf')
+        started = time.perf_counter()
+        if mode == 'eager':
+            rendered = eager_pdf(output_path, "Benchmark Report", content)
+        else:
+            rendered = build_streaming_pdf(output_path, "Benchmark Report", iter_lines(content))
+        seconds = time.perf_counter() - started
+    print(rendered, seconds, before, peak_rss_mb())
+
+
+def main():
+    if len(sys.argv) == 4 and sys.argv[1] == '--run':
+        run_one(sys.argv[2], int(sys.argv[3]))
+        return 0
+    print(f"{'input':>6} {'mode':>10} {'pages':>6} {'seconds':>8} {'peak RSS MB':>12} {'build growth MB':>16}")
+    for pages in PAGE_COUNTS:
+        for mode in MODES:
+            output = subprocess.run([sys.executable, os.path.abspath(__file__), '--run', mode, str(pages)],
+                                    capture_output=True, text=True, check=True).stdout.split()
+            rendered, seconds, before, peak = int(output[0]), *map(float, output[1:])
+            print(f"{pages:>6} {mode:>10} {rendered:>6} {seconds:>8.2f} {peak:>12.1f} {peak - before:>16.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
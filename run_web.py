@@ -2,20 +2,54 @@
 """
 MARS Web Interface Launcher
 Run this file to start the web-based interface for the Multi-Agent Research System.
+Pass --production to serve it with gunicorn and a separate job worker.
 """
 
 import os
 import sys
 import subprocess
 
+def run_production():
+    """Serve the app on a pre-forked multi-worker gunicorn server plus one job worker process."""
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        print("❌ Production mode needs gunicorn: pip install gunicorn")
+        return 1
+
+    env = dict(os.environ, MARS_PRODUCTION='true')
+    bind = os.getenv('MARS_WEB_BIND', '0.0.0.0:5000')
+    workers = os.getenv('MARS_WEB_WORKERS', str(2 * (os.cpu_count() or 1) + 1))
+    # Threaded workers so long-lived progress streams do not block other requests
+    threads = os.getenv('MARS_WEB_THREADS', '8')
+
+    print(f"🏭 Production mode: {workers} web workers x {threads} threads on {bind}")
+    job_worker = subprocess.Popen([sys.executable, "worker.py"], env=env)
+    try:
+        subprocess.run([
+            sys.executable, "-m", "gunicorn",
+            "--preload",
+            "--workers", workers,
+            "--threads", threads,
+            "--worker-class", "gthread",
+            "--bind", bind,
+            "wsgi:app",
+        ], check=True, env=env)
+    finally:
+        job_worker.terminate()
+        job_worker.wait()
+    return 0
+
 def main():
     print("🚀 Starting MARS Web Interface...")
     print("=" * 50)
     print("📱 The web interface will be available at: http://localhost:5000")
-    print("🔄 Starting Flask server...")
-    print()
-    
+
     try:
+        if '--production' in sys.argv[1:]:
+            return run_production()
+        print("🔄 Starting Flask server...")
+        print()
         # Run the Flask app
         subprocess.run([sys.executable, "app.py"], check=True)
     except KeyboardInterrupt:
@@ -1,8 +1,13 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, session
-import threading
+from flask import Flask, Response, render_template, request, jsonify, redirect, url_for, session, stream_with_context
+import json
 import time
 import os
+import sys
 from dotenv import load_dotenv
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+from multi_agent_research_system_mars.jobs import JobManager, JobQueueFull, event_stream
+from multi_agent_research_system_mars.reports import REPORT_TYPES, render_pdf
+from multi_agent_research_system_mars.text_layout import draw_pages, layout_report
 
 # Load environment variables
 load_dotenv('config.env')
@@ -10,16 +15,6 @@ load_dotenv('config.env')
 app = Flask(__name__)
 app.secret_key = 'mars-multi-agent-research-system-secret-key-2024'
 
-# Global variables to track running status and store research data
-is_running = False
-current_status = "Ready"
-research_data = {
-    'topic': '',
-    'recipient_email': '',
-    'results': {},
-    'timestamp': ''
-}
-
 def check_auth():
     """Check if user is authenticated"""
     # Allow access to auth page and static files without authentication
@@ -28,6 +23,12 @@ def check_auth():
     # Check if user is logged in (session-based for server-side, frontend will handle localStorage)
     return 'user' in session or request.headers.get('Authorization')
 
+def current_user_id():
+    """Owner id for jobs: the session user's uid, else the Authorization header"""
+    if 'user' in session:
+        return session['user']['uid']
+    return request.headers.get('Authorization')
+
 @app.route('/')
 def index():
     # Always redirect to auth first for better UX
@@ -198,128 +199,6 @@ def generate_comprehensive_documentation(topic):
         ]
     }
 
-def generate_comprehensive_pdf_content(research_data):
-    """Generate comprehensive PDF content"""
-    content = [
-        "## EXECUTIVE SUMMARY",
-        "",
-        research_data['results'].get('documentation', {}).get('executive_summary', 'Comprehensive analysis completed.'),
-        "",
-        "## TECHNOLOGY ANALYSIS",
-        "",
-        research_data['results'].get('technology', {}).get('summary', 'Technology analysis completed.'),
-        "",
-        "### Key Findings:",
-    ]
-    
-    tech_findings = research_data['results'].get('technology', {}).get('key_findings', [])
-    for finding in tech_findings:
-        content.append(f"• {finding}")
-    
-    content.extend([
-        "",
-        "## MARKET ANALYSIS", 
-        "",
-        research_data['results'].get('market', {}).get('summary', 'Market analysis completed.'),
-        "",
-        f"Market Size: {research_data['results'].get('market', {}).get('market_size', 'Data not available')}",
-        "",
-        "## FINANCIAL PROJECTIONS",
-        "",
-        research_data['results'].get('financial', {}).get('summary', 'Financial analysis completed.'),
-    ])
-    
-    return content
-
-def generate_executive_pdf_content(research_data):
-    """Generate executive summary PDF content"""
-    return [
-        "## EXECUTIVE SUMMARY",
-        "",
-        research_data['results'].get('documentation', {}).get('executive_summary', 'Executive summary not available.'),
-        "",
-        "## KEY INSIGHTS",
-        "",
-        "• Technology feasibility: Strong",
-        "• Market opportunity: High growth potential", 
-        "• Financial projections: Positive ROI expected",
-        "• Implementation timeline: 6-12 months",
-        "",
-        "## RECOMMENDATIONS",
-        "",
-        "• Proceed with development",
-        "• Secure initial funding",
-        "• Form strategic partnerships",
-        "",
-        "## NEXT STEPS",
-        "",
-        "• Detailed implementation planning",
-        "• Prototype development",
-        "• Market validation testing"
-    ]
-
-def generate_market_pdf_content(research_data):
-    """Generate market analysis PDF content"""
-    market_data = research_data['results'].get('market', {})
-    content = [
-        "## MARKET ANALYSIS REPORT",
-        "",
-        market_data.get('summary', 'Market analysis not available.'),
-        "",
-        f"## MARKET SIZE: {market_data.get('market_size', 'Data not available')}",
-        "",
-        "## KEY PLAYERS",
-        ""
-    ]
-    
-    players = market_data.get('key_players', [])
-    for player in players:
-        content.append(f"• {player}")
-    
-    content.extend([
-        "",
-        "## OPPORTUNITIES",
-        ""
-    ])
-    
-    opportunities = market_data.get('opportunities', [])
-    for opp in opportunities:
-        content.append(f"• {opp}")
-        
-    return content
-
-def generate_technical_pdf_content(research_data):
-    """Generate technical analysis PDF content"""
-    tech_data = research_data['results'].get('technical', {})
-    content = [
-        "## TECHNICAL FEASIBILITY REPORT",
-        "",
-        tech_data.get('summary', 'Technical analysis not available.'),
-        "",
-        "## TECHNICAL REQUIREMENTS",
-        ""
-    ]
-    
-    requirements = tech_data.get('technical_requirements', [])
-    for req in requirements:
-        content.append(f"• {req}")
-    
-    content.extend([
-        "",
-        f"## IMPLEMENTATION TIMELINE: {tech_data.get('implementation_timeline', 'Not specified')}",
-        "",
-        f"## RISK ASSESSMENT: {tech_data.get('risk_assessment', 'Not specified')}",
-        "",
-        "## TECHNOLOGY STACK",
-        "",
-        "• Modern cloud infrastructure",
-        "• Scalable microservices architecture", 
-        "• AI/ML integration capabilities",
-        "• Real-time data processing"
-    ])
-    
-    return content
-
 def send_research_email(topic, recipient_email):
     """Send research results via email using Gmail API"""
     try:
@@ -331,17 +210,62 @@ def send_research_email(topic, recipient_email):
         print(f"Email sending error: {e}")
         raise e
 
+# Simulated agent steps: (results key, status message, seconds, content generator)
+RESEARCH_STEPS = [
+    ('technology', "🔬 Technology research agent analyzing trends...", 3, generate_technology_research),
+    ('market', "📊 Market analysis agent researching competition...", 3, generate_market_analysis),
+    ('financial', "💰 Financial analysis agent validating business model...", 2, generate_financial_analysis),
+    ('ux', "👥 UX research agent studying user experience...", 2, generate_ux_research),
+    ('patent', "⚖️ Patent agent analyzing IP landscape...", 2, generate_patent_analysis),
+    ('regulatory', "📋 Regulatory agent checking compliance...", 2, generate_regulatory_analysis),
+    ('technical', "🔧 Technical feasibility agent assessing viability...", 2, generate_technical_feasibility),
+    ('documentation', "📝 Documentation specialist creating reports...", 3, generate_comprehensive_documentation),
+]
+
+def simulate_research(job):
+    """Simulate a research job with email integration"""
+    research_data = job.data
+    topic = research_data['topic']
+    recipient_email = research_data['recipient_email']
+    research_data['timestamp'] = time.strftime('%Y-%m-%d %H:%M:%S')
+    
+    job.set_status("Initializing 13 AI research agents...")
+    job.sleep(2)
+    
+    for key, status, seconds, generate in RESEARCH_STEPS:
+        job.set_status(status)
+        job.emit('task_started', task=key)
+        job.sleep(seconds)
+        research_data['results'][key] = generate(topic)
+        job.emit('task_completed', task=key, output_chars=len(json.dumps(research_data['results'][key])))
+    
+    job.set_status("📄 PDF generation agent creating documents...")
+    job.sleep(2)
+    
+    job.set_status("📧 Preparing email delivery...")
+    job.sleep(1)
+    
+    # Try to send actual email
+    try:
+        send_research_email(topic, recipient_email)
+        job.set_status(f"✅ Research completed! Comprehensive report sent to {recipient_email}")
+    except Exception as email_error:
+        print(f"Email sending failed: {email_error}")
+        job.set_status(f"✅ Research completed! Results ready for download (Email delivery temporarily unavailable)")
+
+# Research jobs run on a bounded worker pool (MARS_WEB_MAX_JOBS) behind a FIFO queue
+job_manager = JobManager(simulate_research)
+
+def get_user_job(job_id):
+    """The current user's job with `job_id`, or None"""
+    return job_manager.get(job_id, owner=current_user_id())
+
 @app.route('/start-research', methods=['POST'])
 def start_research():
-    global is_running, current_status
-    
     # Check authentication
     if not check_auth():
         return jsonify({'error': 'Authentication required'}), 401
     
-    if is_running:
-        return jsonify({'error': 'Research is already running'}), 400
-    
     data = request.get_json()
     topic = data.get('topic')
     recipient_email = data.get('recipient_email')
@@ -349,166 +273,114 @@ def start_research():
     if not topic or not recipient_email:
         return jsonify({'error': 'Topic and recipient email are required'}), 400
     
-    # Simulate research process with email integration
-    def simulate_research():
-        global is_running, current_status, research_data
-        try:
-            is_running = True
-            research_data['topic'] = topic
-            research_data['recipient_email'] = recipient_email
-            research_data['timestamp'] = time.strftime('%Y-%m-%d %H:%M:%S')
-            
-            current_status = "Initializing 13 AI research agents..."
-            time.sleep(2)
-            
-            # Technology Research
-            current_status = "🔬 Technology research agent analyzing trends..."
-            time.sleep(3)
-            research_data['results']['technology'] = generate_technology_research(topic)
-            
-            # Market Analysis
-            current_status = "📊 Market analysis agent researching competition..."
-            time.sleep(3)
-            research_data['results']['market'] = generate_market_analysis(topic)
-            
-            # Financial Analysis
-            current_status = "💰 Financial analysis agent validating business model..."
-            time.sleep(2)
-            research_data['results']['financial'] = generate_financial_analysis(topic)
-            
-            # UX Research
-            current_status = "👥 UX research agent studying user experience..."
-            time.sleep(2)
-            research_data['results']['ux'] = generate_ux_research(topic)
-            
-            # Patent Analysis
-            current_status = "⚖️ Patent agent analyzing IP landscape..."
-            time.sleep(2)
-            research_data['results']['patent'] = generate_patent_analysis(topic)
-            
-            # Regulatory Compliance
-            current_status = "📋 Regulatory agent checking compliance..."
-            time.sleep(2)
-            research_data['results']['regulatory'] = generate_regulatory_analysis(topic)
-            
-            # Technical Feasibility
-            current_status = "🔧 Technical feasibility agent assessing viability..."
-            time.sleep(2)
-            research_data['results']['technical'] = generate_technical_feasibility(topic)
-            
-            # Documentation Creation
-            current_status = "📝 Documentation specialist creating reports..."
-            time.sleep(3)
-            research_data['results']['documentation'] = generate_comprehensive_documentation(topic)
-            
-            current_status = "📄 PDF generation agent creating documents..."
-            time.sleep(2)
-            
-            current_status = "📧 Preparing email delivery..."
-            time.sleep(1)
-            
-            # Try to send actual email
-            try:
-                send_research_email(topic, recipient_email)
-                current_status = f"✅ Research completed! Comprehensive report sent to {recipient_email}"
-            except Exception as email_error:
-                print(f"Email sending failed: {email_error}")
-                current_status = f"✅ Research completed! Results ready for download (Email delivery temporarily unavailable)"
-            
-        except Exception as e:
-            current_status = f"❌ Error: {str(e)}"
-        finally:
-            is_running = False
+    try:
+        job = job_manager.submit(current_user_id(), {
+            'topic': topic,
+            'recipient_email': recipient_email,
+            'results': {},
+            'timestamp': ''
+        })
+    except JobQueueFull as e:
+        return jsonify({'error': str(e)}), 503
+    
+    return jsonify({
+        'message': 'Research started successfully',
+        'job_id': job.id,
+        'position': job_manager.position(job)
+    })
+
+@app.route('/status/<job_id>')
+def get_status(job_id):
+    # Check authentication
+    if not check_auth():
+        return jsonify({'error': 'Authentication required'}), 401
+    
+    job = get_user_job(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    return jsonify(job.to_dict(position=job_manager.position(job)))
 
-    # Start the simulation thread
-    research_thread = threading.Thread(target=simulate_research)
-    research_thread.daemon = True
-    research_thread.start()
+@app.route('/events/<job_id>')
+def job_events(job_id):
+    """Server-sent progress events of a job; reconnects replay from Last-Event-ID"""
+    # Check authentication
+    if not check_auth():
+        return jsonify({'error': 'Authentication required'}), 401
     
-    return jsonify({'message': 'Research started successfully'})
+    job = get_user_job(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    try:
+        last_id = int(request.headers.get('Last-Event-ID') or request.args.get('last_event_id') or 0)
+    except ValueError:
+        last_id = 0
+    if not job.is_active and last_id >= job.last_event_id:
+        # 204 tells EventSource to stop reconnecting
+        return '', 204
+    
+    return Response(
+        stream_with_context(event_stream(job, last_id)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
 
-@app.route('/status')
-def get_status():
+@app.route('/cancel/<job_id>', methods=['POST'])
+def cancel_research(job_id):
+    """Cancel a queued job, or stop a running one at its next step and free its worker"""
     # Check authentication
     if not check_auth():
         return jsonify({'error': 'Authentication required'}), 401
-        
+    
+    job = get_user_job(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    outcome = job_manager.cancel(job)
+    if outcome is None:
+        return jsonify({'error': f'Job already {job.state}'}), 409
+    
     return jsonify({
-        'is_running': is_running,
-        'status': current_status
+        'message': 'Research cancelled' if outcome == 'cancelled' else 'Cancellation requested',
+        'job_id': job.id,
+        'cancel': outcome
     })
 
-@app.route('/download-pdf/<pdf_type>')
-def download_pdf(pdf_type):
+@app.route('/jobs')
+def list_jobs():
     # Check authentication
     if not check_auth():
         return jsonify({'error': 'Authentication required'}), 401
     
-    global research_data
+    return jsonify({'jobs': [job.to_dict(position=job_manager.position(job))
+                             for job in job_manager.jobs_for(current_user_id())]})
+
+@app.route('/download-pdf/<job_id>/<pdf_type>')
+def download_pdf(job_id, pdf_type):
+    # Check authentication
+    if not check_auth():
+        return jsonify({'error': 'Authentication required'}), 401
     
-    # Check if we have research data
-    if not research_data.get('topic') or not research_data.get('results'):
-        return jsonify({'error': 'No research data available. Please run a research first.'}), 404
+    if pdf_type not in REPORT_TYPES:
+        return jsonify({'error': f'Unknown report type: {pdf_type}'}), 404
     
-    from reportlab.pdfgen import canvas
-    from reportlab.lib.pagesizes import letter
-    from io import BytesIO
+    job = get_user_job(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    research_data = job.data
     
-    buffer = BytesIO()
+    # Check if we have research data
+    if job.state != 'completed' or not research_data.get('results'):
+        return jsonify({'error': 'No research data available. Please run a research first.'}), 404
     
     try:
-        # Create PDF with actual research data
-        p = canvas.Canvas(buffer, pagesize=letter)
-        
-        # Title
-        p.setFont("Helvetica-Bold", 20)
+        # Create PDF with actual research data (wrapped and paginated by the shared text layout)
+        pdf = render_pdf(pdf_type, research_data)
         topic = research_data['topic']
-        p.drawString(100, 750, f"{pdf_type.upper()} REPORT: {topic}")
-        
-        # Date and metadata
-        p.setFont("Helvetica", 10)
-        p.drawString(100, 730, f"Generated: {research_data.get('timestamp', 'N/A')}")
-        p.drawString(100, 715, f"Research Topic: {topic}")
-        
-        # Content based on PDF type
-        p.setFont("Helvetica", 12)
-        y_position = 680
-        
-        if pdf_type == 'comprehensive':
-            content_lines = generate_comprehensive_pdf_content(research_data)
-        elif pdf_type == 'executive':
-            content_lines = generate_executive_pdf_content(research_data)
-        elif pdf_type == 'market':
-            content_lines = generate_market_pdf_content(research_data)
-        elif pdf_type == 'technical':
-            content_lines = generate_technical_pdf_content(research_data)
-        else:
-            content_lines = generate_comprehensive_pdf_content(research_data)
-        
-        for line in content_lines:
-            if y_position < 50:  # Start new page if needed
-                p.showPage()
-                y_position = 750
-                p.setFont("Helvetica", 12)
-            
-            # Handle different font weights
-            if line.startswith('###'):
-                p.setFont("Helvetica-Bold", 14)
-                line = line[3:].strip()
-            elif line.startswith('##'):
-                p.setFont("Helvetica-Bold", 12)
-                line = line[2:].strip()
-            else:
-                p.setFont("Helvetica", 12)
-            
-            p.drawString(100, y_position, line[:80])  # Limit line length
-            y_position -= 20
-            
-        p.save()
-        buffer.seek(0)
         
         response = app.response_class(
-            buffer.getvalue(),
+            pdf,
             mimetype='application/pdf',
             headers={
                 'Content-Disposition': f'attachment; filename={topic}_{pdf_type}_report.pdf'
@@ -520,12 +392,18 @@ def download_pdf(pdf_type):
     except Exception as e:
         return jsonify({'error': f'PDF generation failed: {str(e)}'}), 500
 
-@app.route('/view-pdf/<pdf_type>')
-def view_pdf(pdf_type):
+@app.route('/view-pdf/<job_id>/<pdf_type>')
+def view_pdf(job_id, pdf_type):
     # Check authentication
     if not check_auth():
         return jsonify({'error': 'Authentication required'}), 401
     
+    if pdf_type not in REPORT_TYPES:
+        return jsonify({'error': f'Unknown report type: {pdf_type}'}), 404
+    
+    if not get_user_job(job_id):
+        return jsonify({'error': 'Job not found'}), 404
+    
     # For demo, generate the same PDF for viewing
     from reportlab.pdfgen import canvas
     from reportlab.lib.pagesizes import letter
@@ -537,14 +415,6 @@ def view_pdf(pdf_type):
         # Create PDF
         p = canvas.Canvas(buffer, pagesize=letter)
         
-        # Title
-        p.setFont("Helvetica-Bold", 20)
-        p.drawString(100, 750, f"MARS {pdf_type.upper()} REPORT")
-        
-        # Content
-        p.setFont("Helvetica", 12)
-        y_position = 700
-        
         content_lines = [
             f"Generated by Multi-Agent Research System (MARS)",
             f"Report Type: {pdf_type.replace('_', ' ').title()}",
@@ -577,10 +447,7 @@ def view_pdf(pdf_type):
             "📄 PDF Generation Agent",
         ]
         
-        for line in content_lines:
-            p.drawString(100, y_position, line)
-            y_position -= 20
-            
+        draw_pages(p, layout_report(f"MARS {pdf_type.upper()} REPORT", [], content_lines))
         p.save()
         
         buffer.seek(0)
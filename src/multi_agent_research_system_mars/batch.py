@@ -0,0 +1,186 @@
+import csv
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import redirect_stderr, redirect_stdout
+from typing import Dict, List, Optional
+
+from .cache import make_key
+
+
+# Environment limits split across batch worker processes so the batch as a
+# whole stays within the configured global budget
+SHARED_LIMITS = (
+    'MARS_LLM_RPM',
+    'MARS_LLM_TPM',
+    'MARS_LLM_MAX_CONCURRENCY',
+    'MARS_SEARCH_RPM',
+    'MARS_SEARCH_MAX_CONCURRENCY',
+)
+LIMIT_DEFAULTS = {
+    'MARS_LLM_RPM': 500,
+    'MARS_LLM_TPM': 200000,
+    'MARS_LLM_MAX_CONCURRENCY': 8,
+    'MARS_SEARCH_RPM': 300,
+    'MARS_SEARCH_MAX_CONCURRENCY': 4,
+}
+
+
+def load_topics(path: str) -> List[Dict[str, str]]:
+    """Read `{topic, recipient_email}` rows from a .jsonl or .csv file."""
+    rows = []
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if path.lower().endswith('.csv'):
+            records = list(csv.DictReader(f))
+        else:
+            records = [json.loads(line) for line in f if line.strip()]
+    for number, record in enumerate(records, start=1):
+        topic = (record.get('topic') or '').strip()
+        if not topic:
+            raise ValueError(f"{path}: row {number} has no topic")
+        rows.append({'topic': topic, 'recipient_email': (record.get('recipient_email') or '').strip()})
+    return rows
+
+
+def topic_slug(topic: str, max_length: int = 40) -> str:
+    slug = re.sub(r'[^a-z0-9]+', '-', topic.lower()).strip('-')
+    return slug[:max_length].rstrip('-') or 'topic'
+
+
+def split_limits(workers: int) -> Dict[str, str]:
+    """Per-process share of the global rate and concurrency limits."""
+    return {
+        name: str(max(1, int(float(os.getenv(name, LIMIT_DEFAULTS[name])) // workers)))
+        for name in SHARED_LIMITS
+    }
+
+
+class BatchLedger:
+    """
+    Append-only JSONL progress ledger of a batch.
+
+    Every state change of a topic is appended as one line; the latest line per
+    topic key wins, so an interrupted batch can be re-run and will skip the
+    topics that already completed.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def record(self, key: str, status: str, **fields) -> None:
+        line = json.dumps({'ts': round(time.time(), 3), 'key': key, 'status': status, **fields},
+                          ensure_ascii=False, default=str)
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+
+    def state(self) -> Dict[str, dict]:
+        """Latest ledger entry by topic key."""
+        entries = {}
+        if not os.path.exists(self.path):
+            return entries
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A batch killed mid-write leaves at most one partial line
+                    continue
+                entries[entry['key']] = entry
+        return entries
+
+
+def _init_worker(limits: Dict[str, str]) -> None:
+    os.environ.update(limits)
+
+
+def run_topic(inputs: dict, output_dir: str, run_id: str) -> dict:
+    """
+    Run the crew for one topic in a worker process.
+
+    Outputs are isolated in `output_dir`: the generated PDFs, every task
+    output as markdown and the crew's console log.
+    """
+    from .main import kickoff
+
+    os.makedirs(output_dir, exist_ok=True)
+    os.environ['MARS_OUTPUT_DIR'] = output_dir
+    started = time.time()
+    with open(os.path.join(output_dir, 'run.log'), 'a', encoding='utf-8') as log, \
+            redirect_stdout(log), redirect_stderr(log):
+        try:
+            result = kickoff(inputs, run_id=run_id)
+        except Exception as e:
+            return {'status': 'failed', 'error': str(e), 'wall_time': time.time() - started}
+    for output in result.tasks_output:
+        with open(os.path.join(output_dir, f"{output.name}.md"), 'w', encoding='utf-8') as f:
+            f.write(output.raw or '')
+    return {'status': 'completed', 'error': None, 'wall_time': time.time() - started}
+
+
+def run_batch(path: str, workers: Optional[int] = None, output_root: Optional[str] = None) -> Dict[str, int]:
+    """
+    Research every topic in `path` across a pool of `workers` processes
+    (MARS_BATCH_WORKERS, default 2).
+
+    Each topic writes to its own directory under `output_root`
+    (MARS_BATCH_OUTPUT_DIR, default batch_output/<file name>) and gets a
+    stable run id, so re-running the same file skips completed topics and
+    resumes failed ones from their task checkpoints.
+    """
+    workers = workers or int(os.getenv('MARS_BATCH_WORKERS', '2'))
+    name = os.path.splitext(os.path.basename(path))[0]
+    output_root = output_root or os.getenv('MARS_BATCH_OUTPUT_DIR') or os.path.join(os.getcwd(), 'batch_output', name)
+    rows = load_topics(path)
+    ledger = BatchLedger(os.path.join(output_root, 'ledger.jsonl'))
+    state = ledger.state()
+
+    pending = []
+    for index, inputs in enumerate(rows, start=1):
+        key = make_key('batch', inputs)
+        if state.get(key, {}).get('status') == 'completed':
+            continue
+        slug = f"{index:03d}-{topic_slug(inputs['topic'])}"
+        pending.append((key, inputs, os.path.join(output_root, slug), f"{name}-{slug}-{key[:8]}"))
+
+    counts = {'total': len(rows), 'skipped': len(rows) - len(pending), 'completed': 0, 'failed': 0}
+    print(f"📚 Batch {name}: {len(rows)} topics, {counts['skipped']} already completed, "
+          f"{len(pending)} to run on {workers} worker processes")
+    print(f"📒 Ledger: {ledger.path}")
+    if not pending:
+        return counts
+
+    batch_started = time.time()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(split_limits(workers),)) as pool:
+        futures = {}
+        for key, inputs, output_dir, run_id in pending:
+            ledger.record(key, 'queued', topic=inputs['topic'], run_id=run_id, output_dir=output_dir)
+            futures[pool.submit(run_topic, inputs, output_dir, run_id)] = (key, inputs, output_dir, run_id)
+        for future in as_completed(futures):
+            key, inputs, output_dir, run_id = futures[future]
+            try:
+                outcome = future.result()
+            except Exception as e:
+                # The worker process itself died
+                outcome = {'status': 'failed', 'error': str(e), 'wall_time': None}
+            ledger.record(key, outcome['status'], topic=inputs['topic'], run_id=run_id,
+                          output_dir=output_dir, error=outcome['error'], wall_time=outcome['wall_time'])
+            counts[outcome['status']] += 1
+            done = counts['completed'] + counts['failed']
+            icon = '✅' if outcome['status'] == 'completed' else '❌'
+            detail = f" - {outcome['error']}" if outcome['error'] else ''
+            print(f"{icon} [{done}/{len(pending)}] {inputs['topic']}{detail}", flush=True)
+
+    print(f"🏁 Batch finished in {time.time() - batch_started:.1f}s: {counts['completed']} completed, "
+          f"{counts['failed']} failed, {counts['skipped']} skipped")
+    if counts['failed']:
+        print("🔄 Run the same command again to retry the failed topics")
+    return counts
@@ -0,0 +1,62 @@
+import io
+import os
+import time
+import zipfile
+from typing import Iterable, Iterator, Tuple, Union
+
+
+CHUNK_SIZE = 64 * 1024
+
+# Already compressed; deflating them again only costs CPU
+STORED_EXTENSIONS = ('.pdf', '.png', '.jpg', '.jpeg', '.zip', '.gz')
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only, unseekable sink collecting what ZipFile writes until it is drained."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_zip(entries: Iterable[Tuple[str, Union[str, bytes, os.PathLike]]],
+               chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Stream a ZIP archive of `entries` chunk by chunk.
+
+    Each entry is `(name in the archive, source)`, where `source` is the
+    file's content (str or bytes) or a `Path` to a file on disk. Files on
+    disk are copied `chunk_size` bytes at a time and the archive is never
+    seeked, so memory use stays at about one chunk whatever its size.
+    `entries` may be a generator, producing each file only when it is due.
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, 'w') as archive:
+        for name, source in entries:
+            info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+            info.compress_type = zipfile.ZIP_STORED if name.lower().endswith(STORED_EXTENSIONS) \
+                else zipfile.ZIP_DEFLATED
+            with archive.open(info, 'w') as dest:
+                if isinstance(source, os.PathLike):
+                    with open(source, 'rb') as f:
+                        for chunk in iter(lambda: f.read(chunk_size), b''):
+                            dest.write(chunk)
+                            yield sink.drain()
+                else:
+                    dest.write(source.encode('utf-8') if isinstance(source, str) else source)
+            yield sink.drain()
+    # Central directory
+    yield sink.drain()
+
@@ -0,0 +1,125 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+
+
+CACHE_DIR = os.getenv('MARS_CACHE_DIR', os.path.join(os.getcwd(), '.mars_cache'))
+
+
+def make_key(*parts) -> str:
+    """Stable sha256 key for any JSON-serializable parts."""
+    payload = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class SQLiteCache:
+    """
+    Small on-disk key/value cache backed by SQLite.
+
+    Entries expire `ttl` seconds after they were written and the least recently
+    used entries are evicted once `max_entries` or `max_bytes` is exceeded.
+    Values must be JSON-serializable. Safe to share between threads.
+    """
+
+    def __init__(self, path: str, ttl: Optional[float] = None,
+                 max_entries: Optional[int] = None, max_bytes: Optional[int] = None):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at)")
+
+    def get(self, key: str, default: Any = None) -> Any:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return default
+            value, created_at = row
+            if self.ttl is not None and created_at + self.ttl < now:
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self.expired += 1
+                self.misses += 1
+                return default
+            self._conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        return json.loads(value)
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT created_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+        return row is not None and (self.ttl is None or row[0] + self.ttl >= time.time())
+
+    def set(self, key: str, value: Any) -> None:
+        data = json.dumps(value, default=str, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, created_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, data, len(data.encode('utf-8')), now, now),
+            )
+            self._evict()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+
+    def _evict(self) -> None:
+        if self.ttl is not None:
+            self._conn.execute("DELETE FROM entries WHERE created_at < ?", (time.time() - self.ttl,))
+        count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        while (self.max_entries is not None and count > self.max_entries) or \
+                (self.max_bytes is not None and total > self.max_bytes and count > 1):
+            key, size = self._conn.execute(
+                "SELECT key, size FROM entries ORDER BY accessed_at LIMIT 1"
+            ).fetchone()
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self.evictions += 1
+            count -= 1
+            total -= size
+
+    def stats(self) -> dict:
+        with self._lock:
+            count, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 3) if lookups else 0.0,
+            'expired': self.expired,
+            'evictions': self.evictions,
+            'entries': count,
+            'bytes': total,
+        }
@@ -0,0 +1,39 @@
+import threading
+import time
+from typing import Callable, Optional
+
+
+class RunCancelled(Exception):
+    """Raised at a cancellation checkpoint once a run has been cancelled."""
+
+
+class CancelToken:
+    """
+    Cooperative cancellation flag for one run.
+
+    Long-running work calls `check()` between units of work (LLM calls, tool
+    calls, tasks), which raises RunCancelled once `cancel()` was called or,
+    for runs cancelled from another process, once `is_requested` returns True.
+    """
+
+    def __init__(self, is_requested: Optional[Callable[[], bool]] = None):
+        self.is_requested = is_requested
+        self.requested_at: Optional[float] = None
+        self.reason = 'Cancelled'
+        self._event = threading.Event()
+
+    def cancel(self, reason: str = 'Cancelled') -> None:
+        if not self._event.is_set():
+            self.requested_at = time.time()
+            self.reason = reason
+            self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        if not self._event.is_set() and self.is_requested is not None and self.is_requested():
+            self.cancel()
+        return self._event.is_set()
+
+    def check(self) -> None:
+        if self.cancelled:
+            raise RunCancelled(self.reason)
@@ -0,0 +1,118 @@
+import json
+import os
+import tempfile
+import time
+from typing import Dict, Optional
+
+from .cache import make_key
+from .instrumentation import RUNS_DIR
+
+
+def _write_json(path: str, data: dict) -> None:
+    """Write JSON atomically so a crash never leaves a half-written checkpoint."""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2, default=str)
+    os.replace(tmp_path, path)
+
+
+def inputs_hash(inputs: dict) -> str:
+    return make_key('inputs', inputs)
+
+
+class RunCheckpoint:
+    """
+    Durable record of a crew run in `runs/<run_id>/`.
+
+    `run.json` holds the run inputs and status and `tasks/<task>.json` holds
+    each completed task's output as soon as the task finishes, so a failed run
+    can be resumed in a new process without re-running finished tasks.
+    """
+
+    def __init__(self, run_id: str, directory: Optional[str] = None):
+        self.run_id = run_id
+        self.run_dir = os.path.join(directory or RUNS_DIR, run_id)
+        self.tasks_dir = os.path.join(self.run_dir, 'tasks')
+        self.run_path = os.path.join(self.run_dir, 'run.json')
+        self.inputs_hash = None
+
+    @classmethod
+    def load(cls, run_id: str, directory: Optional[str] = None) -> "RunCheckpoint":
+        checkpoint = cls(run_id, directory)
+        if not os.path.exists(checkpoint.run_path):
+            raise FileNotFoundError(f"No checkpoint found for run '{run_id}' in {checkpoint.run_dir}")
+        checkpoint.inputs_hash = checkpoint.read_run().get('inputs_hash')
+        return checkpoint
+
+    def read_run(self) -> dict:
+        with open(self.run_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def start(self, inputs: dict, **metadata) -> None:
+        run = self.read_run() if os.path.exists(self.run_path) else {
+            'run_id': self.run_id,
+            'inputs': inputs,
+            'inputs_hash': inputs_hash(inputs),
+            'created_at': time.time(),
+        }
+        run.update(metadata, status='running', updated_at=time.time())
+        self.inputs_hash = run['inputs_hash']
+        _write_json(self.run_path, run)
+
+    def finish(self, error: Optional[Exception] = None) -> None:
+        run = self.read_run()
+        run.update(
+            status='failed' if error else 'completed',
+            error=str(error) if error else None,
+            updated_at=time.time(),
+        )
+        _write_json(self.run_path, run)
+
+    def save_task(self, output) -> None:
+        """Persist a finished TaskOutput (usable as a crewAI task callback)."""
+        raw = output.raw or ''
+        _write_json(os.path.join(self.tasks_dir, f"{output.name}.json"), {
+            'name': output.name,
+            'agent': output.agent,
+            'description': output.description,
+            'summary': output.summary,
+            'raw': raw,
+            'output_hash': make_key('output', raw),
+            'inputs_hash': self.inputs_hash,
+            'completed_at': time.time(),
+        })
+
+    def completed_tasks(self) -> Dict[str, dict]:
+        """Completed task records by task name."""
+        records = {}
+        if not os.path.isdir(self.tasks_dir):
+            return records
+        for filename in sorted(os.listdir(self.tasks_dir)):
+            if filename.endswith('.json'):
+                with open(os.path.join(self.tasks_dir, filename), 'r', encoding='utf-8') as f:
+                    record = json.load(f)
+                records[record['name']] = record
+        return records
+
+    def completed_outputs(self) -> dict:
+        """Completed tasks rebuilt as crewAI TaskOutput objects."""
+        return {
+            name: task_output_from_record(record)
+            for name, record in self.completed_tasks().items()
+            if record.get('inputs_hash') == self.inputs_hash
+        }
+
+
+def task_output_from_record(record: dict):
+    """Rebuild a crewAI TaskOutput from a persisted task record."""
+    from crewai.tasks.task_output import TaskOutput
+
+    return TaskOutput(
+        name=record['name'],
+        description=record['description'],
+        summary=record.get('summary'),
+        raw=record['raw'],
+        agent=record['agent'],
+    )
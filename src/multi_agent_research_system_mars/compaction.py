@@ -0,0 +1,109 @@
+import os
+import re
+from typing import Dict, List, Optional
+
+from .cache import CACHE_DIR, SQLiteCache, make_key
+from .tokens import count_tokens
+
+
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+_BULLET = re.compile(r'^\s*([-*•]|\d+[.)])\s+')
+
+_digest_store = None
+
+
+def get_digest_store() -> SQLiteCache:
+    """Process-wide on-disk store of task output digests."""
+    global _digest_store
+    if _digest_store is None:
+        _digest_store = SQLiteCache(
+            os.path.join(CACHE_DIR, 'digests.sqlite3'),
+            max_entries=int(os.getenv('MARS_DIGEST_CACHE_MAX_ENTRIES', '2000')),
+        )
+    return _digest_store
+
+
+def digest_markdown(text: str, budget: int) -> str:
+    """
+    Extractive digest of a markdown report that fits in `budget` tokens.
+
+    Headings are kept first, then the lead sentence of each paragraph, then
+    the first bullets of each list, always in document order.
+    """
+    if count_tokens(text) <= budget:
+        return text
+
+    candidates = []  # (priority, block position, order in block, line)
+    for position, block in enumerate(re.split(r'\n\s*\n', text)):
+        lines = [line.rstrip() for line in block.strip().splitlines() if line.strip()]
+        if not lines:
+            continue
+        if lines[0].lstrip().startswith('#'):
+            candidates.append((0, position, 0, lines[0].strip()))
+            lines = lines[1:]
+        bullets = [line for line in lines if _BULLET.match(line)]
+        prose = ' '.join(line.strip() for line in lines if not _BULLET.match(line))
+        if prose:
+            candidates.append((1, position, 1, _SENTENCE_END.split(prose, 1)[0]))
+        for i, bullet in enumerate(bullets[:3]):
+            candidates.append((2 + i, position, 2 + i, bullet.strip()))
+
+    chosen = []
+    used = 0
+    for candidate in sorted(candidates):
+        cost = count_tokens(candidate[3]) + 1
+        if used + cost > budget:
+            continue
+        chosen.append(candidate)
+        used += cost
+    chosen.sort(key=lambda c: (c[1], c[2]))
+    return '\n'.join(c[3] for c in chosen)
+
+
+class ContextCompactor:
+    """
+    Replace the upstream outputs fed to fan-in tasks with cached digests.
+
+    A task is fan-in when its context lists at least `fan_in` tasks; each of its
+    upstream outputs is then cut down to `budget` tokens. Digests are computed
+    once per (output, budget) and kept in the digest store.
+    """
+
+    def __init__(self, budget: Optional[int] = None, fan_in: Optional[int] = None,
+                 store: Optional[SQLiteCache] = None):
+        self.budget = budget or int(os.getenv('MARS_CONTEXT_BUDGET', '1500'))
+        self.fan_in = fan_in or int(os.getenv('MARS_COMPACT_FAN_IN', '4'))
+        self.store = store or get_digest_store()
+        # task name -> (prompt tokens before, prompt tokens after)
+        self.token_counts: Dict[str, tuple] = {}
+
+    def applies_to(self, dependencies: List[str]) -> bool:
+        return self.budget > 0 and len(dependencies) >= self.fan_in
+
+    def digest(self, text: str) -> str:
+        key = make_key('digest', self.budget, text)
+        digest = self.store.get(key)
+        if digest is None:
+            digest = digest_markdown(text, self.budget)
+            self.store.set(key, digest)
+        return digest
+
+    def compact(self, task_name: str, upstream: Dict[str, str], divider: str) -> str:
+        """Build the compacted context for `task_name` from its upstream outputs."""
+        full = divider.join(upstream.values())
+        sections = []
+        for name, text in upstream.items():
+            digest = self.digest(text)
+            if digest != text:
+                digest += f"\n[Digest of '{name}'; use the Upstream Report Reader tool for the full text]"
+            sections.append(digest)
+        compacted = divider.join(sections)
+        self.token_counts[task_name] = (count_tokens(full), count_tokens(compacted))
+        return compacted
+
+    def format(self) -> str:
+        lines = ["🗜️ Context compaction (prompt tokens before -> after)"]
+        for name, (before, after) in self.token_counts.items():
+            saved = 1 - after / before if before else 0.0
+            lines.append(f"   {name}: {before} -> {after} ({saved:.0%} saved)")
+        return "\n".join(lines)
@@ -1,14 +1,20 @@
 import os
 from dotenv import load_dotenv
 
-from crewai import LLM
 from crewai import Agent, Crew, Process, Task
 from crewai.project import CrewBase, agent, crew, task
-from crewai_tools import (
-	SerperDevTool,
-	VisionTool
-)
+from crewai_tools import VisionTool
 
+from .cancellation import CancelToken
+from .checkpoint import RunCheckpoint
+from .instrumentation import RunRecorder
+from .llm import LLMResponseCache, MarsLLM
+from .pdf_renderer import get_wkhtmltopdf_pool
+from .rate_limit import rate_limit_metrics
+from .singleflight import SingleFlight
+from .tools.cached_search_tool import CachedSearchTool, get_search_cache
+from .tools.coalescing_tool import CoalescingTool
+from .tools.instrumented_tool import InstrumentedTool
 from .tools.gmail_tool import gmail_tool
 from .tools.pdf_generator_tool import pdf_generator_tool
 
@@ -22,6 +28,52 @@ load_dotenv(config_path)
 class MultiAgentResearchSystemMarsCrew:
     """MultiAgentResearchSystemMars crew"""
 
+    def __init__(self, llm_cache_mode=None, run_id=None, cancel_token=None):
+        # Per-run group shared by all agents' tools to coalesce duplicate calls
+        self.tool_calls = SingleFlight()
+        # Per-run view of the LLM response cache (off / read-write / read-only)
+        self.llm_cache = LLMResponseCache(llm_cache_mode)
+        # Per-run task, LLM and tool call instrumentation (runs/<run_id>/metrics.jsonl)
+        self.recorder = RunRecorder(run_id)
+        self.run_id = self.recorder.run_id
+        # Completed task outputs are persisted to runs/<run_id>/tasks/ for resume
+        self.checkpoint = RunCheckpoint(self.run_id)
+        # Checked before every LLM and tool call so a cancelled run stops between calls
+        self.cancel_token = cancel_token or CancelToken()
+        # Agent name -> model and temperature of its LLM, part of memoized task fingerprints
+        self.llm_settings = {}
+
+    def build_llm(self, agent_name, **kwargs) -> MarsLLM:
+        """LLM for an agent, answering from the run's response cache when enabled."""
+        llm = MarsLLM(response_cache=self.llm_cache, recorder=self.recorder, agent_name=agent_name,
+                      cancel_token=self.cancel_token, **kwargs)
+        self.llm_settings[agent_name] = {'model': llm.model, 'temperature': llm.temperature}
+        return llm
+
+    def wrap_tool(self, agent_name, tool):
+        """
+        Wrap an agent's tool so its calls are recorded and identical concurrent
+        calls from any agent share one call.
+        """
+        coalesced = CoalescingTool(tool, group=self.tool_calls)
+        return InstrumentedTool(coalesced, recorder=self.recorder, agent_name=agent_name,
+                                cancel_token=self.cancel_token)
+
+    def task_completed(self, output) -> None:
+        """Crew task callback: checkpoint the output, then record it."""
+        self.checkpoint.save_task(output)
+        self.recorder.task_completed(output)
+
+    def run_metrics(self) -> dict:
+        """Cache and tool-call metrics for this run."""
+        return {
+            'search_cache': get_search_cache().stats(),
+            'tool_calls': self.tool_calls.stats(),
+            'llm_cache': self.llm_cache.stats(),
+            'rate_limits': rate_limit_metrics(),
+            'pdf_renders': get_wkhtmltopdf_pool().stats(),
+        }
+
     
     @agent
     def research_coordinator(self) -> Agent:
@@ -41,7 +93,8 @@ class MultiAgentResearchSystemMarsCrew:
             max_iter=25,
             max_rpm=None,
             max_execution_time=None,
-            llm=LLM(
+            llm=self.build_llm(
+                "research_coordinator",
                 model="gpt-4o-mini",
                 temperature=0.7,
             ),
@@ -57,7 +110,7 @@ class MultiAgentResearchSystemMarsCrew:
             
             
             tools=[
-				SerperDevTool()
+				self.wrap_tool("technology_research_agent", CachedSearchTool())
             ],
             reasoning=False,
             max_reasoning_attempts=None,
@@ -66,7 +119,8 @@ class MultiAgentResearchSystemMarsCrew:
             max_iter=25,
             max_rpm=None,
             max_execution_time=None,
-            llm=LLM(
+            llm=self.build_llm(
+                "technology_research_agent",
                 model="gpt-4o-mini",
                 temperature=0.7,
             ),
@@ -82,7 +136,7 @@ class MultiAgentResearchSystemMarsCrew:
             
             
             tools=[
-				SerperDevTool()
+				self.wrap_tool("market_research_agent", CachedSearchTool())
             ],
             reasoning=False,
             max_reasoning_attempts=None,
@@ -91,7 +145,8 @@ class MultiAgentResearchSystemMarsCrew:
             max_iter=25,
             max_rpm=None,
             max_execution_time=None,
-            llm=LLM(
+            llm=self.build_llm(
+                "market_research_agent",
                 model="gpt-4o-mini",
                 temperature=0.7,
             ),
@@ -107,7 +162,7 @@ class MultiAgentResearchSystemMarsCrew:
             
             
             tools=[
-				SerperDevTool()
+				self.wrap_tool("technical_feasibility_agent", CachedSearchTool())
             ],
             reasoning=False,
             max_reasoning_attempts=None,
@@ -116,7 +171,8 @@ class MultiAgentResearchSystemMarsCrew:
             max_iter=25,
             max_rpm=None,
             max_execution_time=None,
-            llm=LLM(
+            llm=self.build_llm(
+                "technical_feasibility_agent",
                 model="gpt-4o-mini",
                 temperature=0.7,
             ),
@@ -141,7 +197,8 @@ class MultiAgentResearchSystemMarsCrew:
             max_iter=25,
             max_rpm=None,
             max_execution_time=None,
-            llm=LLM(
+            llm=self.build_llm(
+                "documentation_specialist",
                 model="gpt-4o-mini",
                 temperature=0.7,
             ),
@@ -166,7 +223,8 @@ class MultiAgentResearchSystemMarsCrew:
             max_iter=25,
             max_rpm=None,
             max_execution_time=None,
-            llm=LLM(
+            llm=self.build_llm(
+                "visualization_specialist",
                 model="gpt-4o-mini",
                 temperature=0.7,
             ),
@@ -182,7 +240,7 @@ class MultiAgentResearchSystemMarsCrew:
             
             
             tools=[
-				SerperDevTool()
+				self.wrap_tool("validation_agent", CachedSearchTool())
             ],
             reasoning=False,
             max_reasoning_attempts=None,
@@ -191,7 +249,8 @@ class MultiAgentResearchSystemMarsCrew:
             max_iter=25,
             max_rpm=None,
             max_execution_time=None,
-            llm=LLM(
+            llm=self.build_llm(
+                "validation_agent",
                 model="gpt-4o-mini",
                 temperature=0.7,
             ),
@@ -207,7 +266,7 @@ class MultiAgentResearchSystemMarsCrew:
             
             
             tools=[
-				SerperDevTool()
+				self.wrap_tool("patent_ip_research_agent", CachedSearchTool())
             ],
             reasoning=False,
             max_reasoning_attempts=None,
@@ -216,7 +275,8 @@ class MultiAgentResearchSystemMarsCrew:
             max_iter=25,
             max_rpm=None,
             max_execution_time=None,
-            llm=LLM(
+            llm=self.build_llm(
+                "patent_ip_research_agent",
                 model="gpt-4o-mini",
                 temperature=0.7,
             ),
@@ -232,7 +292,7 @@ class MultiAgentResearchSystemMarsCrew:
             
             
             tools=[
-				SerperDevTool()
+				self.wrap_tool("financial_analysis_agent", CachedSearchTool())
             ],
             reasoning=False,
             max_reasoning_attempts=None,
@@ -241,7 +301,8 @@ class MultiAgentResearchSystemMarsCrew:
             max_iter=25,
             max_rpm=None,
             max_execution_time=None,
-            llm=LLM(
+            llm=self.build_llm(
+                "financial_analysis_agent",
                 model="gpt-4o-mini",
                 temperature=0.7,
             ),
@@ -257,8 +318,8 @@ class MultiAgentResearchSystemMarsCrew:
             
             
             tools=[
-				VisionTool(),
-				SerperDevTool()
+				self.wrap_tool("user_experience_research_agent", VisionTool()),
+				self.wrap_tool("user_experience_research_agent", CachedSearchTool())
             ],
             reasoning=False,
             max_reasoning_attempts=None,
@@ -267,7 +328,8 @@ class MultiAgentResearchSystemMarsCrew:
             max_iter=25,
             max_rpm=None,
             max_execution_time=None,
-            llm=LLM(
+            llm=self.build_llm(
+                "user_experience_research_agent",
                 model="gpt-4o-mini",
                 temperature=0.7,
             ),
@@ -283,7 +345,7 @@ class MultiAgentResearchSystemMarsCrew:
             
             
             tools=[
-				SerperDevTool()
+				self.wrap_tool("regulatory_compliance_agent", CachedSearchTool())
             ],
             reasoning=False,
             max_reasoning_attempts=None,
@@ -292,7 +354,8 @@ class MultiAgentResearchSystemMarsCrew:
             max_iter=25,
             max_rpm=None,
             max_execution_time=None,
-            llm=LLM(
+            llm=self.build_llm(
+                "regulatory_compliance_agent",
                 model="gpt-4o-mini",
                 temperature=0.7,
             ),
@@ -306,7 +369,7 @@ class MultiAgentResearchSystemMarsCrew:
             
             
             tools=[
-                pdf_generator_tool
+                self.wrap_tool("pdf_document_generator", pdf_generator_tool)
             ],
             reasoning=False,
             max_reasoning_attempts=None,
@@ -315,7 +378,8 @@ class MultiAgentResearchSystemMarsCrew:
             max_iter=25,
             max_rpm=None,
             max_execution_time=None,
-            llm=LLM(
+            llm=self.build_llm(
+                "pdf_document_generator",
                 model="gpt-4o-mini",
                 temperature=0.7,
             ),
@@ -329,7 +393,7 @@ class MultiAgentResearchSystemMarsCrew:
             
             
             tools=[
-				gmail_tool
+				self.wrap_tool("email_distribution_agent", gmail_tool)
             ],
             reasoning=False,
             max_reasoning_attempts=None,
@@ -338,7 +402,8 @@ class MultiAgentResearchSystemMarsCrew:
             max_iter=25,
             max_rpm=None,
             max_execution_time=None,
-            llm=LLM(
+            llm=self.build_llm(
+                "email_distribution_agent",
                 model="gpt-4o-mini",
                 temperature=0.7,
             ),
@@ -473,6 +538,7 @@ class MultiAgentResearchSystemMarsCrew:
             tasks=self.tasks,  # Automatically created by the @task decorator
             process=Process.sequential,
             verbose=True,
+            task_callback=self.task_completed,
         )
 
     def _load_response_format(self, name):
@@ -0,0 +1,135 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .cache import CACHE_DIR
+from .scheduler import TaskGraph
+
+
+# Percentiles of the historical task durations behind (low, expected, high)
+ETA_PERCENTILES = (0.1, 0.5, 0.9)
+
+
+def percentile(samples: List[float], p: float) -> float:
+    """Nearest-rank percentile of sorted `samples`."""
+    return samples[min(len(samples) - 1, int(p * len(samples)))]
+
+
+class DurationHistory:
+    """
+    Per-task durations of past runs, kept in SQLite so every process (CLI
+    runs, batch workers, web workers) contributes to and reads one history.
+    Only the latest `max_samples` durations per task are used.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_samples: Optional[int] = None):
+        self.path = path or os.path.join(CACHE_DIR, 'durations.sqlite3')
+        self.max_samples = max_samples or int(os.getenv('MARS_ETA_SAMPLES', '200'))
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS task_durations ("
+            " task TEXT NOT NULL,"
+            " seconds REAL NOT NULL,"
+            " recorded_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS task_durations_task ON task_durations (task, recorded_at)")
+
+    def record(self, task: str, seconds: float) -> None:
+        with self._lock:
+            self._conn.execute("INSERT INTO task_durations (task, seconds, recorded_at) VALUES (?, ?, ?)",
+                               (task, seconds, time.time()))
+            # Samples beyond the window no longer count
+            self._conn.execute(
+                "DELETE FROM task_durations WHERE task = ? AND rowid NOT IN"
+                " (SELECT rowid FROM task_durations WHERE task = ? ORDER BY recorded_at DESC LIMIT ?)",
+                (task, task, self.max_samples),
+            )
+
+    def samples(self, task: str) -> List[float]:
+        """Sorted durations of the latest runs of `task`."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seconds FROM task_durations WHERE task = ? ORDER BY recorded_at DESC LIMIT ?",
+                (task, self.max_samples),
+            ).fetchall()
+        return sorted(row[0] for row in rows)
+
+    def percentiles(self, tasks: Iterable[str]) -> Dict[str, Tuple[float, ...]]:
+        """ETA_PERCENTILES of each task's durations, for tasks with any history."""
+        result = {}
+        for task in tasks:
+            samples = self.samples(task)
+            if samples:
+                result[task] = tuple(percentile(samples, p) for p in ETA_PERCENTILES)
+        return result
+
+
+_duration_history = None
+
+
+def get_duration_history() -> DurationHistory:
+    """Process-wide task duration history."""
+    global _duration_history
+    if _duration_history is None:
+        _duration_history = DurationHistory()
+    return _duration_history
+
+
+class EtaEstimator:
+    """
+    Remaining-time estimate of a run over its task graph.
+
+    Every task still to run takes its historical p10/p50/p90 duration (less
+    the time already spent if it is running; `default_seconds` without any
+    history). The remaining time is the longest dependency chain through
+    those tasks, but at least their total divided by `workers`, since no more
+    than `workers` tasks run at once. The p10 and p90 estimates form the
+    confidence band around the p50 one.
+    """
+
+    def __init__(self, graph: TaskGraph, history: Optional[DurationHistory] = None, workers: int = 1,
+                 default_seconds: Optional[float] = None):
+        self.graph = graph
+        self.history = history or get_duration_history()
+        self.workers = max(1, workers)
+        self.default_seconds = default_seconds if default_seconds is not None else \
+            float(os.getenv('MARS_ETA_DEFAULT_SECONDS', '60'))
+
+    def record(self, task: str, seconds: float) -> None:
+        self.history.record(task, seconds)
+
+    def estimate(self, completed: Iterable[str] = (), running: Optional[Dict[str, float]] = None,
+                 now: Optional[float] = None) -> dict:
+        """
+        ETA given the `completed` tasks and the `running` ones (task name ->
+        start timestamp), in seconds from `now`.
+        """
+        now = now or time.time()
+        completed = set(completed)
+        running = running or {}
+        remaining = [name for name in self.graph.order if name not in completed]
+        stats = self.history.percentiles(remaining)
+        bands = []
+        for index in range(len(ETA_PERCENTILES)):
+            durations = {name: 0.0 for name in completed}
+            for name in remaining:
+                seconds = stats[name][index] if name in stats else self.default_seconds
+                if name in running:
+                    seconds = max(seconds - (now - running[name]), 0.0)
+                durations[name] = seconds
+            _, chain = self.graph.critical_path(durations)
+            bands.append(max(chain, sum(durations.values()) / self.workers))
+        low, expected, high = bands
+        return {
+            'eta_seconds': round(expected, 1),
+            'eta_low': round(low, 1),
+            'eta_high': round(high, 1),
+            'finish_at': round(now + expected, 1),
+            'remaining_tasks': len(remaining),
+            'tasks_with_history': len(stats),
+        }
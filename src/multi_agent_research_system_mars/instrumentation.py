@@ -0,0 +1,196 @@
+import json
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from typing import Dict, Optional
+
+from .scheduler import load_tasks_config
+
+
+RUNS_DIR = os.getenv('MARS_RUNS_DIR', os.path.join(os.getcwd(), 'runs'))
+
+# USD per 1M (prompt, completion) tokens; unknown models are reported at $0
+PRICES_PER_MILLION = {
+    'gpt-4o-mini': (0.15, 0.60),
+    'gpt-4o': (2.50, 10.00),
+    'gpt-4.1-mini': (0.40, 1.60),
+    'gpt-4.1': (2.00, 8.00),
+}
+
+SUMMARY_COLUMNS = (
+    ('wall_time', 'wall s', '{:.1f}'),
+    ('queue_time', 'queue s', '{:.1f}'),
+    ('llm_calls', 'llm', '{}'),
+    ('prompt_tokens', 'prompt tok', '{}'),
+    ('completion_tokens', 'compl tok', '{}'),
+    ('cost', 'cost $', '{:.4f}'),
+    ('retries', 'retries', '{}'),
+    ('tool_calls', 'tools', '{}'),
+)
+
+
+def new_run_id() -> str:
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    prompt_price, completion_price = PRICES_PER_MILLION.get(model.split('/')[-1], (0.0, 0.0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+
+class RunRecorder:
+    """
+    Structured instrumentation for one crew run.
+
+    Every task, LLM call and tool call is appended as a JSON line to
+    `runs/<run_id>/metrics.jsonl` and aggregated per task for the end-of-run
+    summary table. LLM calls and tool calls are attributed to tasks through
+    the agent that made them.
+    """
+
+    def __init__(self, run_id: Optional[str] = None, directory: Optional[str] = None):
+        self.run_id = run_id or new_run_id()
+        self.run_dir = os.path.join(directory or RUNS_DIR, self.run_id)
+        self.path = os.path.join(self.run_dir, 'metrics.jsonl')
+        self.agent_tasks = {
+            config.get('agent'): name for name, config in load_tasks_config().items()
+        }
+        self.stats: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        self._lock = threading.Lock()
+        self._queued: Dict[str, float] = {}
+        self._started: Dict[str, float] = {}
+        self._run_started = self._last_completed = time.time()
+        # Callables receiving every record as it is written (e.g. live progress streams)
+        self.listeners = []
+        # Optional EtaEstimator: task durations feed its history and every task
+        # start and completion emits an `eta` record
+        self.eta = None
+        self.completed_tasks = set()
+
+    def subscribe(self, listener) -> None:
+        self.listeners.append(listener)
+
+    def emit(self, event: str, **fields) -> None:
+        record = {'ts': round(time.time(), 3), 'run_id': self.run_id, 'event': event, **fields}
+        line = json.dumps(record, default=str, ensure_ascii=False)
+        with self._lock:
+            os.makedirs(self.run_dir, exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+        for listener in self.listeners:
+            listener(record)
+
+    def _add(self, task: str, **values) -> None:
+        with self._lock:
+            for key, value in values.items():
+                self.stats[task][key] += value
+
+    def task_for_agent(self, agent_name: str) -> str:
+        return self.agent_tasks.get(agent_name, agent_name)
+
+    # Run
+
+    def run_started(self, **fields) -> None:
+        self._run_started = self._last_completed = time.time()
+        self.emit('run_started', **fields)
+
+    def run_finished(self, error: Optional[Exception] = None) -> None:
+        wall_time = time.time() - self._run_started
+        self.emit('run_finished', wall_time=round(wall_time, 3), error=str(error) if error else None)
+
+    # Tasks
+
+    def task_queued(self, name: str) -> None:
+        self._queued[name] = time.time()
+        self.emit('task_queued', task=name)
+
+    def task_started(self, name: str) -> None:
+        now = time.time()
+        self._started[name] = now
+        queue_time = now - self._queued.get(name, now)
+        self._add(name, queue_time=queue_time)
+        self.emit('task_started', task=name, queue_time=round(queue_time, 3))
+        self.emit_eta()
+
+    def task_completed(self, output) -> None:
+        """crewAI task callback; also used by the parallel runner."""
+        name = getattr(output, 'name', None) or 'unknown'
+        now = time.time()
+        # Sequential runs have no explicit start: the task began when the previous one ended
+        started = self._started.pop(name, self._last_completed)
+        self._last_completed = now
+        self._add(name, wall_time=now - started)
+        raw = getattr(output, 'raw', '') or ''
+        self.emit('task_completed', task=name, wall_time=round(now - started, 3), output_chars=len(raw))
+        self.completed_tasks.add(name)
+        if self.eta is not None:
+            self.eta.record(name, now - started)
+            self.emit_eta()
+
+    def mark_completed(self, names) -> None:
+        """Tasks restored from a checkpoint or memo, which no longer count towards the ETA."""
+        self.completed_tasks.update(names)
+
+    def emit_eta(self) -> None:
+        if self.eta is not None:
+            self.emit('eta', **self.eta.estimate(self.completed_tasks, dict(self._started)))
+
+    def task_failed(self, name: str, error: Exception) -> None:
+        started = self._started.pop(name, self._last_completed)
+        self._add(name, wall_time=time.time() - started)
+        self.emit('task_failed', task=name, error=str(error))
+
+    # Calls
+
+    def llm_call(self, agent_name: str, model: str, seconds: float, prompt_tokens: int,
+                 completion_tokens: int, cached: bool = False, error: Optional[str] = None) -> None:
+        task = self.task_for_agent(agent_name)
+        cost = 0.0 if cached else estimate_cost(model, prompt_tokens, completion_tokens)
+        self._add(
+            task,
+            llm_calls=1,
+            llm_time=seconds,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            cost=cost,
+            retries=1 if error else 0,
+        )
+        self.emit(
+            'llm_call', task=task, agent=agent_name, model=model, seconds=round(seconds, 3),
+            prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+            cost=round(cost, 6), cached=cached, error=error,
+        )
+
+    def llm_retry(self, agent_name: str, model: str, error: str) -> None:
+        task = self.task_for_agent(agent_name)
+        self._add(task, retries=1)
+        self.emit('llm_retry', task=task, agent=agent_name, model=model, error=error)
+
+    def tool_call(self, agent_name: str, tool: str, seconds: float, error: Optional[str] = None) -> None:
+        task = self.task_for_agent(agent_name)
+        self._add(task, tool_calls=1, tool_time=seconds, retries=1 if error else 0)
+        self.emit('tool_call', task=task, agent=agent_name, tool=tool,
+                  seconds=round(seconds, 3), error=error)
+
+    # Summary
+
+    def totals(self) -> Dict[str, float]:
+        totals = defaultdict(float)
+        for values in self.stats.values():
+            for key, value in values.items():
+                totals[key] += value
+        return dict(totals)
+
+    def format_summary(self) -> str:
+        """Per-task summary table, slowest task first."""
+        name_width = max([len(name) for name in self.stats] + [len('total')])
+        header = ' '.join([f"{'task':<{name_width}}"] + [f"{label:>10}" for _, label, _ in SUMMARY_COLUMNS])
+        lines = [f"⏱️ Run {self.run_id} instrumentation ({self.path})", header, '-' * len(header)]
+        rows = sorted(self.stats.items(), key=lambda item: item[1].get('wall_time', 0.0), reverse=True)
+        for name, values in rows + [('total', self.totals())]:
+            cells = [fmt.format(float(values.get(key, 0)) if '.' in fmt else int(values.get(key, 0)))
+                     for key, _, fmt in SUMMARY_COLUMNS]
+            lines.append(' '.join([f"{name:<{name_width}}"] + [f"{cell:>10}" for cell in cells]))
+        return '\n'.join(lines)
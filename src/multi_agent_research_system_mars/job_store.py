@@ -0,0 +1,453 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from .cache import CACHE_DIR
+
+
+# ORDER BY columns of the queue for each job order, also compared as a row value for positions
+QUEUE_ORDER = {
+    'fifo': 'seq',
+    'shortest': 'COALESCE(estimated_seconds, 0), seq',
+}
+
+
+class SQLiteJobStore:
+    """
+    Job state, progress events and results shared between processes through SQLite.
+
+    Web workers insert queued jobs and read state and events; a separate
+    worker process claims queued jobs in FIFO (or shortest-first) order and
+    writes their progress.
+    Every thread of every process gets its own connection, so the store is
+    safe to create before a pre-forking server forks.
+
+    Each job's task outputs and artifact paths are kept after it finishes, and
+    the outputs are indexed with FTS5 (when SQLite is built with it) so past
+    research can be searched instead of run again.
+    """
+
+    def __init__(self, path: Optional[str] = None, poll_interval: float = 0.25):
+        self.path = path or os.getenv('MARS_JOB_DB') or os.path.join(CACHE_DIR, 'jobs.sqlite3')
+        self.poll_interval = poll_interval
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " id TEXT UNIQUE NOT NULL,"
+            " owner TEXT,"
+            " state TEXT NOT NULL,"
+            " status TEXT,"
+            " data TEXT NOT NULL,"
+            " error TEXT,"
+            " created_at REAL NOT NULL,"
+            " started_at REAL,"
+            " finished_at REAL,"
+            " last_event_id INTEGER NOT NULL DEFAULT 0)"
+        )
+        self._add_columns(conn, 'jobs', {'dedupe_key': 'TEXT', 'cancel_requested_at': 'REAL',
+                                         'progress': 'TEXT', 'estimated_seconds': 'REAL'})
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, seq)")
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_owner ON jobs (owner, seq)")
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_dedupe ON jobs (dedupe_key, seq)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS job_subscribers ("
+            " job_id TEXT NOT NULL,"
+            " owner TEXT,"
+            " recipient_email TEXT,"
+            " delivered INTEGER NOT NULL DEFAULT 0,"
+            " created_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS job_subscribers_job ON job_subscribers (job_id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS job_subscribers_owner ON job_subscribers (owner)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS job_events ("
+            " job_id TEXT NOT NULL,"
+            " id INTEGER NOT NULL,"
+            " record TEXT NOT NULL,"
+            " PRIMARY KEY (job_id, id))"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS job_outputs ("
+            " job_id TEXT NOT NULL,"
+            " task TEXT NOT NULL,"
+            " output TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " PRIMARY KEY (job_id, task))"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS job_artifacts ("
+            " job_id TEXT NOT NULL,"
+            " name TEXT NOT NULL,"
+            " kind TEXT NOT NULL,"
+            " path TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " PRIMARY KEY (job_id, name))"
+        )
+        try:
+            conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS job_outputs_fts USING fts5("
+                " topic, task, output, job_id UNINDEXED)"
+            )
+            self.fts = True
+        except sqlite3.OperationalError:
+            # SQLite built without FTS5: search falls back to LIKE
+            self.fts = False
+
+    @staticmethod
+    def _add_columns(conn: sqlite3.Connection, table: str, columns: dict) -> None:
+        """Add columns introduced after a database was created."""
+        existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+        for name, sql_type in columns.items():
+            if name not in existing:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {sql_type}")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _job_from_row(self, row):
+        from .jobs import Job
+
+        return Job(id=row['id'], owner=row['owner'], data=json.loads(row['data']), state=row['state'],
+                   status=row['status'], error=row['error'], created_at=row['created_at'],
+                   started_at=row['started_at'], finished_at=row['finished_at'],
+                   last_event_id=row['last_event_id'], dedupe_key=row['dedupe_key'],
+                   cancel_requested_at=row['cancel_requested_at'], estimated_seconds=row['estimated_seconds'],
+                   progress=json.loads(row['progress']) if row['progress'] else {'completed': [], 'running': {}},
+                   store=self)
+
+    # Jobs
+
+    def insert(self, job) -> None:
+        self._conn().execute(
+            "INSERT INTO jobs (id, owner, state, status, data, error, created_at, started_at, finished_at,"
+            " dedupe_key, progress, estimated_seconds) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (job.id, job.owner, job.state, job.status, json.dumps(job.data, default=str, ensure_ascii=False),
+             job.error, job.created_at, job.started_at, job.finished_at, job.dedupe_key,
+             json.dumps(job.progress), job.estimated_seconds),
+        )
+
+    def save(self, job) -> bool:
+        """
+        Persist what the process running a job owns: its status, data, error
+        and progress. Only a running job is written, so a stale copy held by
+        another process never overwrites a job that moved on.
+        """
+        return self._conn().execute(
+            "UPDATE jobs SET status = ?, data = ?, error = ?, progress = ? WHERE id = ? AND state = 'running'",
+            (job.status, json.dumps(job.data, default=str, ensure_ascii=False), job.error,
+             json.dumps(job.progress), job.id),
+        ).rowcount > 0
+
+    def finish(self, job, state: str) -> bool:
+        """Move a running job to a final `state`; False if it was no longer running."""
+        return self._conn().execute(
+            "UPDATE jobs SET state = ?, status = ?, data = ?, error = ?, progress = ?, finished_at = ?"
+            " WHERE id = ? AND state = 'running'",
+            (state, job.status, json.dumps(job.data, default=str, ensure_ascii=False), job.error,
+             json.dumps(job.progress), job.finished_at, job.id),
+        ).rowcount > 0
+
+    def append_event(self, job_id: str, record: dict) -> dict:
+        """
+        Store one progress event and return it with its id. Ids are allocated
+        in the same transaction, so events of several processes never collide.
+        """
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT last_event_id FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            record = {'id': (row[0] if row else 0) + 1, **record}
+            conn.execute("INSERT INTO job_events (job_id, id, record) VALUES (?, ?, ?)",
+                         (job_id, record['id'], json.dumps(record, default=str, ensure_ascii=False)))
+            conn.execute("UPDATE jobs SET last_event_id = ? WHERE id = ?", (record['id'], job_id))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return record
+
+    def load(self, job_id: str):
+        row = self._conn().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._job_from_row(row) if row else None
+
+    def refresh(self, job) -> None:
+        """Update a loaded job with the state written by the process running it."""
+        row = self._conn().execute(
+            "SELECT state, status, error, started_at, finished_at, last_event_id, cancel_requested_at,"
+            " progress FROM jobs WHERE id = ?",
+            (job.id,),
+        ).fetchone()
+        if row:
+            (job.state, job.status, job.error, job.started_at, job.finished_at, job.last_event_id,
+             job.cancel_requested_at) = tuple(row)[:7]
+            if row['progress']:
+                job.progress = json.loads(row['progress'])
+
+    def jobs_for(self, owner: str, limit: int = 100) -> List:
+        """Jobs started by or attached to `owner`, newest first."""
+        rows = self._conn().execute(
+            "SELECT * FROM jobs WHERE owner = ?"
+            " OR id IN (SELECT job_id FROM job_subscribers WHERE owner = ?)"
+            " ORDER BY seq DESC LIMIT ?", (owner, owner, limit)
+        ).fetchall()
+        return [self._job_from_row(row) for row in rows]
+
+    def jobs_page(self, owner: str, limit: int, offset: int = 0) -> Tuple[List, int]:
+        """One page of the jobs of `owner`, newest first, and the total number of them."""
+        where = "owner = ? OR id IN (SELECT job_id FROM job_subscribers WHERE owner = ?)"
+        conn = self._conn()
+        total = conn.execute(f"SELECT COUNT(*) FROM jobs WHERE {where}", (owner, owner)).fetchone()[0]
+        rows = conn.execute(
+            f"SELECT * FROM jobs WHERE {where} ORDER BY seq DESC LIMIT ? OFFSET ?", (owner, owner, limit, offset)
+        ).fetchall()
+        return [self._job_from_row(row) for row in rows], total
+
+    def queued(self, order: str = 'fifo') -> List:
+        rows = self._conn().execute(
+            f"SELECT * FROM jobs WHERE state = 'queued' ORDER BY {QUEUE_ORDER[order]}"
+        ).fetchall()
+        return [self._job_from_row(row) for row in rows]
+
+    def count_queued(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM jobs WHERE state = 'queued'").fetchone()[0]
+
+    def position(self, job_id: str, order: str = 'fifo') -> int:
+        """1-based queue position of a queued job, 0 once it has started."""
+        columns = QUEUE_ORDER[order]
+        row = self._conn().execute(
+            f"SELECT COUNT(*) FROM jobs WHERE state = 'queued'"
+            f" AND ({columns}) <= (SELECT {columns} FROM jobs WHERE id = ? AND state = 'queued')",
+            (job_id,),
+        ).fetchone()
+        return row[0]
+
+    def claim_next(self, order: str = 'fifo'):
+        """Atomically mark the first queued job in `order` as running and return it, or None."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                f"SELECT * FROM jobs WHERE state = 'queued' ORDER BY {QUEUE_ORDER[order]} LIMIT 1"
+            ).fetchone()
+            if row is not None:
+                conn.execute("UPDATE jobs SET state = 'running', started_at = ? WHERE id = ?",
+                             (time.time(), row['id']))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        if row is None:
+            return None
+        job = self._job_from_row(row)
+        job.state, job.started_at = 'running', time.time()
+        return job
+
+    def fail_interrupted(self, error: str = 'Worker restarted while the job was running') -> int:
+        """Mark jobs left running by a worker that died as failed."""
+        return self._conn().execute(
+            "UPDATE jobs SET state = 'failed', status = ?, error = ?, finished_at = ? WHERE state = 'running'",
+            (f"❌ Error: {error}", error, time.time()),
+        ).rowcount
+
+    # Cancellation
+
+    def request_cancel(self, job_id: str, now: float) -> Optional[str]:
+        """
+        Cancel a queued job outright ('cancelled') or flag a running one for
+        its worker to stop ('requested'); None if the job already finished.
+        """
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            outcome = None
+            if conn.execute(
+                "UPDATE jobs SET state = 'cancelled', status = ?, cancel_requested_at = ?, finished_at = ?"
+                " WHERE id = ? AND state = 'queued'", ("🛑 Cancelled", now, now, job_id)
+            ).rowcount:
+                outcome = 'cancelled'
+            elif conn.execute("SELECT 1 FROM jobs WHERE id = ? AND state = 'running'", (job_id,)).fetchone():
+                conn.execute("UPDATE jobs SET cancel_requested_at = ? WHERE id = ? AND cancel_requested_at IS NULL",
+                             (now, job_id))
+                outcome = 'requested'
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return outcome
+
+    def cancel_requested_at(self, job_id: str) -> Optional[float]:
+        row = self._conn().execute("SELECT cancel_requested_at FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row[0] if row else None
+
+    def requeue(self, job_id: str, estimated_seconds: Optional[float] = None) -> bool:
+        """
+        Move a cancelled or failed job to the back of the queue; False for any
+        other job. Steps that were running when it stopped start over.
+        """
+        return self._conn().execute(
+            "UPDATE jobs SET state = 'queued', status = 'Queued', error = NULL, cancel_requested_at = NULL,"
+            " started_at = NULL, finished_at = NULL, estimated_seconds = ?, seq = (SELECT MAX(seq) + 1 FROM jobs),"
+            " progress = json_set(progress, '$.running', json('{}'))"
+            " WHERE id = ? AND state IN ('cancelled', 'failed')", (estimated_seconds, job_id)
+        ).rowcount > 0
+
+    def cancel_latencies(self, limit: int = 1000) -> Tuple[List[float], int]:
+        """
+        Seconds from cancel request to freed worker for the latest cancelled
+        running jobs, and the number of those cancelled while still queued.
+        """
+        rows = self._conn().execute(
+            "SELECT started_at, finished_at - cancel_requested_at FROM jobs WHERE state = 'cancelled'"
+            " ORDER BY seq DESC LIMIT ?", (limit,)
+        ).fetchall()
+        return [row[1] for row in rows if row[0] is not None], sum(1 for row in rows if row[0] is None)
+
+    # Identical jobs
+
+    def find_reusable(self, dedupe_key: str, window: float):
+        """Newest queued or running job with `dedupe_key`, or one completed within `window` seconds."""
+        row = self._conn().execute(
+            "SELECT * FROM jobs WHERE dedupe_key = ?"
+            " AND (state IN ('queued', 'running') OR (state = 'completed' AND finished_at >= ?))"
+            " ORDER BY seq DESC LIMIT 1",
+            (dedupe_key, time.time() - window),
+        ).fetchone()
+        return self._job_from_row(row) if row else None
+
+    def add_subscriber(self, job_id: str, owner: str, recipient_email: Optional[str]) -> None:
+        self._conn().execute(
+            "INSERT INTO job_subscribers (job_id, owner, recipient_email, created_at) VALUES (?, ?, ?, ?)",
+            (job_id, owner, recipient_email, time.time()),
+        )
+
+    def is_subscriber(self, job_id: str, owner: str) -> bool:
+        return self._conn().execute(
+            "SELECT 1 FROM job_subscribers WHERE job_id = ? AND owner = ? LIMIT 1", (job_id, owner)
+        ).fetchone() is not None
+
+    def claim_undelivered(self, job_id: str) -> List[str]:
+        """Recipient emails of subscribers not yet delivered to, marking them delivered."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                "SELECT rowid, recipient_email FROM job_subscribers WHERE job_id = ? AND delivered = 0",
+                (job_id,),
+            ).fetchall()
+            conn.executemany("UPDATE job_subscribers SET delivered = 1 WHERE rowid = ?",
+                             [(row['rowid'],) for row in rows])
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return [row['recipient_email'] for row in rows if row['recipient_email']]
+
+    # Results
+
+    def save_output(self, job, task: str, output: str) -> None:
+        """Store (or replace) one task output of a job and index it for search."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO job_outputs (job_id, task, output, created_at) VALUES (?, ?, ?, ?)",
+                (job.id, task, output, time.time()),
+            )
+            if self.fts:
+                conn.execute("DELETE FROM job_outputs_fts WHERE job_id = ? AND task = ?", (job.id, task))
+                conn.execute("INSERT INTO job_outputs_fts (topic, task, output, job_id) VALUES (?, ?, ?, ?)",
+                             (job.data.get('topic') or '', task, output, job.id))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def outputs(self, job_id: str) -> Dict[str, str]:
+        rows = self._conn().execute(
+            "SELECT task, output FROM job_outputs WHERE job_id = ? ORDER BY created_at", (job_id,)
+        ).fetchall()
+        return {row['task']: row['output'] for row in rows}
+
+    def add_artifact(self, job_id: str, name: str, kind: str, path: str) -> None:
+        self._conn().execute(
+            "INSERT OR REPLACE INTO job_artifacts (job_id, name, kind, path, created_at) VALUES (?, ?, ?, ?, ?)",
+            (job_id, name, kind, path, time.time()),
+        )
+
+    def artifacts(self, job_id: str) -> List[dict]:
+        rows = self._conn().execute(
+            "SELECT name, kind, path FROM job_artifacts WHERE job_id = ? ORDER BY created_at", (job_id,)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    @staticmethod
+    def _match_query(query: str) -> str:
+        """FTS5 query matching every word of `query` as a prefix, with FTS syntax quoted away."""
+        words = query.split()
+        return ' '.join('"{}"*'.format(word.replace('"', '""')) for word in words)
+
+    def search(self, owner: str, query: str, limit: int, offset: int = 0) -> Tuple[List[dict], int]:
+        """
+        Task outputs of the jobs of `owner` matching every word of `query`,
+        best match first, and the total number of matches.
+        """
+        if not query.split():
+            return [], 0
+        access = "(j.owner = ? OR j.id IN (SELECT job_id FROM job_subscribers WHERE owner = ?))"
+        conn = self._conn()
+        if self.fts:
+            source = ("FROM job_outputs_fts f JOIN jobs j ON j.id = f.job_id"
+                      f" WHERE job_outputs_fts MATCH ? AND {access}")
+            params = (self._match_query(query), owner, owner)
+            select = ("SELECT f.job_id, f.task, j.data, j.state, j.created_at,"
+                      " snippet(job_outputs_fts, 2, '[', ']', '…', 16) AS snippet")
+            order = "ORDER BY bm25(job_outputs_fts)"
+        else:
+            words = query.split()
+            source = ("FROM job_outputs o JOIN jobs j ON j.id = o.job_id WHERE "
+                      + ' AND '.join("o.output LIKE ?" for _ in words) + f" AND {access}")
+            params = tuple(f"%{word}%" for word in words) + (owner, owner)
+            select = "SELECT o.job_id, o.task, j.data, j.state, j.created_at, substr(o.output, 1, 200) AS snippet"
+            order = "ORDER BY j.seq DESC"
+        total = conn.execute(f"SELECT COUNT(*) {source}", params).fetchone()[0]
+        rows = conn.execute(f"{select} {source} {order} LIMIT ? OFFSET ?", params + (limit, offset)).fetchall()
+        return [{
+            'job_id': row['job_id'],
+            'topic': json.loads(row['data']).get('topic'),
+            'task': row['task'],
+            'state': row['state'],
+            'created_at': row['created_at'],
+            'snippet': row['snippet'],
+        } for row in rows], total
+
+    # Events
+
+    def events_after(self, job_id: str, last_id: int) -> List[dict]:
+        rows = self._conn().execute(
+            "SELECT record FROM job_events WHERE job_id = ? AND id > ? ORDER BY id", (job_id, last_id)
+        ).fetchall()
+        return [json.loads(row['record']) for row in rows]
+
+    def wait_events(self, job, last_id: int, timeout: Optional[float] = None) -> List[dict]:
+        """Poll for events newer than `last_id` for up to `timeout` seconds, refreshing the job."""
+        deadline = time.monotonic() + (timeout or 0.0)
+        while True:
+            events = self.events_after(job.id, last_id)
+            self.refresh(job)
+            if events or not job.is_active or time.monotonic() >= deadline:
+                return events
+            time.sleep(self.poll_interval)
@@ -0,0 +1,561 @@
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .cancellation import CancelToken, RunCancelled
+
+
+JOB_STATES = ('queued', 'running', 'completed', 'failed', 'cancelled')
+
+# States a running job ends in
+FINAL_STATES = ('completed', 'failed', 'cancelled')
+
+# Progress events kept per job for replay to reconnecting clients
+EVENT_BUFFER = int(os.getenv('MARS_WEB_EVENT_BUFFER', '500'))
+
+
+def event_stream(job: "Job", last_id: int = 0, keepalive: float = 15.0):
+    """
+    Server-sent event stream of a job's progress, starting after `last_id`
+    (the client's Last-Event-ID) and ending once a finished job has no
+    events left to send.
+    """
+    yield 'retry: 3000\n\n'
+    while True:
+        events = job.events_after(last_id, timeout=keepalive)
+        if not events:
+            if not job.is_active:
+                return
+            # Comment line keeps proxies from closing an idle connection
+            yield ': keepalive\n\n'
+            continue
+        for record in events:
+            last_id = record['id']
+            data = json.dumps(record, default=str, ensure_ascii=False)
+            yield f"id: {record['id']}\nevent: {record['event']}\ndata: {data}\n\n"
+
+
+class JobQueueFull(Exception):
+    """Raised when the job queue is at capacity."""
+
+
+@dataclass
+class Job:
+    """One research job submitted through the web interface."""
+    id: str
+    owner: str
+    # topic, recipient_email, results and timestamp of the research
+    data: dict
+    state: str = 'queued'
+    status: str = 'Queued'
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    events: deque = field(default_factory=lambda: deque(maxlen=EVENT_BUFFER), repr=False)
+    last_event_id: int = 0
+    # Identical research requests share one job through this key
+    dedupe_key: Optional[str] = None
+    # Task names completed so far and running ones with their start timestamp
+    progress: dict = field(default_factory=lambda: {'completed': [], 'running': {}}, repr=False)
+    # Expected run time when queued; orders the queue in shortest-first mode
+    estimated_seconds: Optional[float] = None
+    # When cancellation was requested; a running job stops at its next checkpoint
+    cancel_requested_at: Optional[float] = None
+    # Attached requests: {'owner', 'recipient_email', 'delivered'} (in-memory jobs only)
+    subscribers: List[dict] = field(default_factory=list, repr=False)
+    # Task name -> output text, and artifact name -> path (in-memory jobs only)
+    outputs: Dict[str, str] = field(default_factory=dict, repr=False)
+    artifacts: Dict[str, str] = field(default_factory=dict, repr=False)
+    # Optional SQLiteJobStore the job's state, events and results are persisted to
+    store: Any = field(default=None, repr=False)
+    _events_cond: threading.Condition = field(default_factory=threading.Condition, repr=False)
+
+    @property
+    def is_active(self) -> bool:
+        return self.state in ('queued', 'running')
+
+    def emit(self, event: str, **fields) -> dict:
+        """
+        Append a progress event and wake up every stream waiting on this job.
+        With a store only the event is written, never the job's own columns.
+        """
+        with self._events_cond:
+            record = {'event': event, 'ts': round(time.time(), 3), **fields}
+            if self.store is not None:
+                # The store numbers it, so events of several processes never collide
+                record = self.store.append_event(self.id, record)
+            else:
+                record = {'id': self.last_event_id + 1, **record}
+            self.last_event_id = record['id']
+            self.events.append(record)
+            self._events_cond.notify_all()
+        return record
+
+    def save(self) -> None:
+        """Persist the running job's status, data and progress (with a store)."""
+        if self.store is not None:
+            self.store.save(self)
+
+    def set_status(self, status: str) -> None:
+        self.status = status
+        self.save()
+        self.emit('status', status=status)
+
+    def set_state(self, state: str, **fields) -> bool:
+        """
+        Move the job to `state` and emit it. With a store, only the move of a
+        running job to a final state is written here, and only while the job
+        is still running; claiming, cancelling and requeueing are conditional
+        updates of the store. Returns False (reloading the job) if it was not.
+        """
+        if self.store is not None and state in FINAL_STATES and not self.store.finish(self, state):
+            self.store.refresh(self)
+            return False
+        self.state = state
+        self.emit('state', state=state, status=self.status, **fields)
+        return True
+
+    @property
+    def cancel_requested(self) -> bool:
+        if self.cancel_requested_at is None and self.store is not None:
+            # Requested by a web process
+            self.cancel_requested_at = self.store.cancel_requested_at(self.id)
+        return self.cancel_requested_at is not None
+
+    def check_cancelled(self) -> None:
+        """Cancellation checkpoint: raise RunCancelled if the job was cancelled."""
+        if self.cancel_requested:
+            raise RunCancelled('Cancelled by user')
+
+    def sleep(self, seconds: float) -> None:
+        """Wait up to `seconds`, raising RunCancelled as soon as the job is cancelled."""
+        deadline = time.monotonic() + seconds
+        while True:
+            self.check_cancelled()
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            if self.store is not None:
+                time.sleep(min(remaining, self.store.poll_interval))
+            else:
+                with self._events_cond:
+                    if self.cancel_requested_at is None:
+                        self._events_cond.wait(remaining)
+
+    def cancel_token(self) -> CancelToken:
+        """CancelToken for a crew run on behalf of this job."""
+        return CancelToken(lambda: self.cancel_requested)
+
+    def save_output(self, task: str, output: str) -> None:
+        """Keep one task's output; with a store it is persisted and searchable."""
+        if self.store is not None:
+            self.store.save_output(self, task, output)
+        else:
+            self.outputs[task] = output
+
+    def add_artifact(self, name: str, path: str, kind: str = 'pdf') -> None:
+        """Record the path of a file the job produced."""
+        if self.store is not None:
+            self.store.add_artifact(self.id, name, kind, path)
+        else:
+            self.artifacts[name] = path
+
+    def start_task(self, name: str) -> None:
+        self.progress['running'][name] = time.time()
+        self.save()
+        self.emit('task_started', task=name)
+
+    def finish_task(self, name: str, **fields) -> float:
+        """Mark a task completed and return how long it ran."""
+        now = time.time()
+        seconds = now - self.progress['running'].pop(name, now)
+        if name not in self.progress['completed']:
+            self.progress['completed'].append(name)
+        self.save()
+        self.emit('task_completed', task=name, seconds=round(seconds, 3), **fields)
+        return seconds
+
+    def record_event(self, record: dict) -> None:
+        """RunRecorder listener: forward crew task and tool events to the job stream."""
+        fields = {k: v for k, v in record.items() if k not in ('ts', 'run_id', 'event')}
+        self.emit(record['event'], **fields)
+
+    def events_after(self, last_id: int, timeout: Optional[float] = None) -> List[dict]:
+        """
+        Events newer than `last_id`, waiting up to `timeout` seconds for one to
+        arrive. Events that fell out of the replay buffer are skipped.
+        """
+        if self.store is not None:
+            # Written by another process: read them back from the store
+            return self.store.wait_events(self, last_id, timeout)
+        with self._events_cond:
+            if self.last_event_id <= last_id and self.is_active:
+                self._events_cond.wait(timeout)
+            return [record for record in self.events if record['id'] > last_id]
+
+    def to_dict(self, position: int = 0, eta: Optional[dict] = None) -> dict:
+        return {
+            'job_id': self.id,
+            'state': self.state,
+            'is_running': self.is_active,
+            'status': self.status,
+            'position': position,
+            'topic': self.data.get('topic'),
+            'recipient_email': self.data.get('recipient_email'),
+            'error': self.error,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'cancel_requested_at': self.cancel_requested_at,
+            'completed_tasks': list(self.progress['completed']),
+            'eta': eta,
+        }
+
+
+class JobManager:
+    """
+    Runs research jobs on a bounded pool of worker threads.
+
+    Jobs wait in a FIFO queue (at most `max_queue` of them) and are picked up
+    by `max_workers` workers, so concurrent users no longer serialize behind a
+    single run. Finished jobs are kept for download until `history` newer
+    jobs have been submitted.
+
+    With an `estimator` (EtaEstimator over the runner's steps) running and
+    queued jobs report an ETA, and `order='shortest'` (MARS_JOB_ORDER) starts
+    the queued job with the least expected remaining work first instead of
+    the oldest one.
+
+    With a `store` the queue, job state and progress events live in SQLite
+    instead of memory, so several web processes can share them. Web
+    processes then pass `execute=False` and a separate worker process, which
+    calls `serve_forever()`, runs the jobs.
+    """
+
+    def __init__(self, runner: Callable[[Job], None], max_workers: Optional[int] = None,
+                 max_queue: Optional[int] = None, history: Optional[int] = None,
+                 store=None, execute: bool = True, deliver: Optional[Callable[[Job, List[str]], None]] = None,
+                 reuse_window: Optional[float] = None, estimator=None, order: Optional[str] = None):
+        self.runner = runner
+        self.estimator = estimator
+        self.order = order or os.getenv('MARS_JOB_ORDER', 'fifo')
+        if self.order not in ('fifo', 'shortest'):
+            raise ValueError(f"Unknown job order '{self.order}', expected 'fifo' or 'shortest'")
+        # Sends a completed job's results to the recipients of attached requests
+        self.deliver = deliver
+        self.reuse_window = reuse_window if reuse_window is not None else \
+            float(os.getenv('MARS_JOB_REUSE_WINDOW', '3600'))
+        self.max_workers = max_workers or int(os.getenv('MARS_WEB_MAX_JOBS', '2'))
+        self.max_queue = max_queue or int(os.getenv('MARS_WEB_MAX_QUEUE', '100'))
+        self.history = history or int(os.getenv('MARS_WEB_JOB_HISTORY', '200'))
+        self.store = store
+        self.execute = execute
+        self.jobs: Dict[str, Job] = OrderedDict()
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._workers: List[threading.Thread] = []
+
+    def _start_workers(self) -> None:
+        while self.execute and len(self._workers) < self.max_workers:
+            worker = threading.Thread(target=self._work, name=f"mars-job-{len(self._workers)}", daemon=True)
+            self._workers.append(worker)
+            worker.start()
+
+    def submit(self, owner: str, data: dict, dedupe_key: Optional[str] = None) -> Job:
+        job = Job(id=uuid.uuid4().hex[:12], owner=owner, data=data, dedupe_key=dedupe_key, store=self.store)
+        job.estimated_seconds = self.expected_seconds(job)
+        with self._cond:
+            if self.store is not None:
+                if self.store.count_queued() >= self.max_queue:
+                    raise JobQueueFull(f"Job queue is full ({self.max_queue} jobs waiting)")
+                self.store.insert(job)
+                job.emit('state', state='queued', status=job.status, position=self.position(job))
+            else:
+                if len(self._queue) >= self.max_queue:
+                    raise JobQueueFull(f"Job queue is full ({self.max_queue} jobs waiting)")
+                self.jobs[job.id] = job
+                self._enqueue(job)
+                job.emit('state', state='queued', status=job.status, position=self.position(job))
+                self._evict()
+            self._start_workers()
+            self._cond.notify()
+        return job
+
+    def expected_seconds(self, job: Job) -> Optional[float]:
+        """Expected remaining run time of a job that is not running, from the estimator."""
+        if self.estimator is None:
+            return None
+        return self.estimator.estimate(job.progress['completed'])['eta_seconds']
+
+    def eta(self, job: Job) -> Optional[dict]:
+        """ETA of a queued or running job (for a queued job, of its own run), or None."""
+        if self.estimator is None or not job.is_active:
+            return None
+        running = job.progress['running'] if job.state == 'running' else {}
+        return self.estimator.estimate(job.progress['completed'], running)
+
+    def _enqueue(self, job: Job) -> None:
+        if self.order == 'fifo':
+            self._queue.append(job)
+            return
+        # Shortest first; equally long jobs keep their FIFO order
+        index = len(self._queue)
+        while index and (self._queue[index - 1].estimated_seconds or 0.0) > (job.estimated_seconds or 0.0):
+            index -= 1
+        self._queue.insert(index, job)
+
+    def find_reusable(self, dedupe_key: str) -> Optional[Job]:
+        """Queued or running job with `dedupe_key`, or one completed within the reuse window."""
+        if self.reuse_window <= 0:
+            return None
+        if self.store is not None:
+            return self.store.find_reusable(dedupe_key, self.reuse_window)
+        cutoff = time.time() - self.reuse_window
+        with self._cond:
+            for job in reversed(self.jobs.values()):
+                if job.dedupe_key == dedupe_key and (
+                        job.is_active or (job.state == 'completed' and job.finished_at >= cutoff)):
+                    return job
+        return None
+
+    def submit_or_attach(self, owner: str, data: dict, dedupe_key: str,
+                         recipient_email: Optional[str] = None) -> Tuple[Job, bool]:
+        """
+        Attach the request to an identical in-flight or fresh job if there is
+        one, otherwise submit a new job. Returns (job, attached). An attached
+        request's owner can follow the job and its recipient gets the results
+        once the job has completed.
+        """
+        job = self.find_reusable(dedupe_key)
+        if job is None:
+            return self.submit(owner, data, dedupe_key=dedupe_key), False
+        if recipient_email == job.data.get('recipient_email'):
+            # Already receives the results as the job's own recipient
+            recipient_email = None
+        if self.store is not None:
+            self.store.add_subscriber(job.id, owner, recipient_email)
+            self.store.refresh(job)
+        else:
+            with self._cond:
+                job.subscribers.append({'owner': owner, 'recipient_email': recipient_email, 'delivered': False})
+        if job.state == 'completed':
+            # The job will not deliver again by itself
+            threading.Thread(target=self._deliver_pending, args=(job,), daemon=True).start()
+        return job, True
+
+    def cancel(self, job: Job) -> Optional[str]:
+        """
+        Cancel a job. A queued job is cancelled at once and returns 'cancelled';
+        a running job is asked to stop at its next cancellation checkpoint,
+        which frees its worker, and returns 'requested'. Returns None for a
+        job that already finished.
+        """
+        now = time.time()
+        if self.store is not None:
+            outcome = self.store.request_cancel(job.id, now)
+            self.store.refresh(job)
+            if outcome == 'cancelled':
+                # Already written by request_cancel; positions are only events
+                job.emit('state', state='cancelled', status=job.status)
+                for position, queued in enumerate(self.store.queued(self.order), start=1):
+                    queued.emit('position', position=position)
+            return outcome
+        with self._cond:
+            if job.state == 'queued':
+                self._queue.remove(job)
+                job.cancel_requested_at = job.finished_at = now
+                job.status = "🛑 Cancelled"
+                job.set_state('cancelled')
+                for position, queued in enumerate(self._queue, start=1):
+                    queued.emit('position', position=position)
+                return 'cancelled'
+            if job.state != 'running':
+                return None
+            if job.cancel_requested_at is None:
+                with job._events_cond:
+                    job.cancel_requested_at = now
+                    # Wake up a job waiting in sleep()
+                    job._events_cond.notify_all()
+            return 'requested'
+
+    def resume(self, job: Job) -> bool:
+        """
+        Queue a cancelled or failed job again; the runner keeps the results
+        the job already has. Returns False for any other job.
+        """
+        job.estimated_seconds = self.expected_seconds(job)
+        if self.store is not None:
+            if self.store.count_queued() >= self.max_queue:
+                raise JobQueueFull(f"Job queue is full ({self.max_queue} jobs waiting)")
+            if not self.store.requeue(job.id, job.estimated_seconds):
+                return False
+            self.store.refresh(job)
+            if job.state == 'queued':
+                # Unless a worker has claimed it already and reports it running
+                job.emit('state', state='queued', status=job.status, position=self.position(job))
+        else:
+            with self._cond:
+                if job.state not in ('cancelled', 'failed'):
+                    return False
+                if len(self._queue) >= self.max_queue:
+                    raise JobQueueFull(f"Job queue is full ({self.max_queue} jobs waiting)")
+                job.error = job.cancel_requested_at = job.started_at = job.finished_at = None
+                job.progress['running'] = {}
+                job.status = 'Queued'
+                self._enqueue(job)
+                job.set_state('queued', position=self.position(job))
+        with self._cond:
+            self._start_workers()
+            self._cond.notify()
+        return True
+
+    def cancel_metrics(self) -> dict:
+        """How quickly cancelled running jobs released their worker."""
+        if self.store is not None:
+            latencies, queued = self.store.cancel_latencies()
+        else:
+            with self._cond:
+                cancelled = [job for job in self.jobs.values() if job.state == 'cancelled']
+            latencies = [job.finished_at - job.cancel_requested_at for job in cancelled if job.started_at]
+            queued = len(cancelled) - len(latencies)
+        latencies = sorted(latencies)
+
+        def percentile(p):
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))], 3) if latencies else None
+
+        return {
+            'cancelled_queued': queued,
+            'cancelled_running': len(latencies),
+            'latency_p50': percentile(0.5),
+            'latency_p95': percentile(0.95),
+            'latency_max': round(latencies[-1], 3) if latencies else None,
+        }
+
+    def _claim_undelivered(self, job: Job) -> List[str]:
+        if self.store is not None:
+            return self.store.claim_undelivered(job.id)
+        with self._cond:
+            pending = [s for s in job.subscribers if not s['delivered']]
+            for subscriber in pending:
+                subscriber['delivered'] = True
+        return [s['recipient_email'] for s in pending if s['recipient_email']]
+
+    def _deliver_pending(self, job: Job) -> None:
+        """Deliver a completed job to attached recipients, each exactly once."""
+        recipients = list(dict.fromkeys(self._claim_undelivered(job)))
+        if not recipients or not self.deliver:
+            return
+        try:
+            self.deliver(job, recipients)
+        except Exception as e:
+            print(f"Delivery error in job {job.id}: {e}")
+
+    def _evict(self) -> None:
+        finished = [job_id for job_id, job in self.jobs.items() if not job.is_active]
+        for job_id in finished[:max(0, len(self.jobs) - self.history)]:
+            del self.jobs[job_id]
+
+    def get(self, job_id: str, owner: Optional[str] = None) -> Optional[Job]:
+        """The job with `job_id`, or None if it does not exist or belongs to someone else."""
+        if self.store is not None:
+            job = self.store.load(job_id)
+        else:
+            with self._cond:
+                job = self.jobs.get(job_id)
+        if job is None or (owner is not None and not self.can_access(job, owner)):
+            return None
+        return job
+
+    def can_access(self, job: Job, owner: str) -> bool:
+        """Whether `owner` started the job or attached a request to it."""
+        if job.owner == owner:
+            return True
+        if self.store is not None:
+            return self.store.is_subscriber(job.id, owner)
+        with self._cond:
+            return any(s['owner'] == owner for s in job.subscribers)
+
+    def jobs_for(self, owner: str) -> List[Job]:
+        """Jobs of `owner`, newest first."""
+        if self.store is not None:
+            return self.store.jobs_for(owner, limit=self.history)
+        with self._cond:
+            jobs = list(reversed(self.jobs.values()))
+        return [job for job in jobs if self.can_access(job, owner)]
+
+    def jobs_page(self, owner: str, limit: int, offset: int = 0) -> Tuple[List[Job], int]:
+        """One page of the jobs of `owner`, newest first, and the total number of them."""
+        if self.store is not None:
+            return self.store.jobs_page(owner, limit, offset)
+        jobs = self.jobs_for(owner)
+        return jobs[offset:offset + limit], len(jobs)
+
+    def position(self, job: Job) -> int:
+        """1-based position of a queued job in the FIFO queue, 0 once it has started."""
+        if self.store is not None:
+            return self.store.position(job.id, self.order) if job.state == 'queued' else 0
+        with self._cond:
+            for index, queued in enumerate(self._queue, start=1):
+                if queued is job:
+                    return index
+        return 0
+
+    def _next_job(self) -> Job:
+        """Block until a queued job is available, mark it as started and return it."""
+        if self.store is not None:
+            while True:
+                job = self.store.claim_next(self.order)
+                if job is not None:
+                    job.set_state('running')
+                    for position, queued in enumerate(self.store.queued(self.order), start=1):
+                        queued.emit('position', position=position)
+                    return job
+                with self._cond:
+                    self._cond.wait(self.store.poll_interval * 4)
+        with self._cond:
+            while not self._queue:
+                self._cond.wait()
+            job = self._queue.popleft()
+            job.started_at = time.time()
+            job.set_state('running')
+            for position, queued in enumerate(self._queue, start=1):
+                queued.emit('position', position=position)
+            return job
+
+    def _work(self) -> None:
+        while True:
+            job = self._next_job()
+            try:
+                self.runner(job)
+                job.finished_at = time.time()
+                if job.set_state('completed'):
+                    self._deliver_pending(job)
+            except RunCancelled:
+                job.finished_at = time.time()
+                latency = job.finished_at - (job.cancel_requested_at or job.finished_at)
+                print(f"🛑 Job {job.id} cancelled; worker freed {latency:.2f}s after the request")
+                job.status = "🛑 Cancelled"
+                job.set_state('cancelled', cancel_latency=round(latency, 3))
+            except Exception as e:
+                print(f"Research error in job {job.id}: {e}")
+                job.error = str(e)
+                job.status = f"❌ Error: {str(e)}"
+                job.finished_at = time.time()
+                job.set_state('failed', error=job.error)
+
+    def serve_forever(self) -> None:
+        """Run queued jobs from the store until interrupted (the production worker process)."""
+        if self.store is not None:
+            interrupted = self.store.fail_interrupted()
+            if interrupted:
+                print(f"⚠️ Marked {interrupted} interrupted jobs as failed")
+        self.execute = True
+        self._start_workers()
+        for worker in self._workers:
+            worker.join()
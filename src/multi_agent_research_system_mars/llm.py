@@ -0,0 +1,166 @@
+import json
+import os
+import time
+from typing import Any, Optional
+
+from crewai import LLM
+
+from .cache import CACHE_DIR, SQLiteCache, make_key
+from .cancellation import CancelToken
+from .rate_limit import get_rate_limiter, is_rate_limit_error
+from .tokens import count_tokens
+
+
+LLM_CACHE_MODES = ('off', 'read-write', 'read-only')
+
+_llm_store = None
+
+
+def get_llm_store() -> SQLiteCache:
+    """Process-wide on-disk store of LLM responses."""
+    global _llm_store
+    if _llm_store is None:
+        _llm_store = SQLiteCache(
+            os.path.join(CACHE_DIR, 'llm.sqlite3'),
+            max_entries=int(os.getenv('MARS_LLM_CACHE_MAX_ENTRIES', '20000')),
+            max_bytes=int(os.getenv('MARS_LLM_CACHE_MAX_BYTES', str(500 * 1024 * 1024))),
+        )
+    return _llm_store
+
+
+class LLMResponseCache:
+    """
+    Content-addressed LLM response cache for one run.
+
+    Responses are keyed on a hash of model, temperature, messages and tools.
+    `mode` is one of `off`, `read-write` or `read-only` (defaults to MARS_LLM_CACHE).
+    """
+
+    def __init__(self, mode: Optional[str] = None, store: Optional[SQLiteCache] = None):
+        mode = mode or os.getenv('MARS_LLM_CACHE', 'off')
+        if mode not in LLM_CACHE_MODES:
+            raise ValueError(f"Unknown LLM cache mode '{mode}', expected one of {LLM_CACHE_MODES}")
+        self.mode = mode
+        self.store = store if store is not None or mode == 'off' else get_llm_store()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != 'off'
+
+    def key(self, model: str, temperature: Any, messages: Any, tools: Any = None) -> str:
+        return make_key('llm', model, temperature, messages, tools)
+
+    def get(self, key: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        value = self.store.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def put(self, key: str, value: str) -> None:
+        if self.mode == 'read-write':
+            self.store.set(key, value)
+            self.writes += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'mode': self.mode,
+            'hits': self.hits,
+            'misses': self.misses,
+            'writes': self.writes,
+            'hit_ratio': round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+def _messages_text(messages) -> str:
+    if isinstance(messages, str):
+        return messages
+    return "\n".join(
+        m.get('content') if isinstance(m.get('content'), str) else json.dumps(m.get('content'), default=str)
+        for m in messages if isinstance(m, dict)
+    )
+
+
+class MarsLLM(LLM):
+    """
+    crewAI LLM that answers repeated prompts from an LLMResponseCache and
+    reports every call (latency, estimated tokens and cost) to a RunRecorder.
+    With a CancelToken, every call first checks whether the run was cancelled.
+    """
+
+    def __init__(self, *args, response_cache: Optional[LLMResponseCache] = None,
+                 recorder=None, agent_name: str = "", cancel_token: Optional[CancelToken] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.response_cache = response_cache or LLMResponseCache(mode='off')
+        self.recorder = recorder
+        self.agent_name = agent_name
+        self.cancel_token = cancel_token
+
+    def call(self, messages, tools=None, *args, **kwargs):
+        if self.cancel_token is not None:
+            self.cancel_token.check()
+        started = time.monotonic()
+        cached = False
+        try:
+            response, cached = self._call_with_cache(messages, tools, *args, **kwargs)
+        except Exception as e:
+            self._record(messages, None, started, cached, error=str(e))
+            raise
+        self._record(messages, response, started, cached)
+        return response
+
+    def _call_with_cache(self, messages, tools=None, *args, **kwargs):
+        # Calls that execute functions have side effects, so they always go to the model
+        available_functions = kwargs.get('available_functions') or (args[1] if len(args) > 1 else None)
+        cacheable = self.response_cache.enabled and not available_functions
+        if not cacheable:
+            return self._call_model(messages, tools, *args, **kwargs), False
+
+        key = self.response_cache.key(self.model, self.temperature, messages, tools)
+        cached = self.response_cache.get(key)
+        if cached is not None:
+            return cached, True
+        response = self._call_model(messages, tools, *args, **kwargs)
+        if isinstance(response, str) and response:
+            self.response_cache.put(key, response)
+        return response, False
+
+    def _call_model(self, messages, tools=None, *args, **kwargs):
+        """Call the model through the shared LLM rate limiter, retrying 429s."""
+        limiter = get_rate_limiter('llm')
+        prompt_tokens = count_tokens(_messages_text(messages), self.model)
+        retries = int(os.getenv('MARS_RATE_LIMIT_RETRIES', '3'))
+        for attempt in range(retries + 1):
+            if attempt and self.cancel_token is not None:
+                self.cancel_token.check()
+            try:
+                with limiter.slot(tokens=prompt_tokens):
+                    response = super().call(messages, tools, *args, **kwargs)
+            except Exception as e:
+                if attempt == retries or not is_rate_limit_error(e):
+                    raise
+                if self.recorder is not None:
+                    self.recorder.llm_retry(self.agent_name, self.model, str(e))
+                continue
+            limiter.charge_tokens(count_tokens(response if isinstance(response, str) else '', self.model))
+            return response
+
+    def _record(self, messages, response, started, cached, error=None):
+        if self.recorder is None:
+            return
+        self.recorder.llm_call(
+            self.agent_name,
+            self.model,
+            time.monotonic() - started,
+            prompt_tokens=count_tokens(_messages_text(messages), self.model),
+            completion_tokens=count_tokens(response if isinstance(response, str) else str(response or ''), self.model),
+            cached=cached,
+            error=error,
+        )
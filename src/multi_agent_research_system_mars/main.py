@@ -1,13 +1,103 @@
 #!/usr/bin/env python
 import sys
 import os
+import time
 from dotenv import load_dotenv
+from multi_agent_research_system_mars.batch import run_batch
+from multi_agent_research_system_mars.cancellation import RunCancelled
+from multi_agent_research_system_mars.checkpoint import RunCheckpoint
 from multi_agent_research_system_mars.crew import MultiAgentResearchSystemMarsCrew
+from multi_agent_research_system_mars.eta import EtaEstimator
+from multi_agent_research_system_mars.memo import TaskMemo
+from multi_agent_research_system_mars.scheduler import ParallelCrewRunner, TaskGraph
 
 # Load environment variables
 config_path = os.path.join(os.path.dirname(__file__), '..', '..', 'config.env')
 load_dotenv(config_path)
 
+def kickoff(inputs, mode=None, max_workers=None, llm_cache_mode=None, run_id=None, incremental=None,
+            cancel_token=None):
+    """
+    Kick off the crew in the configured execution mode.
+
+    `sequential` (default) runs the tasks one after another in dependency order.
+    `parallel` runs every task whose context is complete at once, capped at
+    `max_workers` (MARS_MAX_WORKERS) concurrent tasks.
+    `llm_cache_mode` selects the LLM response cache (MARS_LLM_CACHE):
+    off, read-write or read-only.
+    Every finished task is checkpointed under runs/<run_id>/; passing the
+    `run_id` of an earlier run skips the tasks it already completed.
+    With `incremental` (MARS_INCREMENTAL) a task only runs when its config,
+    its LLM, the inputs it uses or an upstream output changed since it was
+    memoized, or its output is older than MARS_MEMO_TTL. Tasks that write
+    PDFs or send email always run.
+    Cancelling `cancel_token` stops the run before its next LLM or tool call
+    and raises RunCancelled; completed tasks stay checkpointed for resume.
+    """
+    mode = mode or os.getenv('MARS_EXECUTION_MODE', 'sequential')
+    if mode not in ('sequential', 'parallel'):
+        raise ValueError(f"Unknown execution mode: {mode}")
+    if incremental is None:
+        incremental = os.getenv('MARS_INCREMENTAL', 'false').lower() == 'true'
+    crew_base = MultiAgentResearchSystemMarsCrew(llm_cache_mode=llm_cache_mode, run_id=run_id,
+                                                 cancel_token=cancel_token)
+    crew = crew_base.crew()
+    recorder = crew_base.recorder
+    checkpoint = crew_base.checkpoint
+    checkpoint.start(inputs, mode=mode)
+    completed = checkpoint.completed_outputs()
+    if completed:
+        print(f"♻️ Resuming run {crew_base.run_id}: {len(completed)} completed tasks restored from checkpoint")
+    workers = (max_workers or int(os.getenv('MARS_MAX_WORKERS', '4'))) if mode == 'parallel' else 1
+    recorder.eta = EtaEstimator(TaskGraph.from_config(crew_base.tasks_config), workers=workers)
+    recorder.mark_completed(completed)
+    eta = recorder.eta.estimate(completed)
+    print(f"⏳ Estimated run time: {eta['eta_seconds'] / 60:.1f} min "
+          f"({eta['eta_low'] / 60:.1f}-{eta['eta_high'] / 60:.1f} min, "
+          f"{eta['tasks_with_history']}/{eta['remaining_tasks']} tasks with history)")
+    recorder.run_started(mode=mode, inputs=inputs, resumed=sorted(completed), incremental=incremental)
+    try:
+        # One worker runs the tasks sequentially; fan-in tasks get compacted context in both modes
+        memo = TaskMemo(llm_settings=crew_base.llm_settings) if incremental else None
+        runner = ParallelCrewRunner(crew, max_workers=workers, recorder=recorder, memo=memo,
+                                    cancel_token=crew_base.cancel_token)
+        result = runner.run(inputs, completed=completed)
+        print(runner.summary.format())
+    except Exception as e:
+        if isinstance(e, RunCancelled):
+            token = crew_base.cancel_token
+            latency = time.time() - token.requested_at if token.requested_at else 0.0
+            recorder.emit('run_cancelled', reason=str(e), latency=round(latency, 3))
+            print(f"🛑 Run {crew_base.run_id} cancelled {latency:.2f}s after the request")
+        recorder.run_finished(error=e)
+        checkpoint.finish(error=e)
+        print(f"💾 Completed tasks are checkpointed; continue with: main.py resume {crew_base.run_id}")
+        raise
+    finally:
+        print(recorder.format_summary())
+    recorder.run_finished()
+    checkpoint.finish()
+    metrics = crew_base.run_metrics()
+    recorder.emit('run_metrics', **metrics)
+    stats = metrics['search_cache']
+    print(f"🔎 Search cache: {stats['hits']} hits, {stats['misses']} misses "
+          f"({stats['entries']} entries, {stats['evictions']} evicted)")
+    calls = metrics['tool_calls']
+    print(f"🔁 Tool calls: {calls['executed']} executed, {calls['coalesced']} coalesced duplicates")
+    llm_cache = metrics['llm_cache']
+    if llm_cache['mode'] != 'off':
+        print(f"🧠 LLM cache ({llm_cache['mode']}): {llm_cache['hits']} hits, "
+              f"{llm_cache['misses']} misses, hit ratio {llm_cache['hit_ratio']:.0%}")
+    for name, limits in metrics['rate_limits'].items():
+        print(f"🚦 {name} rate limiter: concurrency limit {limits['concurrency_limit']}, "
+              f"{limits['throttled']} throttled, {limits['wait_time']:.1f}s waited over {limits['waits']} waits")
+    renders = metrics['pdf_renders']
+    if renders['documents']:
+        print(f"📄 PDF renders: {renders['documents']} documents on {renders['workers']} workers, "
+              f"{renders['render_time']:.1f}s rendering, {renders['queue_wait']:.1f}s queued "
+              f"(max {renders['max_queue_wait']:.1f}s), {renders['failures']} fell back to reportlab")
+    return result
+
 def run():
     """
     Run the crew with interactive input.
@@ -37,7 +127,7 @@ def run():
     }
     
     try:
-        MultiAgentResearchSystemMarsCrew().crew().kickoff(inputs=inputs)
+        kickoff(inputs)
         print(f"\n✅ Research completed successfully!")
         print(f"📧 Results have been sent to {recipient_email}")
     except Exception as e:
@@ -51,7 +141,56 @@ def run_with_params(topic, recipient_email):
         'topic': topic,
         'recipient_email': recipient_email
     }
-    MultiAgentResearchSystemMarsCrew().crew().kickoff(inputs=inputs)
+    return kickoff(inputs)
+
+
+def batch(path=None, workers=None):
+    """
+    Research every topic in a JSONL/CSV file of {topic, recipient_email} rows
+    on a pool of worker processes.
+    """
+    path = path or sys.argv[1]
+    if not os.path.exists(path):
+        print(f"❌ Topic file not found: {path}")
+        return
+    return run_batch(path, workers=int(workers) if workers else None)
+
+
+def resume(run_id=None):
+    """
+    Resume a checkpointed run, skipping the tasks it already completed.
+    """
+    run_id = run_id or sys.argv[1]
+    try:
+        run = RunCheckpoint.load(run_id).read_run()
+    except FileNotFoundError as e:
+        print(f"❌ {e}")
+        return
+    print(f"🔄 Resuming run {run_id} on: {run['inputs'].get('topic')}")
+    return kickoff(run['inputs'], mode=run.get('mode'), run_id=run_id)
+
+
+def plan(topic=None, recipient_email=None):
+    """
+    Dry run of an incremental run: show which tasks would re-run and why.
+    """
+    inputs = {
+        'topic': topic or sys.argv[1],
+        'recipient_email': recipient_email or (sys.argv[2] if len(sys.argv) > 2 else ''),
+    }
+    # Building the crew creates its agents' LLMs, whose settings are part of the fingerprints
+    crew_base = MultiAgentResearchSystemMarsCrew()
+    crew_base.crew()
+    steps = TaskMemo(llm_settings=crew_base.llm_settings).plan(inputs)
+    print(f"🧪 Incremental plan for: {inputs['topic']}")
+    for step in steps:
+        if step['action'] == 'reuse':
+            print(f"   ♻️ {step['task']}: reuse memoized output")
+        else:
+            print(f"   🔄 {step['task']}: run ({'; '.join(step['reasons'])})")
+    reruns = sum(1 for step in steps if step['action'] == 'run')
+    print(f"   {reruns} of {len(steps)} tasks would run")
+    return steps
 
 
 def train():
@@ -104,6 +243,21 @@ if __name__ == "__main__":
         train()
     elif command == "replay":
         replay()
+    elif command == "resume":
+        if len(sys.argv) < 3:
+            print("Usage: main.py resume <run_id>")
+            sys.exit(1)
+        resume(sys.argv[2])
+    elif command == "batch":
+        if len(sys.argv) < 3:
+            print("Usage: main.py batch <topics.jsonl|topics.csv> [<workers>]")
+            sys.exit(1)
+        batch(sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else None)
+    elif command == "plan":
+        if len(sys.argv) < 3:
+            print("Usage: main.py plan <topic> [<recipient_email>]")
+            sys.exit(1)
+        plan(sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else None)
     elif command == "test":
         test()
     else:
@@ -0,0 +1,145 @@
+import os
+import re
+import time
+from typing import Dict, List, Optional
+
+from .cache import CACHE_DIR, SQLiteCache, make_key
+from .scheduler import TaskGraph, load_agents_config, load_tasks_config
+
+
+_PLACEHOLDER = re.compile(r'\{(\w+)\}')
+
+# Tasks whose value is what they do (write PDFs, send email), not their output; they always run
+SIDE_EFFECT_TASKS = ('professional_pdf_document_generation', 'email_research_package_distribution')
+
+_memo_store = None
+
+
+def get_memo_store() -> SQLiteCache:
+    """Process-wide on-disk store of memoized task outputs."""
+    global _memo_store
+    if _memo_store is None:
+        _memo_store = SQLiteCache(
+            os.path.join(CACHE_DIR, 'memo.sqlite3'),
+            max_entries=int(os.getenv('MARS_MEMO_MAX_ENTRIES', '5000')),
+        )
+    return _memo_store
+
+
+def output_hash(raw: str) -> str:
+    return make_key('output', raw or '')
+
+
+class TaskMemo:
+    """
+    Build-system style memoization of task outputs.
+
+    A task's fingerprint covers its agent config, its agent's LLM model and
+    temperature, its task config, the inputs its prompts actually reference
+    and the output hashes of its `context` dependencies. A task re-runs when
+    its fingerprint has no memoized output, which also happens whenever an
+    upstream task re-ran with a different result, and when the memoized output
+    is older than `ttl` seconds (MARS_MEMO_TTL, default one day; 0 keeps
+    outputs until evicted) so research is redone periodically. Side-effecting
+    tasks are never memoized.
+    """
+
+    def __init__(self, store: Optional[SQLiteCache] = None,
+                 agents_config: Optional[dict] = None, tasks_config: Optional[dict] = None,
+                 llm_settings: Optional[Dict[str, dict]] = None, ttl: Optional[float] = None):
+        self.store = store or get_memo_store()
+        self.agents_config = agents_config or load_agents_config()
+        self.tasks_config = tasks_config or load_tasks_config()
+        # Agent name -> {'model', 'temperature'} of its LLM
+        self.llm_settings = llm_settings or {}
+        self.ttl = float(os.getenv('MARS_MEMO_TTL', '86400')) if ttl is None else ttl
+        self.graph = TaskGraph.from_config(self.tasks_config)
+
+    def components(self, name: str, inputs: dict, dep_hashes: Dict[str, str]) -> dict:
+        task_config = self.tasks_config[name]
+        agent_config = self.agents_config.get(task_config.get('agent'), {})
+        referenced = set(_PLACEHOLDER.findall(f"{task_config} {agent_config}"))
+        return {
+            'agent': make_key('agent', agent_config),
+            'llm': make_key('llm', self.llm_settings.get(task_config.get('agent'), {})),
+            'task': make_key('task', task_config),
+            'inputs': make_key('inputs', {k: v for k, v in inputs.items() if k in referenced}),
+            'upstream': dict(sorted(dep_hashes.items())),
+        }
+
+    def fingerprint(self, components: dict) -> str:
+        return make_key('fingerprint', components)
+
+    def expired(self, record: dict) -> bool:
+        return self.ttl > 0 and time.time() - record.get('created_at', 0) > self.ttl
+
+    def lookup(self, name: str, inputs: dict, dep_hashes: Dict[str, str]) -> Optional[dict]:
+        """Fresh memoized task record for this fingerprint, if any."""
+        if name in SIDE_EFFECT_TASKS:
+            return None
+        record = self.store.get(self.fingerprint(self.components(name, inputs, dep_hashes)))
+        return None if record is None or self.expired(record) else record
+
+    def save(self, name: str, inputs: dict, dep_hashes: Dict[str, str], output) -> None:
+        if name in SIDE_EFFECT_TASKS:
+            return
+        components = self.components(name, inputs, dep_hashes)
+        raw = output.raw or ''
+        self.store.set(self.fingerprint(components), {
+            'name': name,
+            'agent': output.agent,
+            'description': output.description,
+            'summary': output.summary,
+            'raw': raw,
+            'output_hash': output_hash(raw),
+            'created_at': time.time(),
+        })
+        self.store.set(make_key('latest', name), components)
+
+    def reasons(self, name: str, components: dict) -> List[str]:
+        """Why `components` miss the memo, relative to the task's last recorded run."""
+        latest = self.store.get(make_key('latest', name))
+        if latest is None:
+            return ['no memoized output']
+        labels = {
+            'agent': 'agent config changed',
+            'llm': 'LLM model or temperature changed',
+            'task': 'task config changed',
+            'inputs': 'inputs changed',
+        }
+        reasons = [label for key, label in labels.items() if latest.get(key) != components[key]]
+        upstream = components['upstream']
+        changed = [dep for dep, h in upstream.items() if latest.get('upstream', {}).get(dep) != h]
+        if changed:
+            reasons.append(f"upstream output changed: {', '.join(changed)}")
+        return reasons or ['memoized output evicted']
+
+    def plan(self, inputs: dict) -> List[dict]:
+        """
+        Dry run: which tasks would re-run for `inputs` and why, in execution order.
+        A re-running task's new output is unknown, so all its dependents re-run too.
+        """
+        plan = []
+        hashes = {}
+        rerun = set()
+        for name in self.graph.order:
+            deps = self.graph.dependencies[name]
+            if name in SIDE_EFFECT_TASKS:
+                rerun.add(name)
+                plan.append({'task': name, 'action': 'run', 'reasons': ['side-effecting']})
+                continue
+            stale = [dep for dep in deps if dep in rerun]
+            if stale:
+                rerun.add(name)
+                plan.append({'task': name, 'action': 'run', 'reasons': [f"upstream re-runs: {', '.join(stale)}"]})
+                continue
+            components = self.components(name, inputs, {dep: hashes[dep] for dep in deps})
+            record = self.store.get(self.fingerprint(components))
+            if record is not None and not self.expired(record):
+                hashes[name] = record['output_hash']
+                plan.append({'task': name, 'action': 'reuse', 'reasons': []})
+            else:
+                rerun.add(name)
+                reasons = ['expired'] if record is not None else self.reasons(name, components)
+                plan.append({'task': name, 'action': 'run', 'reasons': reasons})
+        return plan
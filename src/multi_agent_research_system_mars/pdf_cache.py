@@ -0,0 +1,131 @@
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from .cache import CACHE_DIR, make_key
+from .singleflight import SingleFlight
+
+
+class PDFCache:
+    """
+    Content-addressed on-disk cache of rendered PDFs.
+
+    Each PDF is stored once as `<key>.pdf`, where the key hashes everything
+    the render depends on. Renders must be deterministic (reports use
+    reportlab's invariant mode), so a key always maps to the same bytes, even
+    when re-rendered after eviction, and doubles as a strong ETag. The least recently used files are deleted once
+    `max_entries` or `max_bytes` is exceeded. Concurrent renders of the same
+    key are coalesced into one.
+    """
+
+    def __init__(self, directory: Optional[str] = None, max_entries: Optional[int] = None,
+                 max_bytes: Optional[int] = None):
+        self.directory = directory or os.path.join(CACHE_DIR, 'pdfs')
+        self.max_entries = max_entries or int(os.getenv('MARS_PDF_CACHE_MAX_ENTRIES', '500'))
+        self.max_bytes = max_bytes or int(os.getenv('MARS_PDF_CACHE_MAX_BYTES', str(500 * 1024 * 1024)))
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.renders = SingleFlight()
+        self._lock = threading.Lock()
+        # key -> size in bytes, least recently used first
+        self._entries = OrderedDict()
+        self._bytes = 0
+        os.makedirs(self.directory, exist_ok=True)
+        self._load()
+
+    def _load(self) -> None:
+        """Index PDFs left by an earlier process, oldest access first."""
+        files = []
+        for filename in os.listdir(self.directory):
+            path = os.path.join(self.directory, filename)
+            if filename.endswith('.tmp'):
+                # Render interrupted by a crash
+                os.unlink(path)
+            elif filename.endswith('.pdf'):
+                stat = os.stat(path)
+                files.append((stat.st_atime, filename[:-4], stat.st_size))
+        with self._lock:
+            for _, key, size in sorted(files):
+                self._entries[key] = size
+                self._bytes += size
+            self._evict()
+
+    @staticmethod
+    def key(*parts) -> str:
+        return make_key('pdf', *parts)
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.pdf")
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Path of the cached PDF for `key`, or None. The directory may be shared
+        by several processes, so files are checked on disk, not just in the index.
+        """
+        path = self.path(key)
+        exists = os.path.exists(path)
+        with self._lock:
+            if not exists:
+                # Evicted by another process
+                self._bytes -= self._entries.pop(key, 0)
+                self.misses += 1
+                return None
+            if key not in self._entries:
+                # Rendered by another process
+                size = os.path.getsize(path)
+                self._entries[key] = size
+                self._bytes += size
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return path
+
+    def put(self, key: str, data: bytes) -> str:
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        path = self.path(key)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._bytes += len(data) - self._entries.pop(key, 0)
+            self._entries[key] = len(data)
+            self._evict(keep=key)
+        return path
+
+    def get_or_render(self, key: str, render: Callable[[], bytes]) -> str:
+        """Path of the PDF for `key`, rendering and caching it on a miss."""
+        path = self.get(key)
+        if path is not None:
+            return path
+        return self.renders.do(key, self._render, key, render)
+
+    def _render(self, key: str, render: Callable[[], bytes]) -> str:
+        # A render coalesced with this one may have finished just before it started
+        path = self.path(key)
+        return path if os.path.exists(path) else self.put(key, render())
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            key = next(iter(self._entries))
+            if key == keep:
+                break
+            self._bytes -= self._entries.pop(key)
+            self.evictions += 1
+            try:
+                os.unlink(self.path(key))
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 3) if lookups else 0.0,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+            }
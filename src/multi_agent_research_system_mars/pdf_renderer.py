@@ -0,0 +1,125 @@
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
+
+
+# wkhtmltopdf options shared by every document
+WKHTMLTOPDF_OPTIONS = {
+    'page-size': 'A4',
+    'margin-top': '1in',
+    'margin-right': '1in',
+    'margin-bottom': '1in',
+    'margin-left': '1in',
+    'encoding': "UTF-8",
+    'no-outline': None,
+    'enable-local-file-access': None,
+    'print-media-type': None,
+    'disable-smart-shrinking': None,
+}
+
+# Master documents keep their headings as PDF bookmarks, which index their sections
+OUTLINE_OPTIONS = {key: value for key, value in WKHTMLTOPDF_OPTIONS.items() if key != 'no-outline'}
+OUTLINE_OPTIONS.update({'outline': None, 'outline-depth': '1'})
+
+
+@dataclass
+class DocumentRender:
+    """Timing and outcome of one queued wkhtmltopdf render."""
+    output_path: str
+    queue_wait: float = 0.0
+    seconds: float = 0.0
+    error: Optional[str] = None
+
+
+class WkhtmltopdfPool:
+    """
+    Bounded pool of wkhtmltopdf renders behind a FIFO queue.
+
+    wkhtmltopdf has no server or warm mode, and given several inputs it
+    concatenates them into a single PDF, so every document still needs its
+    own process. The pool removes everything else around that process: the
+    binary is resolved once (pdfkit otherwise runs `which wkhtmltopdf` per
+    document), HTML is piped through stdin instead of a temp file, and up to
+    `workers` documents render at once. Each render reports its queue wait
+    and render time.
+    """
+
+    def __init__(self, workers: Optional[int] = None, options: Optional[dict] = None):
+        self.workers = workers or int(os.getenv('MARS_WKHTMLTOPDF_WORKERS', str(os.cpu_count() or 2)))
+        self.options = options or WKHTMLTOPDF_OPTIONS
+        self.documents = 0
+        self.failures = 0
+        self.render_time = 0.0
+        self.queue_wait = 0.0
+        self.max_queue_wait = 0.0
+        self._configuration = None
+        self._configuration_error = None
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='mars-wkhtmltopdf')
+
+    def configuration(self):
+        """pdfkit configuration, resolved once; raises OSError if wkhtmltopdf is not installed."""
+        with self._lock:
+            if self._configuration is None and self._configuration_error is None:
+                import pdfkit
+
+                binary = os.getenv('WKHTMLTOPDF_PATH', '')
+                try:
+                    self._configuration = pdfkit.configuration(wkhtmltopdf=binary)
+                except OSError as e:
+                    self._configuration_error = e
+            if self._configuration_error is not None:
+                raise self._configuration_error
+            return self._configuration
+
+    def _render(self, html: str, output_path: str, queued_at: float, options: Optional[dict] = None) -> DocumentRender:
+        started = time.monotonic()
+        result = DocumentRender(output_path, queue_wait=started - queued_at)
+        try:
+            import pdfkit
+
+            pdfkit.from_string(html, output_path, options=options or self.options,
+                               configuration=self.configuration())
+        except Exception as e:
+            # Returned rather than raised so the caller can fall back per document
+            result.error = str(e)
+        result.seconds = time.monotonic() - started
+        with self._lock:
+            self.documents += 1
+            self.failures += 1 if result.error else 0
+            self.render_time += result.seconds
+            self.queue_wait += result.queue_wait
+            self.max_queue_wait = max(self.max_queue_wait, result.queue_wait)
+        return result
+
+    def submit(self, html: str, output_path: str, options: Optional[dict] = None) -> "Future[DocumentRender]":
+        """Queue one document (with the pool's options unless `options` is given); the future resolves to its DocumentRender."""
+        return self._executor.submit(self._render, html, output_path, time.monotonic(), options)
+
+    def render(self, html: str, output_path: str, options: Optional[dict] = None) -> DocumentRender:
+        return self.submit(html, output_path, options).result()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'documents': self.documents,
+                'failures': self.failures,
+                'render_time': round(self.render_time, 3),
+                'queue_wait': round(self.queue_wait, 3),
+                'max_queue_wait': round(self.max_queue_wait, 3),
+            }
+
+
+_wkhtmltopdf_pool = None
+
+
+def get_wkhtmltopdf_pool() -> WkhtmltopdfPool:
+    """Process-wide wkhtmltopdf render pool (MARS_WKHTMLTOPDF_WORKERS, default one per core)."""
+    global _wkhtmltopdf_pool
+    if _wkhtmltopdf_pool is None:
+        _wkhtmltopdf_pool = WkhtmltopdfPool()
+    return _wkhtmltopdf_pool
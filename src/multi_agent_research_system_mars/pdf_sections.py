@@ -0,0 +1,74 @@
+import re
+from typing import Dict, Iterable, List, Tuple
+
+
+_FENCE = re.compile(r'^\s*(```|~~~)')
+
+
+def section_key(title: str) -> str:
+    """Heading title normalized for matching (case and whitespace)."""
+    return ' '.join(title.split()).casefold()
+
+
+def split_sections(content: str) -> Dict[str, str]:
+    """
+    Markdown of each top-level (`#`) section of `content`, heading included,
+    keyed by its title. `#` lines inside fenced code blocks are not headings.
+    """
+    sections, title, lines, fenced = {}, None, [], False
+    for line in content.split('\n'):
+        if _FENCE.match(line):
+            fenced = not fenced
+        if not fenced and line.startswith('# '):
+            if title is not None:
+                sections[title] = '\n'.join(lines)
+            title, lines = line[2:].strip(), []
+        if title is not None:
+            lines.append(line)
+    if title is not None:
+        sections[title] = '\n'.join(lines)
+    return sections
+
+
+def section_pages(headings: Iterable[Tuple[str, int]], page_count: int) -> Dict[str, Tuple[int, int]]:
+    """
+    Page range `(first, last)` (0-based, inclusive) of each section, from the
+    `(title, page index)` of its top-level heading: a section runs until the
+    page before the next one starts.
+    """
+    starts = sorted(((page, title) for title, page in headings), key=lambda start: start[0])
+    index = {}
+    for number, (page, title) in enumerate(starts):
+        end = starts[number + 1][0] - 1 if number + 1 < len(starts) else page_count - 1
+        index.setdefault(section_key(title), (page, max(page, end)))
+    return index
+
+
+def outline_headings(pdf_path: str) -> Tuple[List[Tuple[str, int]], int]:
+    """
+    `(title, page index)` of the top-level bookmarks of a PDF, and its page
+    count. wkhtmltopdf writes one bookmark per heading; needs pypdf.
+    """
+    from pypdf import PdfReader
+
+    reader = PdfReader(pdf_path)
+    # Nested lists hold the lower heading levels
+    headings = [(item.title, reader.get_destination_page_number(item))
+                for item in reader.outline if not isinstance(item, list)]
+    return headings, len(reader.pages)
+
+
+def extract_pages(pdf_path: str, ranges: Dict[str, Tuple[int, int]]) -> None:
+    """
+    Copy page ranges of a PDF into new PDFs without rendering anything again.
+    `ranges` maps each output path to its `(first, last)` pages; needs pypdf.
+    """
+    from pypdf import PdfReader, PdfWriter
+
+    reader = PdfReader(pdf_path)
+    for output_path, (first, last) in ranges.items():
+        writer = PdfWriter()
+        for number in range(first, last + 1):
+            writer.add_page(reader.pages[number])
+        with open(output_path, 'wb') as f:
+            writer.write(f)
@@ -0,0 +1,190 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """True for provider 429 / rate-limit errors (litellm, openai, requests)."""
+    if type(error).__name__ in ('RateLimitError', 'TooManyRequests'):
+        return True
+    status = getattr(error, 'status_code', None) or getattr(getattr(error, 'response', None), 'status_code', None)
+    return status == 429 or 'rate limit' in str(error).lower()
+
+
+class TokenBucket:
+    """Token bucket refilled at `rate` tokens/second up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount: float = 1.0) -> float:
+        """Block until `amount` tokens are available; returns the time waited."""
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                delay = max(self.paused_until - now, 0.0)
+                if not delay and self.tokens >= amount:
+                    self.tokens -= amount
+                    return waited
+                if not delay:
+                    delay = (amount - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def consume(self, amount: float) -> None:
+        """Charge tokens after the fact (e.g. completion tokens); may go negative."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens -= amount
+
+    def pause(self, seconds: float) -> None:
+        """Hand out nothing for `seconds` (used after a 429)."""
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class AdaptiveLimiter:
+    """
+    Shared limiter for one upstream service.
+
+    Requests (and optionally tokens) are paced by token buckets, and the number
+    of calls in flight is capped by a limit adapted AIMD-style: it grows by one
+    per window of successful calls, is halved on a 429 and shrinks when
+    latency degrades well past its moving average.
+    """
+
+    def __init__(self, name: str, requests_per_minute: float, tokens_per_minute: Optional[float] = None,
+                 max_concurrency: int = 8, min_concurrency: int = 1, backoff: float = 5.0):
+        self.name = name
+        self.requests = TokenBucket(requests_per_minute / 60.0, max(1.0, requests_per_minute / 60.0))
+        self.tokens = TokenBucket(tokens_per_minute / 60.0, tokens_per_minute / 6.0) if tokens_per_minute else None
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.limit = float(max(min_concurrency, max_concurrency // 2))
+        self.backoff = backoff
+        self.in_flight = 0
+        self.latency_ewma = None
+        self.calls = 0
+        self.throttled = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self._cond = threading.Condition()
+
+    def _acquire_slot(self) -> float:
+        started = time.monotonic()
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+        return time.monotonic() - started
+
+    def _release_slot(self) -> None:
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def _on_success(self, latency: float) -> None:
+        with self._cond:
+            self.calls += 1
+            if self.latency_ewma is None:
+                self.latency_ewma = latency
+            slow = latency > 4 * self.latency_ewma
+            self.latency_ewma = 0.8 * self.latency_ewma + 0.2 * latency
+            if slow:
+                self.limit = max(self.min_concurrency, self.limit * 0.75)
+            else:
+                self.limit = min(self.max_concurrency, self.limit + 1.0 / self.limit)
+            self._cond.notify_all()
+
+    def _on_rate_limited(self) -> None:
+        with self._cond:
+            self.calls += 1
+            self.throttled += 1
+            self.limit = max(self.min_concurrency, self.limit * 0.5)
+        self.requests.pause(self.backoff)
+
+    @contextmanager
+    def slot(self, tokens: float = 0.0):
+        """Wait for capacity, then run the body as one call against the service."""
+        waited = self._acquire_slot()
+        try:
+            waited += self.requests.acquire()
+            if self.tokens and tokens:
+                waited += self.tokens.acquire(tokens)
+            with self._cond:
+                self.wait_time += waited
+                self.waits += 1 if waited > 0 else 0
+            started = time.monotonic()
+            try:
+                yield self
+            except BaseException as e:
+                if is_rate_limit_error(e):
+                    self._on_rate_limited()
+                raise
+            self._on_success(time.monotonic() - started)
+        finally:
+            self._release_slot()
+
+    def charge_tokens(self, tokens: float) -> None:
+        if self.tokens and tokens:
+            self.tokens.consume(tokens)
+
+    def snapshot(self) -> dict:
+        with self._cond:
+            return {
+                'concurrency_limit': round(self.limit, 2),
+                'in_flight': self.in_flight,
+                'requests_per_minute': round(self.requests.rate * 60, 1),
+                'tokens_per_minute': round(self.tokens.rate * 60, 1) if self.tokens else None,
+                'calls': self.calls,
+                'throttled': self.throttled,
+                'waits': self.waits,
+                'wait_time': round(self.wait_time, 3),
+                'latency_ewma': round(self.latency_ewma, 3) if self.latency_ewma else None,
+            }
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(name: str) -> AdaptiveLimiter:
+    """Process-wide limiter for `llm` or `search`, shared by every agent and tool."""
+    with _limiters_lock:
+        if name not in _limiters:
+            if name == 'llm':
+                _limiters[name] = AdaptiveLimiter(
+                    'llm',
+                    requests_per_minute=float(os.getenv('MARS_LLM_RPM', '500')),
+                    tokens_per_minute=float(os.getenv('MARS_LLM_TPM', '200000')),
+                    max_concurrency=int(os.getenv('MARS_LLM_MAX_CONCURRENCY', '8')),
+                )
+            elif name == 'search':
+                _limiters[name] = AdaptiveLimiter(
+                    'search',
+                    requests_per_minute=float(os.getenv('MARS_SEARCH_RPM', '300')),
+                    max_concurrency=int(os.getenv('MARS_SEARCH_MAX_CONCURRENCY', '4')),
+                )
+            else:
+                raise ValueError(f"Unknown rate limiter: {name}")
+        return _limiters[name]
+
+
+def rate_limit_metrics() -> dict:
+    with _limiters_lock:
+        limiters = dict(_limiters)
+    return {name: limiter.snapshot() for name, limiter in limiters.items()}
@@ -0,0 +1,73 @@
+import os
+import threading
+from datetime import datetime
+from typing import Optional
+
+from .cache import CACHE_DIR
+
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+
+# Markdown extensions of every report
+MARKDOWN_EXTENSIONS = ['tables', 'fenced_code', 'toc']
+
+_environment = None
+_environment_lock = threading.Lock()
+_converters = threading.local()
+
+
+def get_template_environment():
+    """
+    Process-wide Jinja environment of the report templates.
+
+    Templates are compiled once per process and kept in memory; the compiled
+    bytecode is also cached under `.mars_cache/jinja` so new processes (batch
+    and web workers) skip the compile too. The stylesheet is included at
+    compile time, so rendering only fills in the document's fields.
+    """
+    global _environment
+    with _environment_lock:
+        if _environment is None:
+            from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+
+            bytecode_dir = os.path.join(CACHE_DIR, 'jinja')
+            os.makedirs(bytecode_dir, exist_ok=True)
+            # Templates ship with the package and do not change while it runs
+            _environment = Environment(
+                loader=FileSystemLoader(TEMPLATE_DIR),
+                bytecode_cache=FileSystemBytecodeCache(bytecode_dir),
+                auto_reload=False,
+            )
+        return _environment
+
+
+def markdown_converter():
+    """This thread's Markdown converter; the extensions are loaded once per thread, not per document."""
+    converter = getattr(_converters, 'converter', None)
+    if converter is None:
+        import markdown
+
+        converter = markdown.Markdown(extensions=MARKDOWN_EXTENSIONS)
+        _converters.converter = converter
+    return converter
+
+
+def markdown_to_html(content: str) -> str:
+    # reset() clears the state left by the previous document (toc, footnotes, references)
+    return markdown_converter().reset().convert(content)
+
+
+def build_report_html(content: str, title: str, document_type: str = "report",
+                      date: Optional[str] = None, section_breaks: bool = False) -> str:
+    """
+    HTML of a report from its markdown `content`, styled for wkhtmltopdf.
+    With `section_breaks`, every top-level (`#`) heading starts a new page.
+    """
+    template = get_template_environment().get_template('report.html')
+    return template.render(
+        title=title,
+        content=markdown_to_html(content),
+        document_type=document_type,
+        date=date or datetime.now().strftime("%B %d, %Y"),
+        section_breaks=section_breaks,
+    )
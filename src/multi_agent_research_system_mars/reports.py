@@ -0,0 +1,250 @@
+import multiprocessing
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from .text_layout import draw_pages, layout_report
+
+
+REPORT_TYPES = ('comprehensive', 'executive', 'market', 'technical')
+
+
+def generate_comprehensive_pdf_content(data):
+    content = [
+        "## EXECUTIVE SUMMARY",
+        "",
+        data['results'].get('documentation', {}).get('executive_summary', 'Comprehensive analysis completed.'),
+        "",
+        "## TECHNOLOGY ANALYSIS",
+        "",
+        data['results'].get('technology', {}).get('summary', 'Technology analysis completed.'),
+        "",
+        "### Key Findings:",
+    ]
+    tech_findings = data['results'].get('technology', {}).get('key_findings', [])
+    for finding in tech_findings:
+        content.append(f"• {finding}")
+    content.extend([
+        "",
+        "## MARKET ANALYSIS",
+        "",
+        data['results'].get('market', {}).get('summary', 'Market analysis completed.'),
+        "",
+        f"Market Size: {data['results'].get('market', {}).get('market_size', 'Data not available')}",
+        "",
+        "## FINANCIAL PROJECTIONS",
+        "",
+        data['results'].get('financial', {}).get('summary', 'Financial analysis completed.'),
+    ])
+    return content
+
+def generate_executive_pdf_content(data):
+    return [
+        "## EXECUTIVE SUMMARY",
+        "",
+        data['results'].get('documentation', {}).get('executive_summary', 'Executive summary not available.'),
+        "",
+        "## KEY INSIGHTS",
+        "",
+        "• Technology feasibility: Strong",
+        "• Market opportunity: High growth potential",
+        "• Financial projections: Positive ROI expected",
+        "• Implementation timeline: 6-12 months",
+        "",
+        "## RECOMMENDATIONS",
+        "",
+        "• Proceed with development",
+        "• Secure initial funding",
+        "• Form strategic partnerships",
+        "",
+        "## NEXT STEPS",
+        "",
+        "• Detailed implementation planning",
+        "• Prototype development",
+        "• Market validation testing"
+    ]
+
+def generate_market_pdf_content(data):
+    market_data = data['results'].get('market', {})
+    content = [
+        "## MARKET ANALYSIS REPORT",
+        "",
+        market_data.get('summary', 'Market analysis not available.'),
+        "",
+        f"## MARKET SIZE: {market_data.get('market_size', 'Data not available')}",
+        "",
+        "## KEY PLAYERS",
+        ""
+    ]
+    players = market_data.get('key_players', [])
+    for player in players:
+        content.append(f"• {player}")
+    content.extend([
+        "",
+        "## OPPORTUNITIES",
+        ""
+    ])
+    opportunities = market_data.get('opportunities', [])
+    for opp in opportunities:
+        content.append(f"• {opp}")
+    return content
+
+def generate_technical_pdf_content(data):
+    tech_data = data['results'].get('technical', {})
+    content = [
+        "## TECHNICAL FEASIBILITY REPORT",
+        "",
+        tech_data.get('summary', 'Technical analysis not available.'),
+        "",
+        "## TECHNICAL REQUIREMENTS",
+        ""
+    ]
+    requirements = tech_data.get('technical_requirements', [])
+    for req in requirements:
+        content.append(f"• {req}")
+    content.extend([
+        "",
+        f"## IMPLEMENTATION TIMELINE: {tech_data.get('implementation_timeline', 'Not specified')}",
+        "",
+        f"## RISK ASSESSMENT: {tech_data.get('risk_assessment', 'Not specified')}",
+        "",
+        "## TECHNOLOGY STACK",
+        "",
+        "• Modern cloud infrastructure",
+        "• Scalable microservices architecture",
+        "• AI/ML integration capabilities",
+        "• Real-time data processing"
+    ])
+    return content
+
+def result_markdown(result):
+    """Markdown text of one research step's result, as stored for search and export"""
+    lines = []
+    for key, value in result.items():
+        label = key.replace('_', ' ').title()
+        if key == 'title':
+            lines.append(f"# {value}")
+        elif isinstance(value, dict):
+            lines.append(f"## {label}")
+            lines.extend(f"- {k.replace('_', ' ').title()}: {v}" for k, v in value.items())
+        elif isinstance(value, list):
+            lines.append(f"## {label}")
+            lines.extend(f"- {item}" for item in value)
+        else:
+            lines.extend([f"## {label}", str(value)])
+        lines.append("")
+    return '\n'.join(lines)
+
+def render_pdf(pdf_type, data):
+    """Render one report type to PDF bytes"""
+    from reportlab.pdfgen import canvas
+    from reportlab.lib.pagesizes import letter
+    from io import BytesIO
+
+    buffer = BytesIO()
+    # Invariant: no creation date or random document ID, so the same data always renders the same bytes
+    p = canvas.Canvas(buffer, pagesize=letter, invariant=1)
+    topic = data['topic']
+    if pdf_type == 'executive':
+        content_lines = generate_executive_pdf_content(data)
+    elif pdf_type == 'market':
+        content_lines = generate_market_pdf_content(data)
+    elif pdf_type == 'technical':
+        content_lines = generate_technical_pdf_content(data)
+    else:
+        content_lines = generate_comprehensive_pdf_content(data)
+    pages = layout_report(
+        f"{pdf_type.upper()} REPORT: {topic}",
+        [f"Generated: {data.get('timestamp', 'N/A')}", f"Research Topic: {topic}"],
+        content_lines,
+    )
+    draw_pages(p, pages)
+    p.save()
+    return buffer.getvalue()
+
+
+
+@dataclass
+class RenderResult:
+    """Outcome of rendering one report type."""
+    pdf_type: str
+    pdf: Optional[bytes] = None
+    seconds: float = 0.0
+    error: Optional[str] = None
+
+
+def _timed_render(pdf_type, data) -> RenderResult:
+    started = time.perf_counter()
+    try:
+        pdf = render_pdf(pdf_type, data)
+    except Exception as e:
+        # Returned rather than raised so one bad document never affects the others
+        traceback.print_exc()
+        return RenderResult(pdf_type, seconds=time.perf_counter() - started, error=str(e))
+    return RenderResult(pdf_type, pdf=pdf, seconds=time.perf_counter() - started)
+
+
+_render_pool = None
+
+
+def get_render_pool() -> ProcessPoolExecutor:
+    """
+    Process pool shared by all report renders (MARS_PDF_WORKERS, default one per core).
+
+    The pool is created lazily inside threaded processes (Flask, gthread
+    workers, worker.py), where forking could copy locks held by other threads
+    (SQLite, logging) into the children, so workers are started from a
+    forkserver (or spawned where that is unavailable).
+    """
+    global _render_pool
+    if _render_pool is None:
+        method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+        _render_pool = ProcessPoolExecutor(max_workers=int(os.getenv('MARS_PDF_WORKERS', str(os.cpu_count() or 1))),
+                                           mp_context=multiprocessing.get_context(method))
+    return _render_pool
+
+
+def _discard_render_pool(pool: ProcessPoolExecutor) -> None:
+    """Drop a broken pool so the next render starts a fresh one (unless another thread already has)."""
+    global _render_pool
+    if _render_pool is pool:
+        _render_pool = None
+    pool.shutdown(wait=False)
+
+
+def render_reports(data, pdf_types: List[str] = REPORT_TYPES) -> Dict[str, RenderResult]:
+    """
+    Render several report types concurrently in the render process pool.
+
+    Rendering is CPU-bound, so each document gets its own process. A document
+    that fails (or whose worker dies) gets a RenderResult with `error` set and
+    the others are unaffected. A pool broken by a dead worker is replaced on
+    the next call.
+    """
+    if not pdf_types:
+        return {}
+    pool = get_render_pool()
+    futures = {}
+    results = {}
+    for pdf_type in pdf_types:
+        try:
+            futures[pool.submit(_timed_render, pdf_type, data)] = pdf_type
+        except BrokenProcessPool as e:
+            results[pdf_type] = RenderResult(pdf_type, error=f"Render pool unavailable: {e}")
+    broken = len(results) > 0
+    for future in as_completed(futures):
+        pdf_type = futures[future]
+        try:
+            results[pdf_type] = future.result()
+        except BrokenProcessPool as e:
+            broken = True
+            results[pdf_type] = RenderResult(pdf_type, error=f"Render worker died: {e}")
+        except Exception as e:
+            results[pdf_type] = RenderResult(pdf_type, error=f"Render worker failed: {e}")
+    if broken:
+        _discard_render_pool(pool)
+    return results
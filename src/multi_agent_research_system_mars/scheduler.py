@@ -0,0 +1,360 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import yaml
+
+from .compaction import ContextCompactor
+
+
+TASKS_CONFIG_PATH = os.path.join(os.path.dirname(__file__), 'config', 'tasks.yaml')
+AGENTS_CONFIG_PATH = os.path.join(os.path.dirname(__file__), 'config', 'agents.yaml')
+
+# Same divider crewAI uses when it aggregates context outputs for a task
+CONTEXT_DIVIDER = "\n\n----------\n\n"
+
+
+def load_tasks_config(path: str = TASKS_CONFIG_PATH) -> dict:
+    """Raw tasks.yaml mapping (task name -> config)."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return yaml.safe_load(f) or {}
+
+
+def load_agents_config(path: str = AGENTS_CONFIG_PATH) -> dict:
+    """Raw agents.yaml mapping (agent name -> config)."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return yaml.safe_load(f) or {}
+
+
+class TaskGraph:
+    """Task dependency graph built from the `context` entries in tasks.yaml."""
+
+    def __init__(self, dependencies: Dict[str, List[str]]):
+        self.dependencies = {name: list(deps) for name, deps in dependencies.items()}
+        for name, deps in self.dependencies.items():
+            for dep in deps:
+                if dep not in self.dependencies:
+                    raise ValueError(f"Task '{name}' depends on unknown task '{dep}'")
+        self.order = self._topological_order()
+
+    @classmethod
+    def from_config(cls, tasks_config: dict) -> "TaskGraph":
+        """Build the graph from a tasks config mapping (task name -> config)."""
+        dependencies = {}
+        for name, config in tasks_config.items():
+            context = (config or {}).get('context') or []
+            # CrewBase replaces context names with Task objects once loaded
+            dependencies[name] = [getattr(dep, 'name', dep) for dep in context]
+        return cls(dependencies)
+
+    @classmethod
+    def chain(cls, names: List[str]) -> "TaskGraph":
+        """Graph of steps that run one after another, in the given order."""
+        return cls({name: names[index - 1:index] for index, name in enumerate(names)})
+
+    @classmethod
+    def load(cls, path: str = TASKS_CONFIG_PATH) -> "TaskGraph":
+        """Build the graph straight from a tasks.yaml file."""
+        return cls.from_config(load_tasks_config(path))
+
+    @property
+    def nodes(self) -> List[str]:
+        return list(self.dependencies)
+
+    def dependents(self, name: str) -> List[str]:
+        """Tasks that list `name` in their context."""
+        return [n for n, deps in self.dependencies.items() if name in deps]
+
+    def downstream(self, names) -> set:
+        """All tasks that transitively depend on any of `names` (inclusive)."""
+        result = set(names)
+        for name in self.order:
+            if any(dep in result for dep in self.dependencies[name]):
+                result.add(name)
+        return result
+
+    def ready(self, completed, started) -> List[str]:
+        """Tasks whose dependencies are all completed and that have not started."""
+        return [
+            name for name in self.order
+            if name not in started and all(dep in completed for dep in self.dependencies[name])
+        ]
+
+    def levels(self) -> List[List[str]]:
+        """Group tasks by longest distance from a root; each level can run at once."""
+        depth = {}
+        for name in self.order:
+            deps = self.dependencies[name]
+            depth[name] = max((depth[d] + 1 for d in deps), default=0)
+        levels = [[] for _ in range(max(depth.values(), default=-1) + 1)]
+        for name in self.order:
+            levels[depth[name]].append(name)
+        return levels
+
+    def critical_path(self, durations: Optional[Dict[str, float]] = None):
+        """
+        Return (path, length) of the longest dependency chain.
+        Without durations every task counts as one unit.
+        """
+        durations = durations or {}
+        finish = {}
+        previous = {}
+        for name in self.order:
+            best_dep = max(self.dependencies[name], key=lambda d: finish[d], default=None)
+            start = finish[best_dep] if best_dep else 0.0
+            finish[name] = start + durations.get(name, 1.0)
+            previous[name] = best_dep
+        if not finish:
+            return [], 0.0
+        node = max(self.order, key=lambda n: finish[n])
+        length = finish[node]
+        path = []
+        while node:
+            path.append(node)
+            node = previous[node]
+        return list(reversed(path)), length
+
+    def _topological_order(self) -> List[str]:
+        order = []
+        state = {}
+
+        def visit(name, trail):
+            if state.get(name) == 'done':
+                return
+            if state.get(name) == 'visiting':
+                cycle = ' -> '.join(trail + [name])
+                raise ValueError(f"Task context contains a cycle: {cycle}")
+            state[name] = 'visiting'
+            for dep in self.dependencies[name]:
+                visit(dep, trail + [name])
+            state[name] = 'done'
+            order.append(name)
+
+        for name in self.dependencies:
+            visit(name, [])
+        return order
+
+
+@dataclass
+class RunSummary:
+    """Timing summary of a crew run."""
+    mode: str
+    max_workers: int = 1
+    wall_time: float = 0.0
+    task_durations: Dict[str, float] = field(default_factory=dict)
+    levels: List[List[str]] = field(default_factory=list)
+    critical_path: List[str] = field(default_factory=list)
+    critical_path_time: float = 0.0
+    peak_concurrency: int = 0
+    # task name -> (context tokens before, after compaction)
+    context_tokens: Dict[str, tuple] = field(default_factory=dict)
+    # tasks restored from a checkpoint instead of being executed
+    skipped: List[str] = field(default_factory=list)
+    # tasks whose fingerprint matched a memoized output
+    memoized: List[str] = field(default_factory=list)
+
+    def to_dict(self) -> dict:
+        return {
+            'mode': self.mode,
+            'max_workers': self.max_workers,
+            'wall_time': round(self.wall_time, 3),
+            'task_durations': {k: round(v, 3) for k, v in self.task_durations.items()},
+            'level_concurrency': [len(level) for level in self.levels],
+            'levels': self.levels,
+            'critical_path': self.critical_path,
+            'critical_path_time': round(self.critical_path_time, 3),
+            'serial_time': round(sum(self.task_durations.values()), 3),
+            'peak_concurrency': self.peak_concurrency,
+            'skipped': self.skipped,
+            'memoized': self.memoized,
+            'context_tokens': {
+                name: {'before': before, 'after': after}
+                for name, (before, after) in self.context_tokens.items()
+            },
+        }
+
+    def format(self) -> str:
+        """Human readable summary for the terminal."""
+        lines = [
+            f"📊 Run summary ({self.mode}, max {self.max_workers} workers)",
+            f"   Wall time: {self.wall_time:.1f}s "
+            f"(sum of task times {sum(self.task_durations.values()):.1f}s)",
+            f"   Critical path ({self.critical_path_time:.1f}s): {' -> '.join(self.critical_path)}",
+            f"   Peak concurrency: {self.peak_concurrency}",
+        ]
+        if self.skipped:
+            lines.append(f"   Restored from checkpoint: {', '.join(self.skipped)}")
+        if self.memoized:
+            lines.append(f"   Reused memoized outputs: {', '.join(self.memoized)}")
+        for i, level in enumerate(self.levels):
+            lines.append(f"   Level {i} ({len(level)} concurrent): {', '.join(level)}")
+        for name, (before, after) in self.context_tokens.items():
+            lines.append(f"   Context tokens for {name}: {before} -> {after} after compaction")
+        return "\n".join(lines)
+
+
+def _task_context(task) -> list:
+    # crewAI uses a NOT_SPECIFIED sentinel when a task has no explicit context
+    return task.context if isinstance(task.context, list) else []
+
+
+class ParallelCrewRunner:
+    """
+    Run a crew's tasks as a DAG, starting every task as soon as the tasks in its
+    `context` have finished, with at most `max_workers` tasks in flight.
+    With one worker the tasks run one after another in dependency order,
+    which is how the default sequential mode runs.
+    """
+
+    def __init__(self, crew, graph: Optional[TaskGraph] = None, max_workers: Optional[int] = None,
+                 compactor: Optional[ContextCompactor] = None, recorder=None, memo=None, cancel_token=None):
+        self.crew = crew
+        self.tasks = {task.name: task for task in crew.tasks}
+        self.graph = graph or TaskGraph({
+            task.name: [dep.name for dep in _task_context(task) if dep.name in self.tasks]
+            for task in crew.tasks
+        })
+        self.max_workers = max_workers or int(os.getenv('MARS_MAX_WORKERS', '4'))
+        if compactor is None and int(os.getenv('MARS_CONTEXT_BUDGET', '1500')) > 0:
+            compactor = ContextCompactor()
+        self.compactor = compactor
+        # Optional RunRecorder; task completions reach it through the crew's task_callback
+        self.recorder = recorder
+        # Optional TaskMemo; tasks whose fingerprint is memoized are not executed
+        self.memo = memo
+        # Optional CancelToken; once cancelled no further task is started
+        self.cancel_token = cancel_token
+        self.summary = RunSummary(mode='parallel' if self.max_workers > 1 else 'sequential',
+                                  max_workers=self.max_workers)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+
+    def build_context(self, name: str, outputs: dict) -> str:
+        """
+        Aggregate the raw outputs of a task's context dependencies, compacted to
+        per-upstream digests for fan-in tasks.
+        """
+        deps = self.graph.dependencies[name]
+        if self.compactor and self.compactor.applies_to(deps):
+            upstream = {dep: outputs[dep].raw for dep in deps}
+            context = self.compactor.compact(name, upstream, CONTEXT_DIVIDER)
+            self.summary.context_tokens[name] = self.compactor.token_counts[name]
+            return context
+        return CONTEXT_DIVIDER.join(outputs[dep].raw for dep in deps)
+
+    def task_tools(self, name: str, outputs: dict) -> list:
+        task = self.tasks[name]
+        tools = list(task.tools or task.agent.tools or [])
+        deps = self.graph.dependencies[name]
+        if self.compactor and self.compactor.applies_to(deps):
+            from .tools.upstream_report_tool import UpstreamReportTool
+
+            # Full upstream reports stay available on demand
+            tools.append(UpstreamReportTool(reports={dep: outputs[dep].raw for dep in deps}))
+        return tools
+
+    def dep_hashes(self, name: str, outputs: dict) -> Dict[str, str]:
+        from .memo import output_hash
+
+        return {dep: output_hash(outputs[dep].raw) for dep in self.graph.dependencies[name]}
+
+    def memoized_output(self, name: str, inputs: dict, outputs: dict):
+        """TaskOutput memoized for this task's current fingerprint, if any."""
+        from .checkpoint import task_output_from_record
+
+        record = self.memo.lookup(name, inputs, self.dep_hashes(name, outputs))
+        return task_output_from_record(record) if record else None
+
+    def execute_task(self, name: str, outputs: dict):
+        task = self.tasks[name]
+        context = self.build_context(name, outputs)
+        tools = self.task_tools(name, outputs)
+        with self._lock:
+            self._in_flight += 1
+            self.summary.peak_concurrency = max(self.summary.peak_concurrency, self._in_flight)
+        if self.recorder:
+            self.recorder.task_started(name)
+        started = time.monotonic()
+        try:
+            return task.execute_sync(
+                agent=task.agent,
+                context=context,
+                tools=tools,
+            )
+        except Exception as e:
+            if self.recorder:
+                self.recorder.task_failed(name, e)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+                self.summary.task_durations[name] = time.monotonic() - started
+
+    def run(self, inputs: dict, completed: Optional[dict] = None):
+        """
+        Run all tasks and return a CrewOutput like `Crew.kickoff` does.
+        `completed` maps task names to TaskOutputs from an earlier run; those
+        tasks are not executed again, and neither are tasks with a memoized
+        output for their fingerprint when a memo is set.
+        """
+        from crewai.crews.crew_output import CrewOutput
+
+        self.crew._interpolate_inputs(inputs)
+        for agent in self.crew.agents:
+            agent.crew = self.crew
+
+        outputs = {name: output for name, output in (completed or {}).items() if name in self.tasks}
+        self.summary.skipped = list(outputs)
+        started = set(outputs)
+        running = {}
+        run_started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while len(outputs) < len(self.graph.nodes):
+                ready = self.graph.ready(outputs, started)
+                while ready:
+                    if self.cancel_token is not None:
+                        self.cancel_token.check()
+                    for name in ready:
+                        started.add(name)
+                        output = self.memoized_output(name, inputs, outputs) if self.memo else None
+                        if output is not None:
+                            outputs[name] = output
+                            self.summary.memoized.append(name)
+                            if self.recorder:
+                                self.recorder.mark_completed([name])
+                            continue
+                        if self.recorder:
+                            self.recorder.task_queued(name)
+                        running[pool.submit(self.execute_task, name, dict(outputs))] = name
+                    # Memoized tasks complete immediately and may unblock their dependents
+                    ready = self.graph.ready(outputs, started)
+                if len(outputs) == len(self.graph.nodes):
+                    break
+                if not running:
+                    raise RuntimeError("No runnable tasks left; task graph is inconsistent")
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        outputs[name] = future.result()
+                    except Exception:
+                        for other in running:
+                            other.cancel()
+                        raise
+                    if self.memo:
+                        self.memo.save(name, inputs, self.dep_hashes(name, outputs), outputs[name])
+
+        self.summary.wall_time = time.monotonic() - run_started
+        self.summary.levels = self.graph.levels()
+        self.summary.critical_path, self.summary.critical_path_time = \
+            self.graph.critical_path(self.summary.task_durations)
+
+        tasks_output = [outputs[task.name] for task in self.crew.tasks]
+        return CrewOutput(
+            raw=tasks_output[-1].raw if tasks_output else '',
+            tasks_output=tasks_output,
+            token_usage=self.crew.calculate_usage_metrics(),
+        )
@@ -0,0 +1,60 @@
+import threading
+from typing import Any, Callable, Dict
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesce identical concurrent calls: the first caller for a key runs the
+    call and every caller that arrives while it is in flight waits for and
+    shares its result (or exception). Nothing is kept once the call returns.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    def do(self, key: str, fn: Callable, *args, **kwargs) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def stats(self) -> dict:
+        total = self.executed + self.coalesced
+        return {
+            'calls': total,
+            'executed': self.executed,
+            'coalesced': self.coalesced,
+            'in_flight': len(self._calls),
+        }
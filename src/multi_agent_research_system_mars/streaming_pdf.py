@@ -0,0 +1,144 @@
+import io
+import itertools
+import os
+import zlib
+from datetime import datetime
+from functools import lru_cache
+from typing import Iterable, Iterator, List, Optional, Tuple
+from xml.sax.saxutils import escape
+
+
+# Flowables held ahead of the page being laid out
+STORY_WINDOW = int(os.getenv('MARS_PDF_STORY_WINDOW', '256'))
+
+
+class LazyStory(list):
+    """
+    Platypus story that is filled from an iterator as the document consumes it.
+
+    `doc.build()` loops `while len(story)`, taking flowables off the front
+    and putting split remainders back there. Refilling in `__len__` whenever
+    fewer than half of `window` flowables are left keeps at most `window` of
+    them alive, and the front deletions stay cheap however long the document.
+    """
+
+    def __init__(self, flowables: Iterable, window: int = STORY_WINDOW):
+        super().__init__()
+        self.window = max(2, window)
+        self._source = iter(flowables)
+
+    def __len__(self) -> int:
+        size = super().__len__()
+        if self._source is not None and size <= self.window // 2:
+            self.extend(itertools.islice(self._source, self.window - size))
+            if super().__len__() < self.window:
+                self._source = None
+            size = super().__len__()
+        return size
+
+
+@lru_cache(maxsize=None)
+def page_flushing_canvas():
+    """
+    Canvas class that compresses each page's content stream as soon as the
+    page is finished; reportlab otherwise keeps every page's drawing
+    operators as text until the whole document is saved.
+    """
+    from reportlab.pdfbase.pdfdoc import PDFArray, PDFDictionary, PDFName, PDFStream, pdfdocEnc
+    from reportlab.pdfgen.canvas import Canvas
+
+    class PageFlushingCanvas(Canvas):
+        def showPage(self):
+            super().showPage()
+            page = self._doc.Pages.pages[-1]
+            if page.stream and not page.Contents:
+                # A Filter already in the dictionary tells the PDF writer the stream is encoded
+                dictionary = PDFDictionary()
+                dictionary['Filter'] = PDFArray([PDFName('FlateDecode')])
+                page.Contents = PDFStream(dictionary, zlib.compress(pdfdocEnc(page.stream)))
+                page.stream = None
+
+    return PageFlushingCanvas
+
+
+def iter_lines(content: str) -> Iterator[str]:
+    """Lines of `content`, one at a time instead of a list of all of them."""
+    for line in io.StringIO(content):
+        yield line.rstrip('\n')
+
+
+def markdown_flowables(lines: Iterable[str], styles, section_breaks: bool = False) -> Iterator:
+    """
+    Flowables of simple markdown lines: headings, paragraphs and blank-line
+    spacers. With `section_breaks`, every `#` heading starts a new page.
+    """
+    from reportlab.platypus import Paragraph, Spacer
+    from reportlab.platypus.flowables import PageBreakIfNotEmpty
+
+    fenced = False
+    for line in lines:
+        line = line.strip()
+        if line.startswith(('```', '~~~')):
+            # Lines in code blocks are never headings
+            fenced = not fenced
+            continue
+        if not line:
+            yield Spacer(1, 12)
+        elif fenced:
+            yield Paragraph(escape(line), styles['Code'])
+        elif line.startswith('# '):
+            if section_breaks:
+                yield PageBreakIfNotEmpty()
+            yield Paragraph(line[2:], styles['Heading1'])
+        elif line.startswith('## '):
+            yield Paragraph(line[3:], styles['Heading2'])
+        elif line.startswith('### '):
+            yield Paragraph(line[4:], styles['Heading3'])
+        else:
+            # Clean up markdown formatting
+            clean_line = line.replace('**', '').replace('*', '').replace('`', '')
+            if clean_line:
+                yield Paragraph(clean_line, styles['Normal'])
+
+
+def build_streaming_pdf(output_path: str, title: str, lines: Iterable[str],
+                        window: int = STORY_WINDOW, section_breaks: bool = False,
+                        headings: Optional[List[Tuple[str, int]]] = None) -> int:
+    """
+    Write a simple PDF of markdown `lines` to `output_path`, returning its page count.
+    `headings`, if given, receives `(title, page index)` of every `#` heading as it is placed.
+
+    `lines` is consumed lazily (pass a generator such as `iter_lines`), so
+    only about `window` flowables exist at once, and each finished page is
+    compressed straight away. reportlab writes the file only when it is
+    saved, so memory still grows by the compressed pages, a small fraction
+    of the story and page text it used to hold.
+    """
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+    from reportlab.platypus import PageBreak, Paragraph, SimpleDocTemplate, Spacer
+
+    doc = SimpleDocTemplate(output_path, pagesize=A4,
+                            rightMargin=72, leftMargin=72,
+                            topMargin=72, bottomMargin=18)
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=24,
+        spaceAfter=30,
+        textColor=colors.darkblue,
+        alignment=1  # Center alignment
+    )
+    info_text = f"Generated by MARS - Multi-Agent Research System<br/>{datetime.now().strftime('%B %d, %Y')}"
+    cover = [Paragraph(title, title_style), Spacer(1, 20), Paragraph(info_text, styles['Normal']), PageBreak()]
+    if headings is not None:
+        def after_flowable(flowable):
+            if isinstance(flowable, Paragraph) and flowable.style.name == 'Heading1':
+                headings.append((flowable.getPlainText(), doc.page - 1))
+        doc.afterFlowable = after_flowable
+    story = itertools.chain(cover, markdown_flowables(lines, styles, section_breaks))
+    doc.build(LazyStory(story, window),
+              canvasmaker=page_flushing_canvas())
+    return doc.page
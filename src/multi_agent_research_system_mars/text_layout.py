@@ -0,0 +1,159 @@
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+
+class TextStyle(NamedTuple):
+    font: str
+    size: float
+    leading: float
+    space_before: float = 0.0
+
+
+# Styles of the canvas reports; headings are taken from markdown '#' prefixes
+STYLES = {
+    'title': TextStyle('Helvetica-Bold', 20, 24),
+    'meta': TextStyle('Helvetica', 10, 15),
+    'h1': TextStyle('Helvetica-Bold', 16, 22, 10),
+    'h2': TextStyle('Helvetica-Bold', 14, 20, 8),
+    'h3': TextStyle('Helvetica-Bold', 12, 18, 6),
+    'body': TextStyle('Helvetica', 12, 20),
+}
+
+_HEADING = re.compile(r'(#{1,6})\s*(.*)')
+
+
+@dataclass(frozen=True)
+class PageLayout:
+    """Page geometry in points; the defaults are the US letter pages of the web reports."""
+    width: float = 612
+    height: float = 792
+    left: float = 100
+    right: float = 72
+    top: float = 750
+    bottom: float = 50
+
+    @property
+    def text_width(self) -> float:
+        return self.width - self.left - self.right
+
+
+class PlacedLine(NamedTuple):
+    text: str
+    font: str
+    size: float
+    x: float
+    y: float
+
+
+@lru_cache(maxsize=65536)
+def token_width(token: str, font: str, size: float) -> float:
+    """Width of one word (or character) in points, measured once per (token, font, size)."""
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+
+    return stringWidth(token, font, size)
+
+
+def _split_word(word: str, font: str, size: float, max_width: float) -> List[str]:
+    """Pieces of a word too wide for a line (URLs, identifiers), broken between characters."""
+    pieces, current, width = [], '', 0.0
+    for char in word:
+        char_width = token_width(char, font, size)
+        if current and width + char_width > max_width:
+            pieces.append(current)
+            current, width = '', 0.0
+        current += char
+        width += char_width
+    pieces.append(current)
+    return pieces
+
+
+def wrap_text(text: str, font: str, size: float, max_width: float) -> List[str]:
+    """Greedy word wrap of `text` into lines no wider than `max_width`."""
+    words = text.split()
+    if not words:
+        return ['']
+    space = token_width(' ', font, size)
+    lines, current, width = [], [], 0.0
+    for word in words:
+        word_width = token_width(word, font, size)
+        if word_width > max_width:
+            if current:
+                lines.append(' '.join(current))
+            *full, last = _split_word(word, font, size, max_width)
+            lines.extend(full)
+            current, width = [last], token_width(last, font, size)
+        elif current and width + space + word_width > max_width:
+            lines.append(' '.join(current))
+            current, width = [word], word_width
+        else:
+            width += word_width + (space if current else 0.0)
+            current.append(word)
+    lines.append(' '.join(current))
+    return lines
+
+
+def classify_line(line: str) -> Tuple[str, str]:
+    """(style name, text) of one markdown content line."""
+    match = _HEADING.match(line.strip())
+    if match:
+        return f"h{min(len(match.group(1)), 3)}", match.group(2).strip()
+    return 'body', line.strip()
+
+
+def layout_blocks(blocks: Iterable[Tuple[str, str]], layout: PageLayout = PageLayout()) -> List[List[PlacedLine]]:
+    """
+    Lay out `(style name, text)` blocks into pages of placed lines.
+
+    Text is wrapped to the page width rather than cut off, blank lines at
+    the top of a page are dropped, and a heading only goes on a page with
+    room for the line after it, so it never ends a page.
+    """
+    pages, page = [], []
+    y = layout.top
+    for style_name, text in blocks:
+        style = STYLES[style_name]
+        if not text:
+            if page:
+                y -= style.leading
+            continue
+        if page:
+            y -= style.space_before
+        wrapped = wrap_text(text, style.font, style.size, layout.text_width)
+        # A heading needs room for the line after it too
+        if page and style_name.startswith('h') and y - style.leading < layout.bottom:
+            pages.append(page)
+            page, y = [], layout.top
+        for text_line in wrapped:
+            if y < layout.bottom:
+                pages.append(page)
+                page, y = [], layout.top
+            page.append(PlacedLine(text_line, style.font, style.size, layout.left, y))
+            y -= style.leading
+    pages.append(page)
+    return pages
+
+
+def layout_report(title: str, meta: Sequence[str], content_lines: Iterable[str],
+                  layout: PageLayout = PageLayout()) -> List[List[PlacedLine]]:
+    """Pages of a report: the title and metadata lines, then the markdown content lines."""
+    blocks = [('title', title)]
+    blocks.extend(('meta', line) for line in meta)
+    blocks.append(('body', ''))
+    blocks.extend(classify_line(line) for line in content_lines)
+    return layout_blocks(blocks, layout)
+
+
+def draw_pages(canvas, pages: List[List[PlacedLine]]) -> None:
+    """Draw laid-out pages on a reportlab canvas, one canvas page each."""
+    font: Optional[Tuple[str, float]] = None
+    for number, page in enumerate(pages):
+        if number:
+            canvas.showPage()
+            font = None
+        for line in page:
+            if (line.font, line.size) != font:
+                font = (line.font, line.size)
+                canvas.setFont(*font)
+            canvas.drawString(line.x, line.y, line.text)
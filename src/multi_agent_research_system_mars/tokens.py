@@ -0,0 +1,19 @@
+try:
+    from litellm import token_counter
+except ImportError:  # litellm ships with crewAI, but keep a rough fallback
+    token_counter = None
+
+
+DEFAULT_MODEL = "gpt-4o-mini"
+
+
+def count_tokens(text: str, model: str = DEFAULT_MODEL) -> int:
+    """Token count of `text` for `model`, or a ~4 characters/token estimate."""
+    if not text:
+        return 0
+    if token_counter is not None:
+        try:
+            return token_counter(model=model, text=text)
+        except Exception:
+            pass
+    return max(1, len(text) // 4)
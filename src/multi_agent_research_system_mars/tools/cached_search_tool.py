@@ -0,0 +1,76 @@
+import os
+import re
+from typing import Any, Optional, Type
+from pydantic import BaseModel
+from crewai.tools import BaseTool
+from crewai_tools import SerperDevTool
+
+from ..cache import CACHE_DIR, SQLiteCache, make_key
+from ..rate_limit import get_rate_limiter
+
+
+# Search parameters of the wrapped tool that change the result set
+SEARCH_PARAMS = ('base_url', 'search_type', 'n_results', 'country', 'location', 'locale')
+
+_search_cache = None
+
+
+def get_search_cache() -> SQLiteCache:
+    """Process-wide search cache shared by every agent's search tool."""
+    global _search_cache
+    if _search_cache is None:
+        _search_cache = SQLiteCache(
+            os.path.join(CACHE_DIR, 'search.sqlite3'),
+            ttl=float(os.getenv('MARS_SEARCH_CACHE_TTL', str(24 * 3600))),
+            max_entries=int(os.getenv('MARS_SEARCH_CACHE_MAX_ENTRIES', '5000')),
+            max_bytes=int(os.getenv('MARS_SEARCH_CACHE_MAX_BYTES', str(200 * 1024 * 1024))),
+        )
+    return _search_cache
+
+
+def normalize_query(value: Any) -> Any:
+    """Case- and whitespace-insensitive form of a query string."""
+    if isinstance(value, str):
+        return re.sub(r'\s+', ' ', value).strip().lower()
+    return value
+
+
+def create_search_tool() -> SerperDevTool:
+    """SerperDevTool, pointed at SERPER_BASE_URL when set (e.g. a local stand-in endpoint)."""
+    base_url = os.getenv('SERPER_BASE_URL')
+    return SerperDevTool(base_url=base_url) if base_url else SerperDevTool()
+
+
+class CachedSearchTool(BaseTool):
+    """Search tool wrapper that answers repeated queries from the on-disk search cache."""
+    name: str = "Search the internet with Serper"
+    description: str = "Search the internet; repeated queries are served from a local cache."
+    args_schema: Optional[Type[BaseModel]] = None
+    search_tool: Any = None
+    cache: Any = None
+
+    def __init__(self, search_tool: Optional[BaseTool] = None, cache: Optional[SQLiteCache] = None, **kwargs):
+        search_tool = search_tool or create_search_tool()
+        super().__init__(
+            name=search_tool.name,
+            description=search_tool.description,
+            args_schema=search_tool.args_schema,
+            search_tool=search_tool,
+            cache=cache or get_search_cache(),
+            **kwargs,
+        )
+
+    def cache_key(self, **kwargs) -> str:
+        params = {name: getattr(self.search_tool, name, None) for name in SEARCH_PARAMS}
+        query = {name: normalize_query(value) for name, value in kwargs.items()}
+        return make_key('search', query, params)
+
+    def _run(self, **kwargs) -> Any:
+        key = self.cache_key(**kwargs)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        with get_rate_limiter('search').slot():
+            result = self.search_tool.run(**kwargs)
+        self.cache.set(key, result)
+        return result
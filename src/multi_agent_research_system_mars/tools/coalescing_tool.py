@@ -0,0 +1,29 @@
+from typing import Any, Optional, Type
+from pydantic import BaseModel
+from crewai.tools import BaseTool
+
+from ..cache import make_key
+from ..singleflight import SingleFlight
+
+
+class CoalescingTool(BaseTool):
+    """Tool wrapper that shares one in-flight call between identical concurrent calls."""
+    name: str = "Coalescing tool"
+    description: str = "Runs the wrapped tool, sharing results of identical concurrent calls."
+    args_schema: Optional[Type[BaseModel]] = None
+    tool: Any = None
+    group: Any = None
+
+    def __init__(self, tool: BaseTool, group: SingleFlight, **kwargs):
+        super().__init__(
+            name=tool.name,
+            description=tool.description,
+            args_schema=tool.args_schema,
+            tool=tool,
+            group=group,
+            **kwargs,
+        )
+
+    def _run(self, **kwargs) -> Any:
+        key = make_key('tool', self.tool.name, kwargs)
+        return self.group.do(key, self.tool.run, **kwargs)
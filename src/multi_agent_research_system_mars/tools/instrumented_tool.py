@@ -0,0 +1,46 @@
+import time
+from typing import Any, Optional, Type
+from pydantic import BaseModel
+from crewai.tools import BaseTool
+
+from ..cancellation import CancelToken
+from ..instrumentation import RunRecorder
+
+
+class InstrumentedTool(BaseTool):
+    """
+    Tool wrapper that records every call of the wrapped tool in the run recorder
+    and, with a cancel token, refuses to start calls once the run was cancelled.
+    """
+    name: str = "Instrumented tool"
+    description: str = "Runs the wrapped tool and records its timing."
+    args_schema: Optional[Type[BaseModel]] = None
+    tool: Any = None
+    recorder: Any = None
+    agent_name: str = ""
+    cancel_token: Any = None
+
+    def __init__(self, tool: BaseTool, recorder: RunRecorder, agent_name: str,
+                 cancel_token: Optional[CancelToken] = None, **kwargs):
+        super().__init__(
+            name=tool.name,
+            description=tool.description,
+            args_schema=tool.args_schema,
+            tool=tool,
+            recorder=recorder,
+            agent_name=agent_name,
+            cancel_token=cancel_token,
+            **kwargs,
+        )
+
+    def _run(self, **kwargs) -> Any:
+        if self.cancel_token is not None:
+            self.cancel_token.check()
+        started = time.monotonic()
+        try:
+            result = self.tool.run(**kwargs)
+        except Exception as e:
+            self.recorder.tool_call(self.agent_name, self.tool.name, time.monotonic() - started, error=str(e))
+            raise
+        self.recorder.tool_call(self.agent_name, self.tool.name, time.monotonic() - started)
+        return result
@@ -1,12 +1,20 @@
 import os
-import tempfile
-from typing import Type, Optional
+from typing import Dict, List, Optional, Tuple, Type
 from pydantic import BaseModel, Field
 from crewai.tools import BaseTool
 from datetime import datetime
-import markdown
-import pdfkit
-from jinja2 import Template
+
+from ..pdf_renderer import OUTLINE_OPTIONS, get_wkhtmltopdf_pool
+from ..pdf_sections import extract_pages, outline_headings, section_key, section_pages, split_sections
+from ..report_html import build_report_html
+
+
+class PDFDocumentInput(BaseModel):
+    """One more document generated by the same call."""
+    content: str = Field(..., description="Markdown content to convert to PDF")
+    title: str = Field(..., description="Document title")
+    filename: str = Field(..., description="Output PDF filename")
+    document_type: Optional[str] = Field(default=None, description="Type of document; defaults to the call's document_type")
 
 
 class PDFGeneratorToolInput(BaseModel):
@@ -15,6 +23,16 @@ class PDFGeneratorToolInput(BaseModel):
     title: str = Field(..., description="Document title")
     filename: str = Field(..., description="Output PDF filename")
     document_type: str = Field(default="report", description="Type of document (report, executive_summary, etc.)")
+    sections: Optional[Dict[str, str]] = Field(
+        default=None,
+        description="For a master document: top-level (#) section heading -> PDF filename of that section. "
+                    "The master is rendered once and each section PDF is cut from its pages."
+    )
+    documents: Optional[List[PDFDocumentInput]] = Field(
+        default=None,
+        description="Further documents to generate in this same call; they are all rendered at once. "
+                    "Pass every PDF of a deliverable in one call rather than one call per PDF."
+    )
 
 
 class PDFGeneratorTool(BaseTool):
@@ -32,394 +50,161 @@ class PDFGeneratorTool(BaseTool):
         self.output_dir = os.path.join(os.getcwd(), "generated_pdfs")
         os.makedirs(self.output_dir, exist_ok=True)
 
+    def _output_path(self, filename: str) -> str:
+        """Path for an output file; MARS_OUTPUT_DIR isolates the outputs of one run (e.g. in batch mode)."""
+        output_dir = os.getenv('MARS_OUTPUT_DIR') or self.output_dir
+        os.makedirs(output_dir, exist_ok=True)
+        return os.path.join(output_dir, filename)
+
     def _create_html_template(self, content: str, title: str, document_type: str) -> str:
         """Create HTML template with professional styling."""
-        
-        # Convert markdown to HTML
-        md_content = markdown.markdown(content, extensions=['tables', 'fenced_code', 'toc'])
-        
-        # Professional HTML template
-        html_template = """
-        <!DOCTYPE html>
-        <html lang="en">
-        <head>
-            <meta charset="UTF-8">
-            <meta name="viewport" content="width=device-width, initial-scale=1.0">
-            <title>{{ title }}</title>
-            <style>
-                @page {
-                    size: A4;
-                    margin: 1in;
-                    @top-center {
-                        content: "{{ title }}";
-                        font-family: 'Arial', sans-serif;
-                        font-size: 10pt;
-                        color: #666;
-                        border-bottom: 1px solid #ddd;
-                        padding-bottom: 5px;
-                    }
-                    @bottom-center {
-                        content: "Page " counter(page) " of " counter(pages);
-                        font-family: 'Arial', sans-serif;
-                        font-size: 9pt;
-                        color: #666;
-                    }
-                    @bottom-right {
-                        content: "Generated on {{ date }}";
-                        font-family: 'Arial', sans-serif;
-                        font-size: 8pt;
-                        color: #999;
-                    }
-                }
-                
-                body {
-                    font-family: 'Arial', 'Helvetica', sans-serif;
-                    line-height: 1.6;
-                    color: #333;
-                    max-width: 100%;
-                    margin: 0;
-                    padding: 0;
-                }
-                
-                .cover-page {
-                    page-break-after: always;
-                    text-align: center;
-                    padding-top: 200px;
-                }
-                
-                .cover-title {
-                    font-size: 36pt;
-                    font-weight: bold;
-                    color: #2c3e50;
-                    margin-bottom: 30px;
-                    line-height: 1.2;
-                }
-                
-                .cover-subtitle {
-                    font-size: 18pt;
-                    color: #7f8c8d;
-                    margin-bottom: 50px;
-                }
-                
-                .cover-info {
-                    font-size: 14pt;
-                    color: #95a5a6;
-                    margin-top: 100px;
-                }
-                
-                h1 {
-                    color: #2c3e50;
-                    font-size: 24pt;
-                    font-weight: bold;
-                    margin-top: 30px;
-                    margin-bottom: 20px;
-                    page-break-before: auto;
-                    border-bottom: 2px solid #3498db;
-                    padding-bottom: 10px;
-                }
-                
-                h2 {
-                    color: #34495e;
-                    font-size: 18pt;
-                    font-weight: bold;
-                    margin-top: 25px;
-                    margin-bottom: 15px;
-                }
-                
-                h3 {
-                    color: #5d6d7e;
-                    font-size: 14pt;
-                    font-weight: bold;
-                    margin-top: 20px;
-                    margin-bottom: 10px;
-                }
-                
-                h4, h5, h6 {
-                    color: #85929e;
-                    font-size: 12pt;
-                    font-weight: bold;
-                    margin-top: 15px;
-                    margin-bottom: 8px;
-                }
-                
-                p {
-                    margin-bottom: 12px;
-                    text-align: justify;
-                    font-size: 11pt;
-                }
-                
-                ul, ol {
-                    margin-bottom: 15px;
-                    padding-left: 25px;
-                }
-                
-                li {
-                    margin-bottom: 5px;
-                    font-size: 11pt;
-                }
-                
-                table {
-                    width: 100%;
-                    border-collapse: collapse;
-                    margin: 20px 0;
-                    font-size: 10pt;
-                }
-                
-                th, td {
-                    border: 1px solid #ddd;
-                    padding: 12px;
-                    text-align: left;
-                }
-                
-                th {
-                    background-color: #f8f9fa;
-                    font-weight: bold;
-                    color: #2c3e50;
-                }
-                
-                tr:nth-child(even) {
-                    background-color: #f8f9fa;
-                }
-                
-                .executive-summary {
-                    background-color: #ecf0f1;
-                    border-left: 5px solid #3498db;
-                    padding: 20px;
-                    margin: 20px 0;
-                    border-radius: 5px;
-                }
-                
-                .highlight {
-                    background-color: #fff3cd;
-                    border: 1px solid #ffeaa7;
-                    padding: 15px;
-                    border-radius: 5px;
-                    margin: 15px 0;
-                }
-                
-                code {
-                    background-color: #f8f9fa;
-                    padding: 2px 5px;
-                    border-radius: 3px;
-                    font-family: 'Courier New', monospace;
-                    font-size: 10pt;
-                }
-                
-                pre {
-                    background-color: #f8f9fa;
-                    border: 1px solid #e9ecef;
-                    border-radius: 5px;
-                    padding: 15px;
-                    overflow-x: auto;
-                    font-size: 9pt;
-                }
-                
-                blockquote {
-                    border-left: 4px solid #3498db;
-                    margin-left: 0;
-                    padding-left: 20px;
-                    font-style: italic;
-                    color: #7f8c8d;
-                }
-                
-                .page-break {
-                    page-break-before: always;
-                }
-                
-                .no-break {
-                    page-break-inside: avoid;
-                }
-                
-                .toc {
-                    page-break-after: always;
-                }
-                
-                .toc h2 {
-                    color: #2c3e50;
-                    border-bottom: 2px solid #3498db;
-                    padding-bottom: 10px;
-                }
-                
-                .toc ul {
-                    list-style: none;
-                    padding-left: 0;
-                }
-                
-                .toc li {
-                    margin-bottom: 8px;
-                    font-size: 11pt;
-                }
-                
-                .toc a {
-                    text-decoration: none;
-                    color: #2c3e50;
-                }
-                
-                .footer-info {
-                    font-size: 8pt;
-                    color: #95a5a6;
-                    text-align: center;
-                    margin-top: 50px;
-                    border-top: 1px solid #ecf0f1;
-                    padding-top: 20px;
-                }
-            </style>
-        </head>
-        <body>
-            <!-- Cover Page -->
-            <div class="cover-page">
-                <div class="cover-title">{{ title }}</div>
-                <div class="cover-subtitle">{{ document_type.replace('_', ' ').title() }}</div>
-                <div class="cover-info">
-                    <p>Generated by MARS - Multi-Agent Research System</p>
-                    <p>{{ date }}</p>
-                </div>
-            </div>
-            
-            <!-- Table of Contents would be generated here if needed -->
-            
-            <!-- Main Content -->
-            <div class="content">
-                {{ content }}
-            </div>
-            
-            <!-- Footer -->
-            <div class="footer-info">
-                <p>This document was generated by MARS (Multi-Agent Research System)</p>
-                <p>Powered by GLM-4 AI and CrewAI Framework</p>
-            </div>
-        </body>
-        </html>
-        """
-        
-        # Render template
-        template = Template(html_template)
-        current_date = datetime.now().strftime("%B %d, %Y")
-        
-        return template.render(
-            title=title,
-            content=md_content,
-            document_type=document_type,
-            date=current_date
-        )
+        # Compiled template and per-thread Markdown converter, shared by every document
+        return build_report_html(content, title, document_type)
 
-    def _run(self, content: str, title: str, filename: str, document_type: str = "report") -> str:
-        """Generate PDF from markdown content."""
+    def _run(self, content: str, title: str, filename: str, document_type: str = "report",
+             sections: Optional[Dict[str, str]] = None, documents: Optional[List] = None) -> str:
+        """Generate PDF from markdown content, plus any further `documents` of the batch."""
         try:
+            batch = []
+            for document in documents or []:
+                if not isinstance(document, dict):
+                    document = document.model_dump()
+                batch.append((document['content'], document['title'], document['filename'],
+                              document.get('document_type') or document_type))
+            if not sections:
+                return "\n".join(self._render_documents([(content, title, filename, document_type)] + batch))
+            # The rest of the batch renders while the master is rendered and cut
+            queued = self._submit_documents(batch)
+            result = self._run_sections(content, title, filename, document_type, sections)
+            return "\n".join([result] + self._collect_documents(queued))
+        except Exception as e:
+            return f"Error generating PDF: {str(e)}"
+
+    def _render_documents(self, documents: List[Tuple[str, str, str, str]]) -> List[str]:
+        """
+        Render `(content, title, filename, document_type)` documents together on
+        the shared wkhtmltopdf pool, so up to its worker count run at once;
+        results in input order.
+        """
+        return self._collect_documents(self._submit_documents(documents))
+
+    def _submit_documents(self, documents: List[Tuple[str, str, str, str]]) -> list:
+        """Queue every document's render on the pool (HTML goes through stdin) without waiting for any."""
+        pool = get_wkhtmltopdf_pool()
+        queued = []
+        for content, title, filename, document_type in documents:
             # Create HTML from markdown
             html_content = self._create_html_template(content, title, document_type)
             
-            # Create temporary HTML file
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.html', delete=False, encoding='utf-8') as temp_html:
-                temp_html.write(html_content)
-                temp_html_path = temp_html.name
-            
             # Output PDF path
             if not filename.endswith('.pdf'):
                 filename += '.pdf'
+            queued.append(((content, title, filename), pool.submit(html_content, self._output_path(filename))))
+        return queued
+
+    def _collect_documents(self, queued: list) -> List[str]:
+        """Wait for queued renders, falling back per document; results in queue order."""
+        results = []
+        for (content, title, filename), future in queued:
+            render = future.result()
+            if render.error:
+                # Fallback: Create a simple text-based PDF if wkhtmltopdf fails
+                results.append(self._create_simple_pdf(content, title, filename))
+                continue
+            print(f"📄 {os.path.basename(render.output_path)} rendered in {render.seconds:.2f}s "
+                  f"after {render.queue_wait:.2f}s in the render queue")
+            results.append(f"PDF generated successfully: {render.output_path}")
+        return results
+
+    def _run_sections(self, content: str, title: str, filename: str, document_type: str,
+                      sections: Dict[str, str]) -> str:
+        """
+        Render the master document once and cut each section PDF out of it.
+
+        Every top-level section starts a new page, and the page of each
+        heading is read back from the master's bookmarks (or recorded by the
+        reportlab fallback), so a section PDF is a plain copy of its page
+        range. Sections missing from the index are rendered on their own.
+        """
+        try:
+            from ..streaming_pdf import build_streaming_pdf, iter_lines
             
-            output_path = os.path.join(self.output_dir, filename)
+            if not filename.endswith('.pdf'):
+                filename += '.pdf'
             
-            # PDF generation options
-            options = {
-                'page-size': 'A4',
-                'margin-top': '1in',
-                'margin-right': '1in',
-                'margin-bottom': '1in',
-                'margin-left': '1in',
-                'encoding': "UTF-8",
-                'no-outline': None,
-                'enable-local-file-access': None,
-                'print-media-type': None,
-                'disable-smart-shrinking': None,
-            }
+            output_path = self._output_path(filename)
+            html_content = build_report_html(content, title, document_type, section_breaks=True)
+            render = get_wkhtmltopdf_pool().render(html_content, output_path, options=OUTLINE_OPTIONS)
             
+            results = []
+            extracted = {}
             try:
-                # Generate PDF using wkhtmltopdf
-                pdfkit.from_file(temp_html_path, output_path, options=options)
-                
-                # Clean up temporary file
-                os.unlink(temp_html_path)
-                
-                return f"PDF generated successfully: {output_path}"
-                
-            except Exception as pdf_error:
-                # Fallback: Create a simple text-based PDF if wkhtmltopdf fails
-                return self._create_simple_pdf(content, title, filename)
-                
+                if render.error:
+                    # Fallback: reportlab records the page of each section heading as it lays it out
+                    headings = []
+                    page_count = build_streaming_pdf(output_path, title, iter_lines(content),
+                                                     section_breaks=True, headings=headings)
+                else:
+                    headings, page_count = outline_headings(output_path)
+                results.append(f"PDF generated successfully: {output_path} ({page_count} pages)")
+                index = section_pages(headings, page_count)
+                for section_title, section_filename in sections.items():
+                    pages = index.get(section_key(section_title))
+                    if pages is not None:
+                        if not section_filename.endswith('.pdf'):
+                            section_filename += '.pdf'
+                        extracted[section_title] = (self._output_path(section_filename), pages)
+                extract_pages(output_path, dict(extracted.values()))
+            except ImportError as e:
+                # Cutting pages needs pypdf (and the fallback reportlab); render the sections separately instead
+                print(f"⚠️ Cannot cut section PDFs from {filename} ({e}); rendering {len(sections)} sections "
+                      f"separately. Install pypdf to render the master only once")
+                extracted = {}
+                if not results:
+                    results.append(self._create_simple_pdf(content, title, filename) if render.error
+                                   else f"PDF generated successfully: {output_path}")
+            
+            print(f"📄 {filename} rendered once, {len(extracted)} of {len(sections)} section PDFs cut from its pages")
+            section_content = None
+            pending = []
+            for section_title, section_filename in sections.items():
+                if section_title in extracted:
+                    path, (first, last) = extracted[section_title]
+                    results.append(f"Section PDF extracted: {path} (pages {first + 1}-{last + 1} of {filename})")
+                    continue
+                if section_content is None:
+                    section_content = {section_key(t): md for t, md in split_sections(content).items()}
+                markdown_section = section_content.get(section_key(section_title))
+                if markdown_section is None:
+                    results.append(f"Section not found in {filename}: {section_title}")
+                else:
+                    pending.append((markdown_section, section_title, section_filename, document_type))
+            if pending:
+                # Sections that could not be cut out are rendered on their own, all at once
+                results.extend(self._render_documents(pending))
+            return "\n".join(results)
+            
         except Exception as e:
             return f"Error generating PDF: {str(e)}"
 
     def _create_simple_pdf(self, content: str, title: str, filename: str) -> str:
         """Fallback method to create a simple PDF using reportlab."""
         try:
-            from reportlab.lib.pagesizes import letter, A4
-            from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak
-            from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-            from reportlab.lib.units import inch
-            from reportlab.lib import colors
+            from ..streaming_pdf import build_streaming_pdf, iter_lines
             
             if not filename.endswith('.pdf'):
                 filename += '.pdf'
             
-            output_path = os.path.join(self.output_dir, filename)
-            
-            # Create PDF document
-            doc = SimpleDocTemplate(output_path, pagesize=A4,
-                                  rightMargin=72, leftMargin=72,
-                                  topMargin=72, bottomMargin=18)
-            
-            # Get styles
-            styles = getSampleStyleSheet()
-            
-            # Custom styles
-            title_style = ParagraphStyle(
-                'CustomTitle',
-                parent=styles['Heading1'],
-                fontSize=24,
-                spaceAfter=30,
-                textColor=colors.darkblue,
-                alignment=1  # Center alignment
-            )
-            
-            # Story (content) list
-            story = []
-            
-            # Add title
-            story.append(Paragraph(title, title_style))
-            story.append(Spacer(1, 20))
-            
-            # Add generation info
-            info_text = f"Generated by MARS - Multi-Agent Research System<br/>{datetime.now().strftime('%B %d, %Y')}"
-            story.append(Paragraph(info_text, styles['Normal']))
-            story.append(PageBreak())
-            
-            # Process content (simple markdown to text conversion)
-            lines = content.split('\n')
-            for line in lines:
-                line = line.strip()
-                if not line:
-                    story.append(Spacer(1, 12))
-                elif line.startswith('# '):
-                    story.append(Paragraph(line[2:], styles['Heading1']))
-                elif line.startswith('## '):
-                    story.append(Paragraph(line[3:], styles['Heading2']))
-                elif line.startswith('### '):
-                    story.append(Paragraph(line[4:], styles['Heading3']))
-                else:
-                    # Clean up markdown formatting
-                    clean_line = line.replace('**', '').replace('*', '').replace('`', '')
-                    if clean_line:
-                        story.append(Paragraph(clean_line, styles['Normal']))
+            output_path = self._output_path(filename)
             
-            # Build PDF
-            doc.build(story)
+            # Flowables are created as pages are laid out, so memory stays flat for long documents
+            pages = build_streaming_pdf(output_path, title, iter_lines(content))
             
-            return f"Simple PDF generated successfully: {output_path}"
+            return f"Simple PDF generated successfully: {output_path} ({pages} pages)"
             
         except ImportError:
             # If reportlab is not available, create a text file
-            output_path = os.path.join(self.output_dir, filename.replace('.pdf', '.txt'))
+            output_path = self._output_path(filename.replace('.pdf', '.txt'))
             with open(output_path, 'w', encoding='utf-8') as f:
                 f.write(f"{title}\n")
                 f.write("=" * len(title) + "\n\n")
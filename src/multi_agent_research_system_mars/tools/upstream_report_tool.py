@@ -0,0 +1,24 @@
+from typing import Dict, Type
+from pydantic import BaseModel, Field
+from crewai.tools import BaseTool
+
+
+class UpstreamReportToolInput(BaseModel):
+    """Input schema for Upstream Report Reader tool."""
+    task_name: str = Field(..., description="Name of the upstream task whose full report to read")
+
+
+class UpstreamReportTool(BaseTool):
+    name: str = "Upstream Report Reader"
+    description: str = (
+        "Read the full, uncompacted report of an upstream research task when its "
+        "digest in your context is not detailed enough."
+    )
+    args_schema: Type[BaseModel] = UpstreamReportToolInput
+    reports: Dict[str, str] = {}
+
+    def _run(self, task_name: str) -> str:
+        report = self.reports.get(task_name.strip())
+        if report is None:
+            return f"Unknown task '{task_name}'. Available reports: {', '.join(self.reports)}"
+        return report
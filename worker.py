@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""
+MARS Job Worker
+Runs the research jobs queued by the web workers in production mode.
+Run a single worker process; MARS_WEB_MAX_JOBS sets how many jobs it runs at once.
+"""
+
+import os
+import sys
+
+os.environ.setdefault('MARS_PRODUCTION', 'true')
+
+from app import research_eta, run_research  # noqa: E402
+from multi_agent_research_system_mars.jobs import JobManager  # noqa: E402
+from multi_agent_research_system_mars.job_store import SQLiteJobStore  # noqa: E402
+
+
+def main():
+    store = SQLiteJobStore()
+    manager = JobManager(run_research, store=store, estimator=research_eta)
+    print(f"🛠️ MARS job worker running up to {manager.max_workers} jobs at once ({manager.order} order)")
+    print(f"🗄️ Job store: {store.path}")
+    try:
+        manager.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 MARS job worker stopped.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
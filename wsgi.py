@@ -0,0 +1,10 @@
+"""
+MARS WSGI entry point for production servers, e.g. `gunicorn wsgi:app`.
+Jobs are queued in the shared job store and run by worker.py.
+"""
+
+import os
+
+os.environ.setdefault('MARS_PRODUCTION', 'true')
+
+from app import app  # noqa: E402